@@ -1,41 +1,105 @@
+import argparse
+import time
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from data_io import FrameWriter, iter_chunks
+from preprocessing import PROFILE_COLUMN
 
-def add_time_columns(input_file, output_file):
+SECONDS_PER_DAY = 86400
+
+_clock_labels = None
+
+def format_clock(seconds_of_day):
+    """Format whole seconds since midnight as 'HH:MM:SS' through a lookup table."""
+    global _clock_labels
+    if _clock_labels is None:
+        day = np.arange(SECONDS_PER_DAY)
+        hours = np.char.zfill((day // 3600).astype(str), 2)
+        minutes = np.char.zfill((day // 60 % 60).astype(str), 2)
+        secs = np.char.zfill((day % 60).astype(str), 2)
+        _clock_labels = np.array([f"{h}:{m}:{s}" for h, m, s in zip(hours, minutes, secs)], dtype=object)
+    return _clock_labels[seconds_of_day]
+
+def _positions(chunk, offset, profile_offsets, reset_per_profile):
     """
-    Adds time and seconds columns to a CSV file, with times incrementing by 10 seconds.
+    Sample number of every row in a chunk.
 
-    Args:
-        input_file (str): Path to the input CSV file
-        output_file (str): Path to the output CSV file
+    Counts run on across chunks; with reset_per_profile they restart at 0 for
+    each profile_id, continuing where that profile left off in earlier chunks.
     """
-    # Read the CSV file
-    print(f"Reading file: {input_file}")
-    df = pd.read_csv(input_file)
+    if not reset_per_profile:
+        return np.arange(offset, offset + len(chunk))
+    # Rows without a profile id count as one profile, keyed None
+    codes, uniques = pd.factorize(chunk[PROFILE_COLUMN].to_numpy(), use_na_sentinel=False)
+    profiles = [None if pd.isna(profile) else profile for profile in uniques]
+    starts = np.array([profile_offsets.get(profile, 0) for profile in profiles], dtype=np.int64)
+    positions = pd.Series(codes).groupby(codes, sort=False).cumcount().to_numpy() + starts[codes]
+    for profile, count in zip(profiles, np.bincount(codes, minlength=len(profiles))):
+        profile_offsets[profile] = profile_offsets.get(profile, 0) + int(count)
+    return positions
+
+def add_time_columns(input_file, output_file, start_time=datetime(2023, 1, 1), interval=10,
+                     reset_per_profile=False, timestamp_column=None, chunksize=100_000):
+    """
+    Adds time and seconds columns to a data file, one row per sampling interval.
+
+    The file is processed in chunks and written incrementally, so memory use
+    depends on `chunksize`, not the size of the file.
 
-    # Define a starting time
-    start_time = datetime(2023, 1, 1, 0, 0, 0)
+    Args:
+        input_file (str): Path to the input CSV, Parquet, Feather or .npy file
+        output_file (str): Path to the output file; its extension picks the format
+        start_time (datetime): Time of the first sample
+        interval (float): Seconds between consecutive samples
+        reset_per_profile (bool): Restart the clock at start_time for every profile_id
+        timestamp_column (str): If set, also add a datetime64 column of full timestamps
+        chunksize (int): Rows processed per chunk
 
-    # Create lists to hold the time and seconds values
-    time_values = []
-    seconds_values = []
+    Returns:
+        int: Number of rows written
+    """
+    print(f"Reading file: {input_file}")
+    start = time.time()
+    start_of_day = start_time.hour * 3600 + start_time.minute * 60 + start_time.second
+    origin = np.datetime64(start_time, 'ns')
+    integral = float(interval).is_integer()
+    step = int(interval) if integral else interval
 
-    # Generate time values for each row
-    for i in range(len(df)):
-        current_time = start_time + timedelta(seconds=i*10)
-        time_values.append(current_time.strftime('%H:%M:%S'))
-        seconds_values.append(i*10)
+    offset = 0
+    profile_offsets = {}
+    with FrameWriter(output_file) as writer:
+        for chunk in iter_chunks(input_file, chunksize):
+            if reset_per_profile and PROFILE_COLUMN not in chunk.columns:
+                raise ValueError(f"Cannot reset per profile: {input_file} has no {PROFILE_COLUMN} column")
+            positions = _positions(chunk, offset, profile_offsets, reset_per_profile)
+            offset += len(chunk)
 
-    # Add the new columns to the dataframe
-    df['time'] = time_values
-    df['seconds'] = seconds_values
+            seconds = positions * step
+            whole_seconds = seconds if integral else np.floor(seconds).astype(np.int64)
+            chunk['time'] = format_clock((start_of_day + whole_seconds) % SECONDS_PER_DAY)
+            chunk['seconds'] = seconds
+            if timestamp_column:
+                chunk[timestamp_column] = origin + (positions * (interval * 1e9)).astype('timedelta64[ns]')
+            writer.write(chunk)
 
-    # Save the modified dataframe to a new CSV file
-    print(f"Writing file with added time columns: {output_file}")
-    df.to_csv(output_file, index=False)
-    print(f"Successfully added time columns to {output_file}")
+    print(f"Successfully added time columns to {output_file} "
+          f"({writer.rows} rows, took {time.time() - start:.2f} seconds)")
+    return writer.rows
 
 if __name__ == "__main__":
-    input_file = "measures_v2.csv"
-    output_file = "measures_v2_with_time.csv"
-    add_time_columns(input_file, output_file)
+    parser = argparse.ArgumentParser(description="Add time and seconds columns to a motor data file")
+    parser.add_argument('input_file', nargs='?', default="measures_v2.csv")
+    parser.add_argument('output_file', nargs='?', default="measures_v2_with_time.csv")
+    parser.add_argument('--start', type=datetime.fromisoformat, default=datetime(2023, 1, 1),
+                        help="Time of the first sample (ISO format, default: 2023-01-01T00:00:00)")
+    parser.add_argument('--interval', type=float, default=10, help="Seconds between samples")
+    parser.add_argument('--reset-per-profile', action='store_true',
+                        help=f"Restart the clock for every {PROFILE_COLUMN}")
+    parser.add_argument('--timestamp-column', help="Also add a datetime64 column with this name")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+
+    add_time_columns(args.input_file, args.output_file, start_time=args.start, interval=args.interval,
+                     reset_per_profile=args.reset_per_profile, timestamp_column=args.timestamp_column,
+                     chunksize=args.chunksize)
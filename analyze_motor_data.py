@@ -1,45 +1,117 @@
 import pandas as pd
 import numpy as np
-import joblib
 import json
 from datetime import datetime
 import os
+from model_registry import DEFAULT_MODEL_PATH, load_model, load_scorer, registry
+from data_io import MATRIX_CHUNK_ROWS, analysis_dtypes, iter_chunks, read_frame, read_header
+from downsample import downsample_indices
+from fused_scorer import ShadowScorer
+from instrumentation import NULL_TIMER, stage_timer
+from model_versions import VERSION_LENGTH, shadow_summary
+from preprocessing import (PROFILE_COLUMN, RangeCheck, fill_missing, model_manifest, prepare_analysis_frame,
+                           prepare_analysis_matrix)
+from rolling_analytics import rolling_analytics
+from rollups import RollupBuilder
+from streaming import analyze_motor_data_chunked
 
-def analyze_motor_data(data_path=None, data_df=None, max_data_points=1000):
+def analyze_motor_data(data_path=None, data_df=None, max_data_points=1000, model_path=DEFAULT_MODEL_PATH,
+                       chunksize=None, progress_callback=None, rollups=False, timing=None, rolling_windows=None,
+                       shadow_model_path=None, compact=False, *, artifacts=None):
     """
     Analyze motor data for anomalies and return results in JSON format
 
     Args:
-        data_path: Path to CSV file (optional)
+        data_path: Path to a CSV, Parquet, Feather or structured .npy file (optional)
         data_df: DataFrame containing motor data (optional)
         max_data_points: Maximum number of data points to include in JSON output (default: 1000)
+        model_path: Path to the trained model file; loaded once per process and
+                    reloaded only when the file changes
+        chunksize: If set, stream `data_path` in chunks of this many rows with
+                   bounded memory (see streaming.analyze_motor_data_chunked)
+        progress_callback: Called with the rows processed so far in chunked mode;
+                           returning False cancels the analysis
+        rollups: Also build a pyramid of per-bucket aggregates at several
+                 resolutions, put in `artifacts` under "rollups"; save_result
+                 stores it next to the run for /api/runs/<id>/series
+        timing: Add a "timing" block with the duration, rows and peak memory
+                of every stage (default: on if MOTOR_INSTRUMENTATION is set)
+        rolling_windows: If set, window lengths in rows of the rolling anomaly
+                         rates, temperature means/maxima and error drift per
+                         profile added under "rolling" (see
+                         rolling_analytics.rolling_analytics); not available
+                         in chunked mode
+        shadow_model_path: If set, also score the rows with this candidate
+                           model in the same pass and add its agreement with
+                           the current model under "shadow" (see
+                           model_versions.shadow_summary); the result itself
+                           is the current model's. Not available in chunked mode
+        compact: Read only the feature (and time) columns, chunk by chunk and
+                 as float32, into one matrix that is filled in place and
+                 scored in float32; time is read as categorical and stays an
+                 array. Errors differ from the default path by float32
+                 rounding. Not used in chunked mode
+        artifacts: Optional dict that receives what the run produces besides
+                   its JSON result: the RollupBuilder under "rollups"
 
     Returns:
         JSON-compatible dictionary with analysis results
     """
-    # Load model
+    if chunksize and data_df is None:
+        return analyze_motor_data_chunked(data_path or 'sample_data/sampled_data_100000.csv',
+                                          chunksize=chunksize, max_data_points=max_data_points,
+                                          model_path=model_path, progress_callback=progress_callback,
+                                          rollups=rollups, timing=timing, artifacts=artifacts)
+
+    timer = stage_timer(timing)
+    loads_before = registry.load_count
+
+    # Load model (cached across calls by the model registry)
     try:
-        model_data = joblib.load('motor_anomaly_model.pkl')
-        autoencoder = model_data['autoencoder']
-        scaler = model_data['scaler']
-        error_threshold = model_data['error_threshold']
-        column_names = model_data['column_names']
-        column_stats = model_data.get('column_stats', {})
-        temp_columns = model_data.get('temp_columns', [])
+        with timer.stage('model_load'):
+            model_data = load_model(model_path)
+            scorer = load_scorer(model_data, 'float32' if compact else 'float64')
+            error_threshold = model_data['error_threshold']
+            manifest = model_manifest(model_data)
+            column_names = manifest['columns']
+            column_stats = manifest['column_stats']
+            temp_columns = manifest['temp_columns']
     except Exception as e:
         return {
             "status": "error",
             "message": f"Failed to load model: {str(e)}"
         }
 
+    # A candidate that cannot be loaded never fails the analysis itself
+    shadow = None
+    if shadow_model_path:
+        try:
+            with timer.stage('model_load'):
+                candidate_data = load_model(shadow_model_path)
+                if model_manifest(candidate_data)['columns'] != column_names:
+                    raise ValueError("candidate model expects different feature columns")
+                shadow_scorer = ShadowScorer(scorer, load_scorer(candidate_data, scorer.dtype.name))
+        except Exception as e:
+            print(f"Shadow scoring disabled: {str(e)}")
+            shadow = {"status": "error", "message": f"Failed to load candidate model: {str(e)}"}
+
     # Load data
     try:
-        if data_df is not None:
-            df = data_df.copy()
-        elif data_path is not None:
-            df = pd.read_csv(data_path)
-        else:
-            df = pd.read_csv('sample_data/sampled_data_100000.csv')
+        with timer.stage('load') as stage:
+            if compact:
+                # Read straight into one float32 matrix, chunk by chunk
+                values, columns, time_data, temp_columns = _load_matrix(data_path, data_df, column_names,
+                                                                        temp_columns)
+                stage['rows'] = len(values)
+            elif data_df is not None:
+                df = data_df.copy()
+                stage['rows'] = len(df)
+            else:
+                # CSV, Parquet, Feather or .npy; only the columns the model needs
+                data_path = data_path or 'sample_data/sampled_data_100000.csv'
+                dtypes = analysis_dtypes(read_header(data_path), column_names)
+                df = read_frame(data_path, list(dtypes), dtypes)
+                stage['rows'] = len(df)
     except Exception as e:
         return {
             "status": "error",
@@ -47,117 +119,141 @@ def analyze_motor_data(data_path=None, data_df=None, max_data_points=1000):
         }
 
     # Prepare data for analysis
-    omit = ["u_q", "u_d", "i_d", "i_q", "time"]
+    with timer.stage('clean') as stage:
+        if compact:
+            # Filled in place; the frame wraps the matrix without a copy
+            df_analysis = pd.DataFrame(fill_missing(values), columns=columns, copy=False)
+        else:
+            df_analysis, time_data, temp_columns = prepare_analysis_frame(df, column_names, temp_columns)
+            df_analysis = df_analysis.ffill().bfill()  # Fill missing values
+            values = df_analysis.values
+        stage['rows'] = len(df_analysis)
 
-    # Keep time for visualization if it exists
-    time_data = None
-    if 'time' in df.columns:
-        time_data = df['time'].tolist()
+    # Anomaly detection
+    try:
+        # Scale, reconstruct and calculate errors in one fused pass
+        with timer.stage('score') as stage:
+            if shadow_model_path and shadow is None:
+                # Both models read the same input blocks; the candidate only
+                # costs its forward pass
+                reconstruction_errors, candidate_errors = shadow_scorer.score(values)
+                shadow = {
+                    "status": "success",
+                    "version": registry.version(model_path)[:VERSION_LENGTH],
+                    "candidate_version": registry.version(shadow_model_path)[:VERSION_LENGTH],
+                    **shadow_summary(reconstruction_errors, candidate_errors, error_threshold,
+                                     candidate_data['error_threshold'])
+                }
+            else:
+                reconstruction_errors = scorer.score(values)
+            stage['rows'] = len(reconstruction_errors)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error during anomaly detection: {str(e)}"
+        }
 
-    # Prepare analysis dataframe
-    df_analysis = df.drop(columns=[col for col in omit if col in df.columns])
+    result = build_result(df_analysis, time_data, temp_columns, reconstruction_errors, error_threshold,
+                          column_stats, max_data_points, rollups, timer, rolling_windows, artifacts=artifacts)
+    if shadow is not None:
+        result["shadow"] = shadow
+    if timer.enabled:
+        timer.note('model_loads', registry.load_count - loads_before)
+        result["timing"] = timer.summary()
+    return result
 
-    # Ensure coolant is treated as temperature if needed
-    if 'coolant' in df_analysis.columns and 'coolant_temperature' not in df_analysis.columns:
-        df_analysis = df_analysis.rename(columns={'coolant': 'coolant_temperature'})
+def _load_matrix(data_path, data_df, column_names, temp_columns):
+    # Compact mode: only reads from the caller's frame, and reads files as
+    # float32 features and categorical time (see prepare_analysis_matrix)
+    if data_df is not None:
+        return prepare_analysis_matrix(data_df, column_names, temp_columns)
+    data_path = data_path or 'sample_data/sampled_data_100000.csv'
+    header = read_header(data_path)
+    dtypes = analysis_dtypes(header, column_names, float_dtype=np.float32, text_dtype='category')
+    # Columns with unparseable values come back unconverted and are coerced
+    chunks = iter_chunks(data_path, MATRIX_CHUNK_ROWS, list(dtypes), dtypes)
+    return prepare_analysis_matrix(chunks, column_names, temp_columns)
 
-    # Identify temp columns if not provided
-    if not temp_columns:
-        temp_columns = [col for col in df_analysis.columns if 'temp' in col.lower() or 'temperature' in col.lower()]
+def _take(values, index):
+    # Python values of the rows at `index`, from a list or any array
+    if isinstance(values, list):
+        return [values[i] for i in index]
+    return np.asarray(values[index], dtype=object).tolist()
 
-    # Ensure we only use columns that were in the training data
-    available_columns = [col for col in column_names if col in df_analysis.columns]
-    df_analysis = df_analysis[available_columns]
+def build_result(df_analysis, time_data, temp_columns, reconstruction_errors, error_threshold, column_stats,
+                 max_data_points=1000, rollups=False, timer=NULL_TIMER, rolling_windows=None, *, artifacts=None):
+    """
+    Build the analysis result from a prepared frame and its reconstruction errors
 
-    # Clean data
-    df_analysis = df_analysis.apply(pd.to_numeric, errors='coerce')
-    df_analysis = df_analysis.fillna(method='ffill').fillna(method='bfill')  # Fill missing values
+    Args:
+        df_analysis: Filled analysis frame, one column per model feature
+        time_data: Time value per row (list or array), or None
+        temp_columns: Temperature columns
+        reconstruction_errors: Reconstruction error per row of df_analysis
+        error_threshold: Errors above this are anomalies
+        column_stats: Normal range per column
+        max_data_points: Maximum number of data points to include in JSON output
+        rollups: Also build the rollup pyramid (see analyze_motor_data)
+        timer: StageTimer recording the stats, downsample, rolling and rollups stages
+        rolling_windows: Also add rolling analytics over these windows (see analyze_motor_data)
+        artifacts: Optional dict that receives the rollup pyramid (see analyze_motor_data)
 
-    # Anomaly detection
-    try:
-        # Scale data
-        X_scaled = scaler.transform(df_analysis.values)
+    Returns:
+        JSON-compatible dictionary with analysis results
+    """
+    with timer.stage('stats') as stage:
+        # Identify anomalies
+        anomalies = reconstruction_errors > error_threshold
 
-        # Get reconstruction
-        X_reconstructed = autoencoder.predict(X_scaled)
+        # Get specific parameter anomalies (beyond normal ranges) for every column
+        # in one pass; the temperature stats reuse the same counts
+        # The frame's own matrix when it has a single float dtype (no copy)
+        values = df_analysis.to_numpy()
+        if values.dtype.kind != 'f':
+            values = values.astype(np.float64)
+        range_check = RangeCheck(df_analysis.columns, column_stats)
+        out_of_range = range_check.counts(values)
+        parameter_anomalies = range_check.parameter_anomalies(out_of_range)
 
-        # Calculate errors
-        reconstruction_errors = np.mean((X_scaled - X_reconstructed) ** 2, axis=1)
+        # Prepare results
+        anomaly_indices = np.where(anomalies)[0]
+        anomaly_count = len(anomaly_indices)
 
-        # Identify anomalies
-        anomalies = reconstruction_errors > error_threshold
+        # Get temperature statistics
+        temp_stats = {}
+        if len(values) > 0:
+            for col in temp_columns:
+                if col in df_analysis.columns:
+                    i = df_analysis.columns.get_loc(col)
+                    temp_stats[col] = {
+                        "mean": float(np.nanmean(values[:, i], dtype=np.float64)),
+                        "max": float(np.nanmax(values[:, i])),
+                        "min": float(np.nanmin(values[:, i])),
+                        "last": float(values[-1, i]),
+                        "anomalies": int(out_of_range[i])
+                    }
+        stage['rows'] = len(df_analysis)
 
-        # Get specific parameter anomalies (beyond normal ranges)
-        parameter_anomalies = {}
-        for col in df_analysis.columns:
-            if col in column_stats:
-                min_val = column_stats[col]['min_normal']
-                max_val = column_stats[col]['max_normal']
-                param_anomalies = (df_analysis[col] < min_val) | (df_analysis[col] > max_val)
-                if param_anomalies.any():
-                    parameter_anomalies[col] = param_anomalies.sum()
+    with timer.stage('downsample'):
+        # Downsample data to prevent large JSON files, keeping the min/max of every
+        # bucket and the anomalous points so spikes stay visible
+        data_length = len(df_analysis)
+        plotted_temp_columns = [col for col in temp_columns if col in df_analysis.columns]
+        temp_values = [values[:, df_analysis.columns.get_loc(col)] for col in plotted_temp_columns]
+        plot_index = downsample_indices(reconstruction_errors, temp_values, max_data_points, anomalies)
 
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": f"Error during anomaly detection: {str(e)}"
+        # Prepare data for plots with limited data points
+        plot_data = {
+            "time": _take(time_data, plot_index) if time_data is not None and len(time_data) else plot_index.tolist(),
+            "errors": reconstruction_errors[plot_index].tolist(),
+            "threshold": float(error_threshold),
+            "anomaly_indices": np.flatnonzero(anomalies[plot_index]).tolist(),
+            "downsampled": data_length > max_data_points,
+            "original_length": data_length
         }
 
-    # Prepare results
-    anomaly_indices = np.where(anomalies)[0]
-    anomaly_count = len(anomaly_indices)
-
-    # Get temperature statistics
-    temp_stats = {}
-    for col in temp_columns:
-        if col in df_analysis.columns:
-            temp_stats[col] = {
-                "mean": float(df_analysis[col].mean()),
-                "max": float(df_analysis[col].max()),
-                "min": float(df_analysis[col].min()),
-                "last": float(df_analysis[col].iloc[-1] if len(df_analysis) > 0 else 0),
-                "anomalies": int(((df_analysis[col] < column_stats.get(col, {}).get('min_normal', -float('inf'))) |
-                              (df_analysis[col] > column_stats.get(col, {}).get('max_normal', float('inf')))).sum())
-            }
-
-    # Downsample data to prevent large JSON files
-    data_length = len(df_analysis)
-    if data_length > max_data_points:
-        # Calculate the step size for downsampling
-        step = data_length // max_data_points
-
-        # Downsample time data
-        if time_data:
-            time_data = time_data[::step]
-
-        # Downsample errors
-        downsampled_errors = reconstruction_errors[::step].tolist()
-
-        # Adjust anomaly indices for downsampled data
-        downsampled_anomaly_indices = [i // step for i in anomaly_indices if i % step == 0]
-    else:
-        # Use all data if it's under the limit
-        downsampled_errors = reconstruction_errors.tolist()
-        downsampled_anomaly_indices = anomaly_indices.tolist()
-
-    # Prepare data for plots with limited data points
-    plot_data = {
-        "time": time_data if time_data else list(range(0, data_length, step if data_length > max_data_points else 1)),
-        "errors": downsampled_errors,
-        "threshold": float(error_threshold),
-        "anomaly_indices": list(downsampled_anomaly_indices),
-        "downsampled": data_length > max_data_points,
-        "original_length": data_length
-    }
-
-    # Add temperature series data for plotting (downsampled)
-    temp_series = {}
-    for col in temp_columns:
-        if col in df_analysis.columns:
-            if data_length > max_data_points:
-                temp_series[col] = df_analysis[col].iloc[::step].tolist()
-            else:
-                temp_series[col] = df_analysis[col].tolist()
+        # Add temperature series data for plotting (downsampled)
+        temp_series = {col: values[plot_index].tolist() for col, values in zip(plotted_temp_columns, temp_values)}
 
     # Create results JSON
     result = {
@@ -176,22 +272,31 @@ def analyze_motor_data(data_path=None, data_df=None, max_data_points=1000):
         "sample_anomalies": df_analysis.iloc[anomaly_indices[:5]].to_dict('records') if anomaly_count > 0 else []
     }
 
+    if rolling_windows:
+        with timer.stage('rolling') as stage:
+            profile_ids = df_analysis[PROFILE_COLUMN].to_numpy() if PROFILE_COLUMN in df_analysis.columns else None
+            result["rolling"] = rolling_analytics(reconstruction_errors, anomalies,
+                                                  dict(zip(plotted_temp_columns, temp_values)), profile_ids,
+                                                  float(error_threshold), rolling_windows, index=plot_index)
+            stage['rows'] = data_length
+
+    if rollups and artifacts is not None:
+        with timer.stage('rollups'):
+            builder = RollupBuilder(plotted_temp_columns)
+            builder.add(reconstruction_errors, anomalies, np.column_stack(temp_values) if temp_values
+                        else np.empty((data_length, 0)))
+        artifacts["rollups"] = builder
+
     return result
 
 if __name__ == "__main__":
-    # When run directly, analyze data and save results
-    result = analyze_motor_data()
+    from results_store import save_result
 
-    # Save the results to a JSON file
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # Save the latest analysis to a file
-    latest_file = 'motor_analysis_latest.json'
-    # Also save a timestamped version
-    timestamped_file = f'results/motor_analysis_{timestamp}.json'
+    # When run directly, analyze data and save results
+    artifacts = {}
+    result = analyze_motor_data(rollups=True, artifacts=artifacts)
 
-    # Write both files
-    for filename in [latest_file, timestamped_file]:
-        with open(filename, 'w') as f:
-            json.dump(result, f, indent=2)
+    # Save the latest analysis and a timestamped version, and index the run
+    run_id = save_result(result, rollups=artifacts.get("rollups"))
 
-    print(f"Analysis completed and saved to motor_analysis_{timestamp}.json")
+    print(f"Analysis completed and saved (run {run_id})")
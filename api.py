@@ -1,39 +1,228 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template
+from flask import Flask, Response, g, request, jsonify, send_from_directory, render_template, url_for, stream_with_context
 import os
-import numpy as np
-from analyze_motor_data import analyze_motor_data
-import json
+from jobs import JobQueue, QueueFull, DONE, FAILED, CANCELLED
+from batcher import MicroBatcher, rows_to_matrix
+from results_store import store as results_store
+from rollups import load_rollups
+from serialization import MIN_COMPRESS_BYTES, accepted_encoding, compress, dumps, loads
+from events import EventBroker
+from instrumentation import ENABLED as INSTRUMENTATION_ENABLED, metrics
+from model_registry import load_model, load_scorer, registry
 from datetime import datetime
-import traceback
-
-# Create custom encoder for numpy types
-class NumpyEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, np.integer):
-            return int(o)
-        if isinstance(o, np.floating):
-            return float(o)
-        if isinstance(o, np.ndarray):
-            return o.tolist()
-        return super().default(o)
-
-# Helper function to convert numpy types in nested dictionaries and lists
-def convert_numpy_types(obj):
-    if isinstance(obj, dict):
-        return {k: convert_numpy_types(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(item) for item in obj]
-    elif isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    else:
-        return obj
+import threading
+import numpy as np
+from collections import OrderedDict
+import time
+import hashlib
+import uuid
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
+# Server-Sent Events hub for dashboard updates
+events = EventBroker()
+
+# Points pushed to dashboards per ingested stream batch
+STREAM_DELTA_POINTS = int(os.environ.get('MOTOR_STREAM_DELTA_POINTS', 200))
+
+# Upper bound on the buckets returned by /api/runs/<id>/series
+MAX_SERIES_POINTS = 10000
+
+# Memoized upload results: payloads kept in total, and for how long (seconds).
+# MOTOR_MEMO_MAX_BYTES=0 turns memoization off
+MEMO_MAX_BYTES = int(os.environ.get('MOTOR_MEMO_MAX_BYTES', 512 * 1024 ** 2))
+MEMO_MAX_AGE = float(os.environ.get('MOTOR_MEMO_MAX_AGE', 7 * 24 * 3600))
+
+# Uploads are hashed in blocks of this size while they are saved
+UPLOAD_BLOCK_SIZE = 1 << 20
+
+# Memo keys of jobs still running, so identical uploads share one job
+inflight = {}
+job_keys = {}
+inflight_lock = threading.Lock()
+
+def _settle_job(job_id):
+    # Memoize the run of a finished job under its upload's key
+    with inflight_lock:
+        key = job_keys.pop(job_id, None)
+        if key is not None and inflight.get(key) == job_id:
+            del inflight[key]
+    if key is None:
+        return
+    result = job_queue.result(job_id)
+    if result and result.get("status") == "success" and result.get("run_id") is not None:
+        results_store.memoize(key, result["run_id"], max_bytes=MEMO_MAX_BYTES, max_age=MEMO_MAX_AGE)
+
+def _job_finished(job_id, state):
+    # Record the worker's stage timings and shadow scoring, if it sent any
+    metrics.inc('motor_jobs_total', state=state)
+    result = job_queue.result(job_id)
+    if result and result.get("timing"):
+        metrics.record_timing(result["timing"])
+    if result and result.get("shadow"):
+        metrics.record_shadow(result["shadow"])
+    _settle_job(job_id)
+
+    # Tell dashboards a new run was saved, with its summary. Failed and
+    # cancelled jobs saved nothing, so they are not announced
+    if state != DONE or not result or result.get("run_id") is None:
+        return
+    run = results_store.run(result["run_id"])
+    if run is not None:
+        events.publish('run', {"job_id": job_id, **run._asdict()})
+
+# Analysis jobs run in a bounded process pool outside the request threads
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('MOTOR_JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('MOTOR_JOB_QUEUE_SIZE', 8)),
+    result_ttl=float(os.environ.get('MOTOR_JOB_RESULT_TTL', 3600)),
+    on_finished=_job_finished
+)
+
+# Worker processes of a by_profile analysis job; by default the CPUs are
+# shared between the job workers so concurrent jobs do not oversubscribe them
+PROFILE_WORKERS = int(os.environ.get('MOTOR_PROFILE_WORKERS') or
+                      max(1, (os.cpu_count() or 1) // job_queue.max_workers))
+
+def _collect_metrics():
+    # Values read at scrape time rather than pushed
+    metrics.set('motor_job_queue_depth', job_queue.depth())
+    metrics.set('motor_model_loads_total', registry.load_count, process='api')
+    stats = batcher.stats()
+    metrics.set('motor_score_requests_total', stats["requests"])
+    metrics.set('motor_score_batches_total', stats["batches"])
+    metrics.set('motor_score_rows_total', stats["rows"])
+    metrics.set('motor_score_pending_rows', stats["pending_rows"])
+    metrics.set('motor_streams_open', len(streams))
+
+metrics.on_collect(_collect_metrics)
+
+# pandas, the analysis pipeline and the model are loaded in the background,
+# so the process answers /healthz straight away and /readyz once it is warm.
+# Requests arriving earlier import and load what they need themselves
+ready = threading.Event()
+warmup_lock = threading.Lock()
+warmup_state = {"thread": None, "error": None, "seconds": None}
+
+def _warm_up():
+    start = time.perf_counter()
+    try:
+        import analyze_motor_data  # noqa: F401 (pandas and the analysis pipeline)
+        import streaming  # noqa: F401
+        load_scorer(load_model(job_queue.model_path))
+    except Exception as e:
+        print(f"Warm-up failed: {str(e)}")
+        warmup_state["error"] = str(e)
+        return
+    warmup_state["seconds"] = time.perf_counter() - start
+    metrics.set('motor_warmup_seconds', warmup_state["seconds"])
+    ready.set()
+
+def start_warmup():
+    """Start the background warm-up, unless it is running or already succeeded."""
+    with warmup_lock:
+        thread = warmup_state["thread"]
+        if ready.is_set() or (thread is not None and thread.is_alive()):
+            return
+        warmup_state["error"] = None
+        thread = warmup_state["thread"] = threading.Thread(target=_warm_up, name='warmup', daemon=True)
+        thread.start()
+
+def wait_for_warmup():
+    """
+    Wait until the warm-up thread has finished, successfully or not.
+
+    Job workers are forked from this process; forking while the warm-up is
+    importing would copy its held import locks into the worker and hang it.
+    """
+    thread = warmup_state["thread"]
+    if thread is not None:
+        thread.join()
+
+start_warmup()
+
+if INSTRUMENTATION_ENABLED:
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        if 'request_start' in g:
+            metrics.observe('motor_http_request_duration_seconds', time.perf_counter() - g.request_start,
+                            endpoint=request.endpoint or 'unknown', method=request.method,
+                            status=response.status_code)
+        return response
+
+# Candidate model scored in the shadow of the current one, e.g.
+# models/<version>.pkl; its agreement is exported through /metrics
+SHADOW_MODEL_PATH = os.environ.get('MOTOR_SHADOW_MODEL')
+
+
+# Small scoring requests are coalesced into shared vectorized batches
+batcher = MicroBatcher(
+    max_batch_rows=int(os.environ.get('MOTOR_SCORE_MAX_BATCH_ROWS', 4096)),
+    max_wait=float(os.environ.get('MOTOR_SCORE_MAX_WAIT_MS', 5)) / 1000,
+    max_pending_rows=int(os.environ.get('MOTOR_SCORE_MAX_PENDING_ROWS', 1_000_000)),
+    shadow_model_path=SHADOW_MODEL_PATH
+)
+
+# Largest request accepted by /api/score
+MAX_SCORE_ROWS = int(os.environ.get('MOTOR_SCORE_MAX_ROWS', 100_000))
+
+# Live sensor streams, one stateful analyzer per stream id, least recently
+# fed first. Streams with no batch for MOTOR_STREAM_IDLE_SECONDS are dropped;
+# new streams are refused while MOTOR_MAX_STREAMS are open
+MAX_STREAMS = int(os.environ.get('MOTOR_MAX_STREAMS', 256))
+STREAM_IDLE_SECONDS = float(os.environ.get('MOTOR_STREAM_IDLE_SECONDS', 3600))
+streams = OrderedDict()
+stream_last_used = {}
+streams_lock = threading.Lock()
+
+def _evict_idle_streams(now):
+    # Called with streams_lock held
+    while streams:
+        stream_id = next(iter(streams))
+        if now - stream_last_used[stream_id] < STREAM_IDLE_SECONDS:
+            break
+        del streams[stream_id]
+        del stream_last_used[stream_id]
+        metrics.inc('motor_streams_evicted_total')
+
+# Compressed copies of stored payloads, keyed by (ETag, encoding)
+compressed_cache = OrderedDict()
+compressed_cache_lock = threading.Lock()
+COMPRESSED_CACHE_SIZE = 32
+
+def json_response(payload, status=200, etag=None, headers=None):
+    """
+    Build a response for already-serialized JSON bytes.
+
+    The body is gzip/brotli-compressed when the client accepts it. Payloads
+    with an ETag never change, so their compressed form is cached and
+    conditional requests get a 304.
+    """
+    response = Response(payload, status=status, mimetype='application/json', headers=headers)
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding(request.accept_encodings) if len(payload) >= MIN_COMPRESS_BYTES else None
+    if encoding:
+        key = (etag, encoding)
+        with compressed_cache_lock:
+            body = compressed_cache.get(key) if etag else None
+        if body is None:
+            body = compress(payload, encoding)
+            if etag:
+                with compressed_cache_lock:
+                    compressed_cache[key] = body
+                    while len(compressed_cache) > COMPRESSED_CACHE_SIZE:
+                        compressed_cache.popitem(last=False)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+
+    if etag is None:
+        return response
+    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    return response.make_conditional(request)
+
 @app.route('/')
 def home():
     return render_template('dashboard.html')
@@ -44,55 +233,107 @@ def dashboard_js():
 
 @app.route('/motor_analysis_latest.json')
 def latest_analysis():
-    # First check if we have the latest file directly
-    if os.path.exists('motor_analysis_latest.json'):
-        with open('motor_analysis_latest.json', 'r') as f:
-            try:
-                data = json.load(f)
-                return jsonify(data)
-            except json.JSONDecodeError:
-                pass  # If latest file is corrupt, continue to look for timestamped files
-
-    # Find the most recent analysis file
-    results_dir = 'results'
-    if not os.path.exists(results_dir):
-        os.makedirs(results_dir, exist_ok=True)
-
-    analysis_files = []
-    # Look in the results directory
-    if os.path.exists(results_dir):
-        analysis_files.extend([os.path.join(results_dir, f) for f in os.listdir(results_dir)
-                              if f.startswith('motor_analysis_') and f.endswith('.json')])
-    # Also look in the root directory
-    analysis_files.extend([f for f in os.listdir('.')
-                          if f.startswith('motor_analysis_') and f.endswith('.json') and f != 'motor_analysis_latest.json'])
-
-    if not analysis_files:
+    # The newest run is an indexed lookup; its payload is cached in memory
+    latest = results_store.latest()
+    if latest is None:
         # Return a stub if no analysis exists
         return jsonify({
             "status": "error",
             "message": "No analysis data available. Please analyze data first."
         })
 
-    # Get the most recent file
-    latest_file = max(analysis_files, key=lambda x: os.path.getmtime(x))
-    print(f"Serving analysis from: {latest_file}")
+    run, payload = latest
+    return json_response(payload, etag=f'run-{run.id}', headers={'Cache-Control': 'no-cache'})
 
+def _parse_time(value):
+    """Parse a Unix timestamp or an ISO 8601 date/time query parameter."""
+    if value is None:
+        return None
     try:
-        with open(latest_file, 'r') as f:
-            data = json.load(f)
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
 
-        # Also update the latest file
-        with open('motor_analysis_latest.json', 'w') as f:
-            json.dump(data, f, indent=2, cls=NumpyEncoder)
+@app.route('/api/runs', methods=['GET'])
+def list_runs():
+    try:
+        start = _parse_time(request.args.get('start'))
+        end = _parse_time(request.args.get('end'))
+        limit = int(request.args.get('limit', 100))
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid query parameter: {str(e)}"
+        }), 400
 
-        # Convert numpy types to standard Python types before JSON serialization
-        return jsonify(convert_numpy_types(data))
-    except Exception as e:
+    runs = results_store.list_runs(start, end, limit)
+    return jsonify({
+        "status": "success",
+        "runs": [run._asdict() for run in runs]
+    })
+
+@app.route('/api/runs/<int:run_id>', methods=['GET'])
+def get_run(run_id):
+    found = results_store.get(run_id)
+    if found is None:
         return jsonify({
             "status": "error",
-            "message": f"Error reading analysis file: {str(e)}"
-        })
+            "message": "Unknown run"
+        }), 404
+    return json_response(found[1], etag=f'run-{run_id}')
+
+@app.route('/api/runs/<int:run_id>/series', methods=['GET'])
+def get_run_series(run_id):
+    directory = results_store.rollup_dir(run_id)
+    if not os.path.exists(os.path.join(directory, 'rollups.json')):
+        return jsonify({
+            "status": "error",
+            "message": "No rollups stored for this run"
+        }), 404
+
+    try:
+        start = int(request.args.get('start', 0))
+        end = request.args.get('end')
+        end = int(end) if end is not None else None
+        points = int(request.args.get('points', 1000))
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid query parameter: {str(e)}"
+        }), 400
+
+    series = load_rollups(directory).query(start, end, min(points, MAX_SERIES_POINTS))
+    # Runs never change once saved
+    return json_response(dumps({"status": "success", "run_id": run_id, **series}),
+                         etag=f'run-{run_id}-{series["start"]}-{series["end"]}-{series["bucket_rows"]}')
+
+def _save_upload(file, path):
+    """Save an uploaded file block by block, returning the SHA-256 hex digest of its content."""
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        while True:
+            block = file.stream.read(UPLOAD_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
+
+def _memo_key(digest, options):
+    """
+    Memo key of an upload: its content hash, the model version and every
+    analysis option that changes the result. A shadow model is keyed by its
+    version too, so replacing it invalidates the memo.
+    """
+    parts = [digest, registry.version(job_queue.model_path)]
+    for name, value in sorted(options.items()):
+        if name == 'workers':
+            # Only spreads the work over processes; the result is the same
+            continue
+        if name == 'shadow_model_path' and os.path.exists(value):
+            value = registry.version(value)
+        parts.append(f"{name}={value}")
+    return ':'.join(parts)
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
@@ -114,49 +355,346 @@ def analyze():
     if not os.path.exists(sample_dir):
         os.makedirs(sample_dir, exist_ok=True)
 
-    # Create results directory if it doesn't exist
-    results_dir = 'results'
-    if not os.path.exists(results_dir):
-        os.makedirs(results_dir, exist_ok=True)
+    # CSV or a columnar format (Parquet, Feather, structured .npy)
+    from data_io import SUPPORTED_EXTENSIONS
+    extension = os.path.splitext(file.filename)[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        return jsonify({
+            "status": "error",
+            "message": f"Unsupported file type '{extension}' (expected one of {', '.join(SUPPORTED_EXTENSIONS)})"
+        }), 400
 
-    # Save the uploaded file with a timestamp and UUID
-    import uuid
-    file_uuid = str(uuid.uuid4())
-    temp_file_path = f"{sample_dir}/sampled_data_{file_uuid}.csv"
-    file.save(temp_file_path)
+    try:
+        max_data_points = int(request.form.get('max_data_points', 1000))
+        if max_data_points < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "max_data_points must be a positive integer"
+        }), 400
+
+    # by_profile=1 adds a summary per test profile (see analyze_by_profile),
+    # which reads the whole file and does not shadow-score
+    by_profile = request.form.get('by_profile') == '1'
+    options = {'max_data_points': max_data_points}
+    if by_profile:
+        options['by_profile'] = True
+        options['workers'] = PROFILE_WORKERS
+    else:
+        if os.environ.get('MOTOR_ANALYSIS_CHUNKSIZE'):
+            options['chunksize'] = int(os.environ['MOTOR_ANALYSIS_CHUNKSIZE'])
+        if SHADOW_MODEL_PATH:
+            options['shadow_model_path'] = SHADOW_MODEL_PATH
 
+    # Save the uploaded file under a UUID, hashing it on the way in. The
+    # upload is removed on every path that does not hand it to a job
+    temp_file_path = f"{sample_dir}/sampled_data_{uuid.uuid4()}{extension}"
+    submitted = False
     try:
-        # Analyze the data
-        results = analyze_motor_data(data_path=temp_file_path)
+        digest = _save_upload(file, temp_file_path)
+
+        # Identical content analyzed by the same model with the same options
+        # gives the same result, so serve the stored run instead of rescoring
+        key = _memo_key(digest, options)
+        use_memo = MEMO_MAX_BYTES > 0 and request.form.get('refresh') != '1'
+        if use_memo:
+            run_id = results_store.memo_lookup(key, max_age=MEMO_MAX_AGE)
+            if run_id is not None:
+                return jsonify({
+                    "status": "cached",
+                    "run_id": run_id,
+                    "result_url": url_for('get_run', run_id=run_id)
+                })
+
+        with inflight_lock:
+            job_id = inflight.get(key) if use_memo else None
+        if job_id is None:
+            wait_for_warmup()
+            job_id = job_queue.submit(temp_file_path, **options)
+            submitted = True
+            if MEMO_MAX_BYTES > 0:
+                with inflight_lock:
+                    inflight.setdefault(key, job_id)
+                    job_keys[job_id] = key
+                # The job may have finished before its key was registered
+                status = job_queue.status(job_id)
+                if status is None or status["state"] in (DONE, FAILED, CANCELLED):
+                    _settle_job(job_id)
+    except QueueFull as e:
+        response = jsonify({
+            "status": "error",
+            "message": f"Analysis queue is full, please retry later ({str(e)})"
+        })
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    except Exception as e:
+        print(f"Error accepting upload: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Error saving upload: {str(e)}"
+        }), 500
+    finally:
+        if not submitted and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
 
-        if results["status"] != "success":
-            return jsonify(convert_numpy_types(results)), 500
+    return jsonify({
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": url_for('job_status', job_id=job_id),
+        "result_url": url_for('job_result', job_id=job_id)
+    }), 202
 
-        # Save the analysis result
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        # Use the custom encoder when dumping the results
-        latest_file = 'motor_analysis_latest.json'
-        # Also save a timestamped version
-        timestamped_file = f'{results_dir}/motor_analysis_{timestamp}.json'
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({
+            "status": "error",
+            "message": "Unknown or expired job"
+        }), 404
+    return jsonify(status)
 
-        # Write both files
-        for filename in [latest_file, timestamped_file]:
-            with open(filename, 'w') as f:
-                json.dump(results, f, indent=2, cls=NumpyEncoder)
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({
+            "status": "error",
+            "message": "Unknown or expired job"
+        }), 404
 
-        # Convert numpy types to standard Python types before JSON serialization
-        os.remove(temp_file_path)
-        return jsonify(convert_numpy_types(results))
+    if status["state"] == DONE:
+        # The worker saved the result; serve the stored payload as is
+        run_id = job_queue.result(job_id)["run_id"]
+        found = results_store.get(run_id)
+        if found is None:
+            return jsonify({
+                "status": "error",
+                "message": "Result no longer available"
+            }), 410
+        return json_response(found[1], etag=f'run-{run_id}')
+    if status["state"] == FAILED:
+        return jsonify({
+            "status": "error",
+            "message": status.get("message", "Analysis failed")
+        }), 500
+    if status["state"] == CANCELLED:
+        return jsonify({
+            "status": "error",
+            "message": "Analysis was cancelled"
+        }), 410
 
-    except Exception as e:
-        error_details = traceback.format_exc()
-        print(f"Error during analysis: {error_details}")
+    # Still queued or running
+    return jsonify(status), 202
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    if not job_queue.cancel(job_id):
+        return jsonify({
+            "status": "error",
+            "message": "Job not found or already finished"
+        }), 404
+    return jsonify(job_queue.status(job_id))
 
+@app.route('/api/score', methods=['POST'])
+def score_rows():
+    """
+    Score a small set of rows without creating an analysis run.
+
+    The body is a JSON array of rows, or an object with "rows" and, for
+    array rows, their "columns". Concurrent requests share batched scorer
+    calls; see MicroBatcher.
+    """
+    try:
+        body = loads(request.get_data())
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid JSON body: {str(e)}"
+        }), 400
+
+    rows = body.get("rows") if isinstance(body, dict) else body
+    if not isinstance(rows, list) or not rows:
+        return jsonify({
+            "status": "error",
+            "message": "No rows provided"
+        }), 400
+    if len(rows) > MAX_SCORE_ROWS:
+        return jsonify({
+            "status": "error",
+            "message": f"At most {MAX_SCORE_ROWS} rows per request; use /api/analyze for files"
+        }), 413
+
+    try:
+        values = rows_to_matrix(rows, batcher.manifest(), body.get("columns") if isinstance(body, dict) else None)
+        errors, threshold = batcher.score(values)
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid rows: {str(e)}"
+        }), 400
+    except QueueFull as e:
+        response = jsonify({
+            "status": "error",
+            "message": f"Scoring queue is full, please retry later ({str(e)})"
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    except Exception as e:
         return jsonify({
             "status": "error",
-            "message": f"Error analyzing data: {str(e)}"
+            "message": f"Error during anomaly detection: {str(e)}"
         }), 500
 
+    anomalies = np.flatnonzero(errors > threshold)
+    return json_response(dumps({
+        "status": "success",
+        "threshold": threshold,
+        "errors": errors,
+        "anomaly_indices": anomalies,
+        "anomaly_count": len(anomalies)
+    }))
+
+def _parse_ndjson(body):
+    """Parse a newline-delimited JSON body into a list of row dicts."""
+    rows = []
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {line_number}: {str(e)}")
+        if not isinstance(row, dict):
+            raise ValueError(f"line {line_number}: expected a JSON object")
+        rows.append(row)
+    return rows
+
+@app.route('/api/streams/<stream_id>/ingest', methods=['POST'])
+def ingest_stream(stream_id):
+    try:
+        rows = _parse_ndjson(request.get_data(as_text=True))
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid NDJSON body: {str(e)}"
+        }), 400
+
+    if not rows:
+        return jsonify({
+            "status": "error",
+            "message": "No rows provided"
+        }), 400
+
+    from streaming import MotorStreamAnalyzer
+
+    with streams_lock:
+        now = time.time()
+        _evict_idle_streams(now)
+        entry = streams.get(stream_id)
+        if entry is None:
+            if len(streams) >= MAX_STREAMS:
+                response = jsonify({
+                    "status": "error",
+                    "message": f"Too many open streams ({MAX_STREAMS}), close one or retry later"
+                })
+                # The least recently fed stream is the next one to go idle
+                oldest = stream_last_used[next(iter(streams))] if streams else now
+                idle_in = STREAM_IDLE_SECONDS - (now - oldest)
+                response.headers['Retry-After'] = str(int(idle_in) + 1)
+                return response, 429
+            try:
+                entry = streams[stream_id] = (MotorStreamAnalyzer(), threading.Lock())
+            except Exception as e:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Failed to load model: {str(e)}"
+                }), 500
+        streams.move_to_end(stream_id)
+        stream_last_used[stream_id] = now
+
+    analyzer, lock = entry
+    try:
+        # Batches for the same stream are scored in arrival order
+        with lock:
+            update = analyzer.ingest(rows, max_points=STREAM_DELTA_POINTS)
+    except ValueError as e:
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+
+    # Push only what changed to dashboards watching this stream
+    points = update.pop("points")
+    if points is not None:
+        events.publish('delta', {
+            "stream_id": stream_id,
+            "points": points,
+            "threshold": float(analyzer.model_data['error_threshold']),
+            "anomaly_summary": update["anomaly_summary"],
+            "temperature_analysis": update["temperature_analysis"]
+        }, topic=stream_id)
+
+    return json_response(dumps({"status": "success", "stream_id": stream_id, **update}))
+
+@app.route('/api/streams/<stream_id>', methods=['GET'])
+def stream_result(stream_id):
+    entry = streams.get(stream_id)
+    if entry is None or entry[0].running is None:
+        return jsonify({
+            "status": "error",
+            "message": "Unknown stream"
+        }), 404
+
+    analyzer, lock = entry
+    with lock:
+        result = analyzer.result()
+    return json_response(dumps(result))
+
+@app.route('/api/streams/<stream_id>', methods=['DELETE'])
+def reset_stream(stream_id):
+    with streams_lock:
+        entry = streams.pop(stream_id, None)
+        stream_last_used.pop(stream_id, None)
+    if entry is None:
+        return jsonify({
+            "status": "error",
+            "message": "Unknown stream"
+        }), 404
+    return jsonify({"status": "success", "stream_id": stream_id})
+
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    # Server-Sent Events: run notifications, plus deltas for ?stream=<id>
+    subscription = events.subscribe(topic=request.args.get('stream'))
+    response = Response(stream_with_context(events.stream(subscription)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness only; answers before the model is loaded
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    if ready.is_set():
+        return jsonify({"status": "ready", "warmup_seconds": warmup_state["seconds"]})
+    if warmup_state["error"] is not None:
+        # e.g. the model file is not there yet; try again
+        error = warmup_state["error"]
+        start_warmup()
+        return jsonify({"status": "error", "message": f"Warm-up failed: {error}"}), 503
+    return jsonify({"status": "starting"}), 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus text exposition format
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Add a route to serve static files from the static folder
 @app.route('/static/<path:path>')
 def serve_static(path):
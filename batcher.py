@@ -0,0 +1,273 @@
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from fused_scorer import ShadowScorer
+from instrumentation import metrics
+from jobs import QueueFull
+from model_registry import DEFAULT_MODEL_PATH, load_model, load_scorer
+from model_versions import shadow_summary
+from preprocessing import model_manifest, source_columns, training_means
+
+_STOP = object()
+
+
+def rows_to_matrix(rows, manifest, columns=None):
+    """
+    Convert JSON rows into a feature matrix in model column order.
+
+    Rows are either objects keyed by raw or model column names (e.g.
+    'coolant' or 'coolant_temperature'), or arrays whose values follow
+    `columns` (default: the model's columns). Every model column must be
+    given and have a value in at least one row; otherwise the rows would be
+    scored against training means and look healthy. Remaining null values
+    (and keys missing from some object rows) are replaced by the column's
+    training mean, since single rows have no neighbours to fill from.
+
+    Args:
+        rows: List of row dicts or lists
+        manifest: Feature manifest of the model (see model_manifest)
+        columns: Column names of array rows
+
+    Returns:
+        np.ndarray: float64 matrix with one row per input row
+
+    Raises:
+        ValueError: If a model column is missing or has no values, or a row
+                    has the wrong shape or a non-numeric value
+    """
+    model_columns = manifest['columns']
+    if rows and isinstance(rows[0], dict):
+        header = set().union(*(row.keys() for row in rows))
+        mapping = source_columns(header, model_columns)
+        _check_columns(mapping, model_columns)
+        raw = {model: source for source, model in mapping.items()}
+        table = [[row.get(raw[col]) for col in model_columns] for row in rows]
+    else:
+        columns = list(columns or model_columns)
+        mapping = source_columns(columns, model_columns)
+        _check_columns(mapping, model_columns)
+        positions = {model: columns.index(source) for source, model in mapping.items()}
+        table = []
+        for i, row in enumerate(rows):
+            if not isinstance(row, (list, tuple)) or len(row) != len(columns):
+                raise ValueError(f"row {i}: expected an object or an array of {len(columns)} values")
+            table.append([row[positions[col]] for col in model_columns])
+
+    try:
+        values = np.array(table, dtype=np.float64).reshape(len(rows), len(model_columns))
+    except (TypeError, ValueError):
+        raise ValueError("rows must only contain numbers or null")
+
+    missing = np.isnan(values)
+    empty = [col for col, none in zip(model_columns, missing.all(axis=0)) if none]
+    if rows and empty:
+        raise ValueError(f"No values for model columns: {', '.join(empty)}")
+    if missing.any():
+        means = training_means(manifest)
+        means = np.array([means[col] for col in model_columns])
+        values[missing] = np.broadcast_to(means, values.shape)[missing]
+    return values
+
+
+def _check_columns(mapping, model_columns):
+    missing = [col for col in model_columns if col not in mapping.values()]
+    if missing:
+        raise ValueError(f"Missing model columns: {', '.join(missing)}")
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent scoring requests into batched scorer calls.
+
+    Requests are queued and a single background thread scores them. The
+    thread takes the first waiting request, then keeps collecting requests
+    until `max_batch_rows` rows are waiting or `max_wait` seconds have passed.
+    It scores the whole batch in one vectorized call and hands each request
+    its slice of the errors. A larger max_wait gives bigger batches (higher
+    throughput) at the cost of up to max_wait extra latency per request.
+
+    With a `shadow_model_path`, every batch is also scored by that candidate
+    model in the same pass, and the agreement of the two is recorded in the
+    process metrics. Requests always get the current model's errors.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, max_batch_rows=4096, max_wait=0.005,
+                 max_pending_rows=1_000_000, shadow_model_path=None):
+        self.model_path = model_path
+        self.shadow_model_path = shadow_model_path
+        self._shadow_error = None
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+        self.max_pending_rows = max_pending_rows
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending_rows = 0
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+
+    def manifest(self):
+        """Feature manifest of the current model."""
+        return model_manifest(load_model(self.model_path))
+
+    def _start(self):
+        # The scoring thread is started on first use
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, values):
+        """
+        Queue a feature matrix for scoring.
+
+        Args:
+            values: 2-D float array in model column order (see rows_to_matrix)
+
+        Returns:
+            Future: Resolves to (errors, threshold) for these rows
+
+        Raises:
+            QueueFull: If more than `max_pending_rows` rows are waiting
+        """
+        future = Future()
+        with self._lock:
+            if self._pending_rows + len(values) > self.max_pending_rows:
+                raise QueueFull(f"{self._pending_rows} rows are already waiting to be scored")
+            self._pending_rows += len(values)
+            self.requests += 1
+            self._start()
+        self._queue.put((values, future))
+        return future
+
+    def score(self, values, timeout=None):
+        """Score a feature matrix through the batcher and wait for (errors, threshold)."""
+        return self.submit(values).result(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            rows = len(item[0])
+            stop = False
+
+            # Keep collecting until the batch is full or the window closes
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            self._score_batch(batch, rows)
+            if stop:
+                return
+
+    def _score_batch(self, batch, rows):
+        with self._lock:
+            self._pending_rows -= rows
+            self.batches += 1
+            self.rows += rows
+
+        try:
+            # The registry returns the cached model, or reloads a changed file
+            model_data = load_model(self.model_path)
+            scorer = load_scorer(model_data)
+            values = batch[0][0] if len(batch) == 1 else np.concatenate([values for values, _ in batch])
+            errors = self._shadow_score(model_data, scorer, values) if self.shadow_model_path else None
+            if errors is None:
+                errors = scorer.score(values)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        threshold = float(model_data['error_threshold'])
+        offsets = np.cumsum([len(values) for values, _ in batch])[:-1]
+        for (_, future), part in zip(batch, np.split(errors, offsets)):
+            future.set_result((part, threshold))
+
+    def _shadow_score(self, model_data, scorer, values):
+        # Score with the current and the candidate model; a broken candidate
+        # only costs the shadow statistics (None: score without it)
+        try:
+            candidate_data = load_model(self.shadow_model_path)
+            if model_manifest(candidate_data)['columns'] != model_manifest(model_data)['columns']:
+                raise ValueError("candidate model expects different feature columns")
+            shadow_scorer = ShadowScorer(scorer, load_scorer(candidate_data))
+        except Exception as e:
+            # Reported once, not for every batch
+            if str(e) != self._shadow_error:
+                print(f"Shadow scoring skipped: {str(e)}")
+            self._shadow_error = str(e)
+            return None
+        self._shadow_error = None
+        errors, candidate_errors = shadow_scorer.score(values)
+        metrics.record_shadow(shadow_summary(errors, candidate_errors, model_data['error_threshold'],
+                                             candidate_data['error_threshold']))
+        return errors
+
+    def stats(self):
+        """Requests, batches and rows scored so far, and rows waiting."""
+        with self._lock:
+            return {"requests": self.requests, "batches": self.batches, "rows": self.rows,
+                    "pending_rows": self._pending_rows}
+
+    def shutdown(self):
+        """Score what is queued, then stop the scoring thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    # Compare many concurrent small requests with and without batching
+    import pandas as pd
+    from analyze_motor_data import analyze_motor_data
+
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    rows_per_request = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    requests_per_client = 20
+
+    sample = pd.read_csv('sample_data/sampled_data_3000.csv')
+    records = sample.head(rows_per_request).to_dict('records')
+    batcher = MicroBatcher()
+    manifest = batcher.manifest()
+
+    def batched():
+        for _ in range(requests_per_client):
+            batcher.score(rows_to_matrix(records, manifest))
+
+    def per_request():
+        for _ in range(requests_per_client):
+            analyze_motor_data(data_df=pd.DataFrame.from_records(records))
+
+    for name, client in (("analyze_motor_data per request", per_request), ("micro-batched", batched)):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            for future in [pool.submit(client) for _ in range(clients)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        total = clients * requests_per_client
+        print(f"{name:<32}{total / elapsed:>10,.0f} requests/s{total * rows_per_request / elapsed:>14,.0f} rows/s")
+
+    stats = batcher.stats()
+    print(f"{stats['requests']} requests scored in {stats['batches']} batches "
+          f"({stats['rows'] / max(stats['batches'], 1):.0f} rows per batch)")
+    batcher.shutdown()
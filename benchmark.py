@@ -0,0 +1,621 @@
+import argparse
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from add_time import SECONDS_PER_DAY, format_clock
+from analyze_motor_data import analyze_motor_data, build_result
+from data_io import FORMATS, FrameWriter, analysis_dtypes, read_frame, read_header
+from downsample import downsample_indices
+from model_registry import DEFAULT_MODEL_PATH, load_model, load_scorer, registry
+from preprocessing import model_manifest, prepare_analysis_frame
+from serialization import dumps, loads
+
+# Columns of measures_v2 (before add_time.py adds time and seconds)
+MEASURE_COLUMNS = ['u_q', 'coolant', 'stator_winding', 'u_d', 'stator_tooth', 'motor_speed', 'i_d', 'i_q', 'pm',
+                   'stator_yoke', 'ambient', 'torque']
+
+# Real rows that synthetic rows are resampled from
+SEED_FILE = 'sample_data/sampled_data_3000.csv'
+
+# Gaussian noise added to every resampled value, and the offset of injected
+# anomalies, in standard deviations of the column
+JITTER_STDS = 0.02
+ANOMALY_STDS = 8
+
+BENCHMARK_DIR = 'benchmark_results'
+
+# Stages of the production path, in pipeline order; scale, predict and error
+# are timed separately through sklearn, production fuses them into "score"
+STAGES = ['model_load', 'load', 'clean', 'scale', 'predict', 'error', 'score', 'stats', 'downsample',
+          'serialize']
+PIPELINE_STAGES = ['load', 'clean', 'score', 'stats', 'downsample', 'serialize']
+
+
+def labels_path(data_path):
+    """Path of the injected-anomaly mask written next to a synthetic data file."""
+    return os.path.splitext(data_path)[0] + '.labels.npy'
+
+
+def generate_synthetic_data(path, n_rows, anomaly_rate=0.01, seed=0, seed_file=SEED_FILE, chunksize=1_000_000):
+    """
+    Write synthetic motor data with the measures_v2 schema plus time/seconds.
+
+    Rows are drawn independently from `seed_file` (profile_id and seconds
+    included, since the model uses them as features) and the signals get a
+    little Gaussian jitter, so the joint distribution stays realistic. A
+    fraction of rows get one signal pushed ANOMALY_STDS standard deviations
+    away; the mask of those rows is saved next to the data (see labels_path).
+    Data is generated and written in chunks, so memory stays flat up to 10^8
+    rows and beyond.
+
+    Args:
+        path: Output file; its extension picks the format
+        n_rows: Number of rows
+        anomaly_rate: Fraction of rows with an injected anomaly
+        seed: Random seed
+        seed_file: Real data to resample from
+        chunksize: Rows generated per chunk
+
+    Returns:
+        int: Number of injected anomalies
+    """
+    source = read_frame(seed_file, MEASURE_COLUMNS + ['profile_id', 'seconds'])
+    base = source[MEASURE_COLUMNS].to_numpy(dtype=np.float64)
+    profile_ids = source['profile_id'].to_numpy()
+    seconds = source['seconds'].to_numpy()
+    stds = base.std(axis=0)
+    rng = np.random.default_rng(seed)
+    labels = np.lib.format.open_memmap(labels_path(path), mode='w+', dtype=bool, shape=(n_rows,))
+
+    injected = 0
+    with FrameWriter(path) as writer:
+        for start in range(0, n_rows, chunksize):
+            n = min(chunksize, n_rows - start)
+            picks = rng.integers(len(base), size=n)
+            values = base[picks]
+            values += rng.standard_normal(values.shape) * (JITTER_STDS * stds)
+
+            anomalous = rng.random(n) < anomaly_rate
+            rows = np.flatnonzero(anomalous)
+            cols = rng.integers(len(MEASURE_COLUMNS), size=len(rows))
+            values[rows, cols] += rng.choice([-1.0, 1.0], size=len(rows)) * ANOMALY_STDS * stds[cols]
+            labels[start:start + n] = anomalous
+            injected += len(rows)
+
+            chunk = pd.DataFrame(values, columns=MEASURE_COLUMNS)
+            chunk['profile_id'] = profile_ids[picks]
+            chunk['time'] = format_clock(seconds[picks] % SECONDS_PER_DAY)
+            chunk['seconds'] = seconds[picks]
+            writer.write(chunk)
+    labels.flush()
+    return injected
+
+
+def time_stages(data_path, model_path=DEFAULT_MODEL_PATH, max_data_points=1000):
+    """
+    Time every stage of analyze_motor_data on one file.
+
+    Runs the same steps as analyze_motor_data one at a time. "stats" is the
+    time build_result spends outside downsampling.
+
+    Returns:
+        tuple: (stage -> seconds, result dict, per-row reconstruction errors)
+    """
+    timings = {}
+    clock = time.perf_counter
+
+    # Cold model load
+    registry.clear()
+    start = clock()
+    model_data = load_model(model_path)
+    scorer = load_scorer(model_data)
+    manifest = model_manifest(model_data)
+    timings['model_load'] = clock() - start
+
+    start = clock()
+    dtypes = analysis_dtypes(read_header(data_path), manifest['columns'])
+    df = read_frame(data_path, list(dtypes), dtypes)
+    timings['load'] = clock() - start
+
+    start = clock()
+    df_analysis, time_data, temp_columns = prepare_analysis_frame(df, manifest['columns'], manifest['temp_columns'])
+    df_analysis = df_analysis.ffill().bfill()
+    X = df_analysis.to_numpy(dtype=np.float64)
+    timings['clean'] = clock() - start
+    del df
+
+    # The sklearn pipeline, stage by stage
+    start = clock()
+    X_scaled = model_data['scaler'].transform(X)
+    timings['scale'] = clock() - start
+    start = clock()
+    X_reconstructed = model_data['autoencoder'].predict(X_scaled)
+    timings['predict'] = clock() - start
+    start = clock()
+    np.mean((X_scaled - X_reconstructed) ** 2, axis=1)
+    timings['error'] = clock() - start
+    del X_scaled, X_reconstructed
+
+    # The fused production path
+    start = clock()
+    errors = scorer.score(X)
+    timings['score'] = clock() - start
+
+    start = clock()
+    plotted = [col for col in manifest['temp_columns'] if col in df_analysis.columns]
+    downsample_indices(errors, [X[:, df_analysis.columns.get_loc(col)] for col in plotted], max_data_points,
+                       errors > model_data['error_threshold'])
+    timings['downsample'] = clock() - start
+
+    start = clock()
+    result = build_result(df_analysis, time_data, temp_columns, errors, model_data['error_threshold'],
+                          manifest['column_stats'], max_data_points)
+    timings['stats'] = max(clock() - start - timings['downsample'], 0.0)
+
+    start = clock()
+    dumps(result)
+    timings['serialize'] = clock() - start
+    return timings, result, errors
+
+
+@contextmanager
+def _scratch_results():
+    """
+    Point the API and its job workers at a temporary results store.
+
+    Benchmark uploads are recorded there instead of in results/, and the
+    latest file the dashboard reads is left alone.
+    """
+    import api
+    import results_store
+
+    with tempfile.TemporaryDirectory() as results_dir, results_store.temporary_store(results_dir) as scratch:
+        previous = api.results_store
+        api.results_store = scratch
+        try:
+            yield
+        finally:
+            # The job workers were forked with the scratch store; stop them
+            # before it is removed
+            api.job_queue.shutdown()
+            api.results_store = previous
+
+
+def _error_message(response):
+    # Error responses carry a "message"; anything else is shown as it came
+    try:
+        body = loads(response.data)
+    except ValueError:
+        body = None
+    if isinstance(body, dict) and "message" in body:
+        return body["message"]
+    return response.get_data(as_text=True)[:200]
+
+
+def _upload(client, data_path, refresh):
+    with open(data_path, 'rb') as f:
+        data = {'file': (f, os.path.basename(data_path))}
+        if refresh:
+            data['refresh'] = '1'
+        return client.post('/api/analyze', data=data, content_type='multipart/form-data')
+
+
+def time_api_round_trip(data_path, poll_interval=0.05, timeout=3600):
+    """
+    Time uploading a file to /api/analyze until its result can be fetched.
+
+    Uses Flask's test client, so the request goes through the real routes,
+    job queue and results store (run_benchmark points them at a temporary
+    store).
+    The upload is sent with refresh=1, so a stored result of the same file
+    is never served instead of a full analysis (see time_api_cached).
+    """
+    from api import app
+
+    client = app.test_client()
+    start = time.perf_counter()
+    response = _upload(client, data_path, refresh=True)
+    if response.status_code != 202:
+        raise RuntimeError(f"Upload failed ({response.status_code}): {_error_message(response)}")
+
+    result_url = response.get_json()['result_url']
+    while True:
+        response = client.get(result_url)
+        if response.status_code != 202:
+            break
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError(f"No result after {timeout} seconds")
+        time.sleep(poll_interval)
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"Analysis failed ({response.status_code}): {_error_message(response)}")
+    return elapsed
+
+
+def time_api_cached(data_path):
+    """
+    Time uploading a file that was already analyzed until its stored result is fetched.
+
+    Call after time_api_round_trip on the same file: the upload is answered
+    from the memo of identical uploads (200 "cached") without scoring.
+
+    Returns:
+        float: Seconds, or None if the API did not serve a stored result
+               (e.g. memoization is disabled)
+    """
+    from api import app
+
+    client = app.test_client()
+    start = time.perf_counter()
+    response = _upload(client, data_path, refresh=False)
+    if response.status_code == 202:
+        return None
+    if response.status_code != 200:
+        raise RuntimeError(f"Upload failed ({response.status_code}): {_error_message(response)}")
+    response = client.get(response.get_json()['result_url'])
+    if response.status_code != 200:
+        raise RuntimeError(f"Fetching the stored run failed ({response.status_code}): {_error_message(response)}")
+    return time.perf_counter() - start
+
+
+# Cold-start probes, each run in a fresh interpreter; they print their timings
+_API_STARTUP = """
+import time
+start = time.perf_counter()
+import api
+imported = time.perf_counter() - start
+api.warmup_state["thread"].join()
+if not api.ready.is_set():
+    raise SystemExit(api.warmup_state["error"])
+print(imported, time.perf_counter() - start)
+"""
+
+_MODEL_STARTUP = """
+import sys, time
+start = time.perf_counter()
+from model_registry import load_model, load_scorer
+load_scorer(load_model(sys.argv[1]))
+print(time.perf_counter() - start)
+"""
+
+
+# One in-memory analysis in a fresh interpreter, after a small warm-up run
+# that imports the pipeline and loads the model; prints seconds, peak and
+# post-warm-up resident memory in MB, the row count and the anomaly count
+_ANALYSIS_RUN = """
+import sys, time
+from analyze_motor_data import analyze_motor_data
+from instrumentation import peak_memory_mb
+from serialization import dumps
+path, model_path, compact = sys.argv[1], sys.argv[2], sys.argv[3] == 'compact'
+analyze_motor_data('%s', model_path=model_path, compact=compact)
+baseline = peak_memory_mb()
+start = time.perf_counter()
+result = analyze_motor_data(path, model_path=model_path, compact=compact)
+dumps(result)
+summary = result['anomaly_summary']
+print(time.perf_counter() - start, peak_memory_mb(), baseline, summary['total_records'], summary['anomaly_count'])
+""" % SEED_FILE
+
+
+def _cold_run(args):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable] + args, capture_output=True, text=True, check=True).stdout
+    return time.perf_counter() - start, [float(value) for value in output.split()] if args[0] == '-c' else []
+
+
+def time_startup(model_path=DEFAULT_MODEL_PATH, repeat=3):
+    """
+    Time cold starts of the entry points, each in a fresh interpreter.
+
+    Returns:
+        dict: Best of `repeat` runs, in seconds, of `main.py --help` (process
+              start to exit), importing api (when /healthz can answer), api
+              until its background warm-up finished (/readyz ready) and
+              loading the model with nothing imported yet
+    """
+    best = {}
+
+    def keep(name, seconds):
+        best[name] = min(best.get(name, seconds), seconds)
+
+    for _ in range(repeat):
+        keep("main_help", _cold_run(['main.py', '--help'])[0])
+        imported, ready = _cold_run(['-c', _API_STARTUP])[1]
+        keep("api_import", imported)
+        keep("api_ready", ready)
+        keep("model_load", _cold_run(['-c', _MODEL_STARTUP, model_path])[1][0])
+    return best
+
+
+def time_compact(data_path, model_path=DEFAULT_MODEL_PATH, repeat=1):
+    """
+    Compare the default and the compact in-memory analysis of one file.
+
+    Each mode runs in a fresh interpreter, so its peak memory is its own. A
+    mode that fails (e.g. killed for running out of memory) is recorded with
+    its exit status instead of timings.
+
+    Returns:
+        dict: mode -> seconds (best of `repeat`, including serialization),
+              rows_per_second, peak_memory_mb, base_memory_mb (after imports
+              and model load) and anomaly_count
+    """
+    modes = {}
+    for mode in ('default', 'compact'):
+        best = None
+        for _ in range(repeat):
+            process = subprocess.run([sys.executable, '-c', _ANALYSIS_RUN, data_path, model_path, mode],
+                                     capture_output=True, text=True)
+            if process.returncode != 0:
+                best = {"failed": process.returncode, "message": process.stderr.strip()[-500:]}
+                break
+            seconds, peak, base, rows, anomalies = (float(value) for value in process.stdout.split()[-5:])
+            if best is None or seconds < best["seconds"]:
+                best = {"seconds": seconds, "rows_per_second": rows / seconds, "peak_memory_mb": peak,
+                        "base_memory_mb": base, "anomaly_count": int(anomalies)}
+        modes[mode] = best
+    return modes
+
+
+def environment():
+    """Versions and hardware a benchmark ran on."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def run_benchmark(sizes, data_format='csv', model_path=DEFAULT_MODEL_PATH, anomaly_rate=0.01, repeat=1,
+                  api=False, max_in_memory=5_000_000, chunksize=1_000_000, data_dir=None, seed=0, startup=False,
+                  compact=False):
+    """
+    Generate synthetic data at several sizes and time the analysis of each.
+
+    Sizes up to `max_in_memory` rows get per-stage timings plus an end-to-end
+    analyze_motor_data run; larger sizes are only timed end to end through
+    the chunked streaming path. Stage timings are the best of `repeat` runs.
+    End-to-end runs also keep the timing block of their result, which has the
+    peak memory of every stage.
+
+    Args:
+        sizes: Row counts to benchmark
+        data_format: Format of the generated files ('csv', 'parquet', 'feather' or 'npy')
+        model_path: Path to the trained model file
+        anomaly_rate: Fraction of rows with an injected anomaly
+        repeat: Runs per size
+        api: Also time the /api/analyze round trip
+        max_in_memory: Largest size timed stage by stage
+        chunksize: Rows per chunk for generation and the chunked path
+        data_dir: Keep the generated files here (default: a temporary directory)
+        seed: Random seed for the generated data
+        startup: Also time cold starts of the entry points (see time_startup)
+        compact: Also compare the default and the compact in-memory analysis
+                 at every size, whatever `max_in_memory` (see time_compact)
+
+    Returns:
+        dict: Environment, configuration, one entry per size and, with
+              `startup`, the cold-start timings
+    """
+    report = {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "environment": environment(),
+        "config": {"format": data_format, "model_path": model_path, "anomaly_rate": anomaly_rate,
+                   "repeat": repeat, "chunksize": chunksize, "seed": seed, "compact": compact},
+        "runs": []
+    }
+    if startup:
+        # Before anything is imported or loaded in this process
+        report["startup"] = time_startup(model_path, max(repeat, 3))
+        print_startup(report["startup"])
+    threshold = load_model(model_path)['error_threshold']
+
+    with tempfile.TemporaryDirectory() as tmp_dir, (_scratch_results() if api else nullcontext()):
+        directory = data_dir or tmp_dir
+        os.makedirs(directory, exist_ok=True)
+        for n_rows in sizes:
+            path = os.path.join(directory, f'synthetic_{n_rows}{FORMATS[data_format]}')
+            print(f"\nGenerating {n_rows:,} rows -> {path}")
+            start = time.perf_counter()
+            injected = generate_synthetic_data(path, n_rows, anomaly_rate, seed=seed, chunksize=chunksize)
+            run = {
+                "rows": n_rows,
+                "format": data_format,
+                "file_mb": os.path.getsize(path) / 1e6,
+                "generate_seconds": time.perf_counter() - start,
+                "injected_anomalies": injected,
+                "stages": None,
+                "rows_per_second": None
+            }
+
+            if n_rows <= max_in_memory:
+                best = {}
+                for _ in range(repeat):
+                    timings, result, errors = time_stages(path, model_path)
+                    for stage, seconds in timings.items():
+                        best[stage] = min(best.get(stage, seconds), seconds)
+                run["stages"] = best
+                run["pipeline_seconds"] = sum(best[stage] for stage in PIPELINE_STAGES)
+                run["rows_per_second"] = {stage: n_rows / seconds for stage, seconds in best.items() if seconds > 0}
+
+                # Detection quality on the injected anomalies
+                labels = np.load(labels_path(path))
+                detected = errors > threshold
+                run["anomaly_count"] = result["anomaly_summary"]["anomaly_count"]
+                run["recall"] = float((detected & labels).sum() / max(labels.sum(), 1))
+                run["false_positive_rate"] = float((detected & ~labels).sum() / max((~labels).sum(), 1))
+                del errors, result
+
+                start = time.perf_counter()
+                result = analyze_motor_data(path, model_path=model_path, timing=True)
+                run["end_to_end_seconds"] = time.perf_counter() - start
+                run["end_to_end_timing"] = result["timing"]
+            else:
+                start = time.perf_counter()
+                result = analyze_motor_data(path, model_path=model_path, chunksize=chunksize, timing=True)
+                run["chunked_seconds"] = time.perf_counter() - start
+                run["chunked_timing"] = result["timing"]
+                run["anomaly_count"] = result["anomaly_summary"]["anomaly_count"]
+
+            if compact:
+                run["compact"] = time_compact(path, model_path, repeat)
+
+            if api:
+                run["api_round_trip_seconds"] = time_api_round_trip(path)
+                run["api_cached_seconds"] = time_api_cached(path)
+
+            report["runs"].append(run)
+            print_run(run)
+            os.remove(labels_path(path))
+            if not data_dir:
+                os.remove(path)
+    return report
+
+
+def peak_memory(timing):
+    """Highest peak memory (MB) over the stages of a timing block."""
+    return max((stage.get("peak_memory_mb") or 0 for stage in timing["stages"].values()), default=0)
+
+
+def print_run(run):
+    print(f"{run['rows']:,} rows ({run['file_mb']:.1f} MB, generated in {run['generate_seconds']:.2f}s, "
+          f"{run['injected_anomalies']:,} injected anomalies)")
+    if run["stages"]:
+        for stage in STAGES:
+            seconds = run["stages"][stage]
+            rate = run["rows_per_second"].get(stage)
+            print(f"  {stage:<12}{seconds:>10.4f}s" + (f"{rate:>16,.0f} rows/s" if rate else ""))
+        print(f"  {'pipeline':<12}{run['pipeline_seconds']:>10.4f}s")
+        print(f"  {'end to end':<12}{run['end_to_end_seconds']:>10.4f}s"
+              f"{peak_memory(run['end_to_end_timing']):>16,.0f} MB peak")
+        print(f"  recall {run['recall']:.3f}, false positive rate {run['false_positive_rate']:.4f}")
+    else:
+        print(f"  {'chunked':<12}{run['chunked_seconds']:>10.4f}s"
+              f"{peak_memory(run['chunked_timing']):>16,.0f} MB peak")
+    if "api_round_trip_seconds" in run:
+        print(f"  {'api':<12}{run['api_round_trip_seconds']:>10.4f}s")
+    if run.get("api_cached_seconds") is not None:
+        print(f"  {'api cached':<12}{run['api_cached_seconds']:>10.4f}s")
+    for mode, timing in (run.get("compact") or {}).items():
+        if "failed" in timing:
+            print(f"  {mode:<12}    failed (exit status {timing['failed']})")
+        else:
+            print(f"  {mode:<12}{timing['seconds']:>10.4f}s{timing['rows_per_second']:>16,.0f} rows/s"
+                  f"{timing['peak_memory_mb']:>10,.0f} MB peak ({timing['base_memory_mb']:,.0f} MB before), "
+                  f"{timing['anomaly_count']:,} anomalies")
+
+
+def print_startup(startup):
+    print("Cold start")
+    for name, seconds in startup.items():
+        print(f"  {name:<12}{seconds:>10.4f}s")
+
+
+def compare(report, baseline, tolerance=1.2, min_seconds=0.01):
+    """
+    Compare timings against an earlier report.
+
+    Runs are matched by row count and format; a stage is a regression when it
+    got more than `tolerance` times slower. Stages faster than `min_seconds`
+    in both reports are too noisy to compare and are skipped. Cold-start
+    timings are compared too when both reports have them, under rows 0.
+
+    Returns:
+        list: (rows, stage, baseline seconds, seconds) of every regression
+    """
+    def timed(run):
+        seconds = dict(run["stages"] or {})
+        for key in ("pipeline_seconds", "end_to_end_seconds", "chunked_seconds", "api_round_trip_seconds",
+                    "api_cached_seconds"):
+            if run.get(key) is not None:
+                seconds[key[:-len('_seconds')]] = run[key]
+        for mode, timing in (run.get("compact") or {}).items():
+            if "seconds" in timing:
+                seconds[mode] = timing["seconds"]
+        return seconds
+
+    previous = {(run["rows"], run["format"]): timed(run) for run in baseline["runs"]}
+    runs = list(report["runs"])
+    if "startup" in report and "startup" in baseline:
+        previous[(0, "startup")] = baseline["startup"]
+        runs.insert(0, {"rows": 0, "format": "startup", "stages": report["startup"]})
+    regressions = []
+    print(f"\nCompared with {baseline['created_at']} ({baseline['environment'].get('commit')}):")
+    for run in runs:
+        before = previous.get((run["rows"], run["format"]))
+        if before is None:
+            continue
+        for stage, seconds in timed(run).items():
+            if stage not in before or max(before[stage], seconds) < min_seconds:
+                continue
+            ratio = seconds / before[stage]
+            flag = " REGRESSION" if ratio > tolerance else ""
+            print(f"  {run['rows']:>12,} {stage:<14}{before[stage]:>10.4f}s -> {seconds:>10.4f}s "
+                  f"({ratio:.2f}x){flag}")
+            if flag:
+                regressions.append((run["rows"], stage, before[stage], seconds))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the motor analysis pipeline on synthetic data")
+    parser.add_argument('--sizes', type=float, nargs='*', default=[1e3, 1e4, 1e5, 1e6],
+                        help="Row counts to benchmark, e.g. 1e3 1e5 1e8 (none with --startup: startup only)")
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--anomaly-rate', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--api', action='store_true',
+                        help="Also time the /api/analyze round trip (records the uploads as runs)")
+    parser.add_argument('--startup', action='store_true',
+                        help="Also time cold starts of main.py, the API and the model load")
+    parser.add_argument('--compact', action='store_true',
+                        help="Also compare peak memory and throughput of the default and the compact "
+                             "in-memory analysis at every size")
+    parser.add_argument('--max-in-memory', type=float, default=5e6,
+                        help="Larger sizes are only timed end to end in chunked mode")
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    parser.add_argument('--data-dir', help="Keep the generated data files here")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help=f"Report file (default: {BENCHMARK_DIR}/benchmark_<timestamp>.json)")
+    parser.add_argument('--baseline', help="Earlier report to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.2,
+                        help="Slowdown ratio counted as a regression when comparing")
+    args = parser.parse_args()
+
+    report = run_benchmark([int(n) for n in args.sizes], args.format, args.model, args.anomaly_rate, args.repeat,
+                           args.api, int(args.max_in_memory), args.chunksize, args.data_dir, args.seed,
+                           args.startup, args.compact)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(dumps(report))
+    print(f"\nBenchmark report written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'rb') as f:
+            regressions = compare(report, loads(f.read()), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.tolerance}x")
+            sys.exit(1)
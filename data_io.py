@@ -0,0 +1,380 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import source_columns
+
+# File formats accepted wherever motor data is read
+CSV_EXTENSIONS = ('.csv',)
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+FEATHER_EXTENSIONS = ('.feather', '.arrow')
+NUMPY_EXTENSIONS = ('.npy',)
+SUPPORTED_EXTENSIONS = CSV_EXTENSIONS + PARQUET_EXTENSIONS + FEATHER_EXTENSIONS + NUMPY_EXTENSIONS
+
+# Output format name -> file extension for the converter
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather', 'npy': '.npy'}
+
+# Rows per chunk when a file is read chunk by chunk into one matrix; the CSV
+# parser's working memory grows with the chunk, and parsing a whole file at
+# once takes several times the size of the frame it returns
+MATRIX_CHUNK_ROWS = 100_000
+
+
+def _format(path):
+    ext = os.path.splitext(path)[1].lower()
+    for name, extensions in (('csv', CSV_EXTENSIONS), ('parquet', PARQUET_EXTENSIONS),
+                             ('feather', FEATHER_EXTENSIONS), ('npy', NUMPY_EXTENSIONS)):
+        if ext in extensions:
+            return name
+    raise ValueError(f"Unsupported file type '{ext}' (expected one of {', '.join(SUPPORTED_EXTENSIONS)})")
+
+
+def _pyarrow(fmt):
+    # pyarrow is only needed for Parquet and Feather files
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(f"Reading or writing {fmt} files requires pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _load_npy(path):
+    data = np.load(path, mmap_mode='r')
+    if data.dtype.names is None:
+        raise ValueError(f"{path} must hold a structured array with one named field per column")
+    return data
+
+
+def read_header(path):
+    """Return the column names of a data file without reading its rows."""
+    fmt = _format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    if fmt == 'parquet':
+        return _pyarrow(fmt).parquet.read_schema(path).names
+    if fmt == 'feather':
+        pa = _pyarrow(fmt)
+        return pa.ipc.open_file(pa.memory_map(path)).schema.names
+    return list(_load_npy(path).dtype.names)
+
+
+def analysis_dtypes(header, column_names, extra=('time',), float_dtype=np.float64, text_dtype=object):
+    """
+    Choose the raw columns (and dtypes) an analysis needs from a file.
+
+    Args:
+        header: Column names of the file
+        column_names: Feature columns the model was trained on
+        extra: Non-feature columns to keep when present, read as text
+        float_dtype: dtype of the feature columns
+        text_dtype: dtype of the `extra` columns; 'category' stores every
+                    distinct value once, which is much smaller for time
+                    stamps that repeat
+
+    Returns:
+        dict: Raw column name -> dtype, features first in model order
+    """
+    dtypes = {col: float_dtype for col in source_columns(header, column_names)}
+    for col in extra:
+        if col in header:
+            dtypes[col] = text_dtype
+    return dtypes
+
+
+def _cast(frame, dtypes):
+    if dtypes:
+        frame = frame.astype({col: dtype for col, dtype in dtypes.items()
+                              if col in frame.columns and frame[col].dtype != dtype})
+    return frame
+
+
+def _npy_frame(data, columns):
+    frame = pd.DataFrame({col: np.asarray(data[col]) for col in columns})
+    for col in columns:
+        if frame[col].dtype.kind == 'U':
+            frame[col] = frame[col].astype(object)
+    return frame
+
+
+def read_frame(path, columns=None, dtypes=None):
+    """
+    Read a CSV, Parquet, Feather or structured .npy file into a DataFrame.
+
+    Parquet, Feather and .npy files are memory-mapped and only `columns` are
+    read; CSV files are parsed for `columns` only.
+
+    Args:
+        path: Data file
+        columns: Columns to load (default: all)
+        dtypes: Optional column -> dtype mapping to load them as
+
+    Returns:
+        pd.DataFrame: The requested columns
+    """
+    fmt = _format(path)
+    if fmt == 'csv':
+        try:
+            return pd.read_csv(path, usecols=columns, dtype=dtypes)
+        except ValueError:
+            # Unparseable values; let the caller coerce them
+            return pd.read_csv(path, usecols=columns)
+    if fmt == 'parquet':
+        table = _pyarrow(fmt).parquet.read_table(path, columns=columns, memory_map=True)
+        return _cast(table.to_pandas(), dtypes)
+    if fmt == 'feather':
+        table = _pyarrow(fmt).feather.read_table(path, columns=columns, memory_map=True)
+        return _cast(table.to_pandas(), dtypes)
+    data = _load_npy(path)
+    return _cast(_npy_frame(data, columns or list(data.dtype.names)), dtypes)
+
+
+def _frames(batches, dtypes):
+    # Give every chunk a running row index, as pd.read_csv(chunksize=...) does
+    start = 0
+    for batch in batches:
+        frame = _cast(batch, dtypes)
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        start += len(frame)
+        yield frame
+
+
+def _csv_chunks(reader, path, chunksize, columns, dtypes):
+    rows = 0
+    try:
+        for chunk in reader:
+            rows += len(chunk)
+            yield chunk
+        return
+    except ValueError:
+        if not dtypes:
+            raise
+
+    # Unparseable values: read the rest as it is, like read_frame, with the
+    # columns that do parse cast as requested; the caller coerces the others
+    reader = pd.read_csv(path, usecols=columns, chunksize=chunksize, skiprows=range(1, rows + 1))
+    for chunk in reader:
+        for col, dtype in dtypes.items():
+            if col in chunk.columns:
+                try:
+                    chunk[col] = chunk[col].astype(dtype)
+                except (TypeError, ValueError):
+                    pass
+        chunk.index = pd.RangeIndex(rows, rows + len(chunk))
+        rows += len(chunk)
+        yield chunk
+
+
+def iter_chunks(path, chunksize, columns=None, dtypes=None):
+    """
+    Return an iterator of consecutive DataFrame chunks of at most `chunksize` rows.
+
+    Arguments are as for read_frame. The file is opened before returning, so
+    a missing file or dependency is reported by this call, not by the first
+    chunk. From the first CSV chunk with a value that does not parse as its
+    dtype on, columns that fail to cast are returned unconverted, as
+    read_frame does, for the caller to coerce.
+    """
+    fmt = _format(path)
+    if fmt == 'csv':
+        reader = pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+        return _csv_chunks(reader, path, chunksize, columns, dtypes)
+    if fmt == 'parquet':
+        parquet_file = _pyarrow(fmt).parquet.ParquetFile(path, memory_map=True)
+        batches = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns))
+    elif fmt == 'feather':
+        table = _pyarrow(fmt).feather.read_table(path, columns=columns, memory_map=True)
+        batches = (table.slice(start, chunksize).to_pandas() for start in range(0, table.num_rows, chunksize))
+    else:
+        data = _load_npy(path)
+        columns = columns or list(data.dtype.names)
+        batches = (_npy_frame(data[start:start + chunksize], columns) for start in range(0, len(data), chunksize))
+    return _frames(batches, dtypes)
+
+
+def _structured(df, dtype=None):
+    """Pack a DataFrame into a structured array; strings become fixed-width unicode."""
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        columns[col] = values.astype(str) if values.dtype == object else values
+    if dtype is None:
+        dtype = np.dtype([(col, values.dtype) for col, values in columns.items()])
+    data = np.empty(len(df), dtype=dtype)
+    for col, values in columns.items():
+        if values.dtype.kind == 'U' and values.dtype.itemsize > dtype[col].itemsize:
+            raise ValueError(f"Column {col} has longer strings than the first chunk written")
+        data[col] = values
+    return data
+
+
+def write_frame(df, path):
+    """
+    Write a DataFrame in the format given by the extension of `path`.
+
+    .npy files hold a structured array with one field per column; string
+    columns are stored as fixed-width unicode.
+    """
+    fmt = _format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        _pyarrow(fmt)
+        df.to_parquet(path, index=False)
+    elif fmt == 'feather':
+        _pyarrow(fmt)
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        np.save(path, _structured(df))
+
+
+class FrameWriter:
+    """
+    Write a DataFrame chunk by chunk, in the format given by the extension of `path`.
+
+    Memory use is one chunk regardless of the output size. Every chunk must
+    have the columns of the first; for .npy output, string columns are sized
+    by the first chunk, and the rows are staged in a side file until close()
+    writes the header.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = _format(path)
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._dtype = None
+        self._staging = None
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        elif self.format in ('parquet', 'feather'):
+            pa = _pyarrow(self.format)
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                if self.format == 'parquet':
+                    self._writer = pa.parquet.ParquetWriter(self.path, self._schema)
+                else:
+                    self._writer = pa.ipc.new_file(self.path, self._schema)
+            self._writer.write_table(table)
+        else:
+            data = _structured(df, self._dtype)
+            if self._staging is None:
+                self._dtype = data.dtype
+                self._staging = open(f'{self.path}.rows', 'wb')
+            self._staging.write(data.tobytes())
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._staging is not None:
+            self._staging.close()
+            staging_path = self._staging.name
+            with open(self.path, 'wb') as f, open(staging_path, 'rb') as rows:
+                np.lib.format.write_array_header_2_0(f, {
+                    'descr': np.lib.format.dtype_to_descr(self._dtype),
+                    'fortran_order': False,
+                    'shape': (self.rows,)
+                })
+                shutil.copyfileobj(rows, f, 16 << 20)
+            os.remove(staging_path)
+            self._staging = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def convert(input_file, output_file, chunksize=100_000):
+    """
+    Convert a data file to the format given by the extension of `output_file`.
+
+    The file is streamed `chunksize` rows at a time, so memory use depends on
+    the chunk size, not the size of the file.
+
+    Returns:
+        int: Number of rows written
+    """
+    with FrameWriter(output_file) as writer:
+        for chunk in iter_chunks(input_file, chunksize):
+            writer.write(chunk)
+    if writer.rows == 0:
+        # No chunk was written: keep the columns in an empty file
+        write_frame(pd.DataFrame(columns=read_header(input_file)), output_file)
+    return writer.rows
+
+
+def benchmark(input_file, model_path='motor_anomaly_model.pkl', repeat=3):
+    """
+    Compare how long loading the model's columns takes from each format.
+
+    The input is converted to every format in a temporary directory; each is
+    then read `repeat` times with the analysis column selection and dtypes.
+    """
+    from model_registry import load_model
+    from preprocessing import model_manifest
+
+    column_names = model_manifest(load_model(model_path))['columns']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        df = read_frame(input_file)
+        paths = {}
+        for name, ext in FORMATS.items():
+            paths[name] = os.path.join(tmp_dir, f'data{ext}')
+            write_frame(df, paths[name])
+
+        print(f"{len(df):,} rows, {len(df.columns)} columns")
+        print(f"{'format':<10}{'size (MB)':>12}{'load (s)':>12}{'speedup':>10}")
+        csv_time = None
+        for name, path in paths.items():
+            dtypes = analysis_dtypes(read_header(path), column_names)
+            timings = []
+            for _ in range(repeat):
+                start_time = time.time()
+                read_frame(path, list(dtypes), dtypes)
+                timings.append(time.time() - start_time)
+            elapsed = min(timings)
+            csv_time = csv_time or elapsed
+            print(f"{name:<10}{os.path.getsize(path) / 1e6:>12.1f}{elapsed:>12.3f}{csv_time / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert motor data files between CSV and columnar formats")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = commands.add_parser('convert', help="Convert files to another format")
+    convert_parser.add_argument('inputs', nargs='+')
+    convert_parser.add_argument('--to', choices=list(FORMATS), default='parquet')
+    convert_parser.add_argument('--out-dir', help="Output directory (default: next to each input)")
+    convert_parser.add_argument('--chunksize', type=int, default=100_000, help="Rows converted at a time")
+
+    benchmark_parser = commands.add_parser('benchmark', help="Compare load times of the formats")
+    benchmark_parser.add_argument('input')
+    benchmark_parser.add_argument('--model', default='motor_anomaly_model.pkl')
+
+    args = parser.parse_args()
+    if args.command == 'benchmark':
+        benchmark(args.input, args.model)
+        sys.exit(0)
+
+    for input_file in args.inputs:
+        base = os.path.splitext(os.path.basename(input_file))[0] + FORMATS[args.to]
+        output_file = os.path.join(args.out_dir or os.path.dirname(input_file), base)
+        if args.out_dir:
+            os.makedirs(args.out_dir, exist_ok=True)
+        start_time = time.time()
+        rows = convert(input_file, output_file, args.chunksize)
+        print(f"{input_file} -> {output_file}: {rows:,} rows in {time.time() - start_time:.2f}s")
@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+
+
+def bucket_extrema(values, starts):
+    """
+    Find the position of the minimum and maximum of every bucket.
+
+    Buckets are the contiguous segments values[starts[i]:starts[i + 1]]. Runs
+    in O(n) with no Python-level loop; NaNs are ignored, and a bucket with no
+    finite value contributes no positions.
+
+    Args:
+        values: 1-D array
+        starts: Sorted, unique start position of every bucket (starts[0] == 0)
+
+    Returns:
+        tuple: (positions of the bucket minima, positions of the bucket maxima)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.diff(np.append(starts, len(values)))
+    bucket = np.repeat(np.arange(len(starts)), counts)
+
+    def first_match(extremes):
+        hits = np.flatnonzero(values == np.repeat(extremes, counts))
+        _, first = np.unique(bucket[hits], return_index=True)
+        return hits[first]
+
+    with np.errstate(invalid='ignore'):
+        minima = np.fmin.reduceat(values, starts)
+        maxima = np.fmax.reduceat(values, starts)
+    return first_match(minima), first_match(maxima)
+
+
+def select_points(errors, series, starts, anomalies=None):
+    """
+    Pick the points that preserve the shape of every series within buckets.
+
+    Keeps the first and last point, the min and max error of every bucket,
+    the min and max of every extra series, and every point flagged in
+    `anomalies` (if given).
+
+    Returns:
+        np.ndarray: Sorted unique positions to keep
+    """
+    n = len(errors)
+    parts = [np.array([0, n - 1])]
+    for values in [errors] + list(series):
+        parts.extend(bucket_extrema(values, starts))
+    if anomalies is not None:
+        parts.append(np.flatnonzero(anomalies))
+    return np.unique(np.concatenate(parts))
+
+
+def downsample_indices(errors, series=(), max_points=1000, anomalies=None):
+    """
+    Choose at most `max_points` row indices for plotting.
+
+    The rows are split into equal buckets and each bucket keeps the min and
+    max of the reconstruction error and of every series in `series`, so every
+    spike stays visible. Anomalous rows are always kept individually while
+    they fit in half the budget; beyond that each bucket containing an
+    anomaly still shows it through its maximum error point, which is above
+    the threshold. A budget too small for one bucket of every series keeps
+    only the error extrema.
+
+    Args:
+        errors: Reconstruction error per row
+        series: Additional per-row series (e.g. temperatures) sharing the axis
+        max_points: Maximum number of indices to return
+        anomalies: Optional boolean anomaly flag per row
+
+    Returns:
+        np.ndarray: Sorted row indices to keep
+    """
+    n = len(errors)
+    if n <= max_points:
+        return np.arange(n)
+
+    anomaly_count = int(np.count_nonzero(anomalies)) if anomalies is not None else 0
+    if anomaly_count > max_points // 2:
+        anomalies, anomaly_count = None, 0
+
+    per_bucket = 2 * (1 + len(series))
+    n_buckets = (max_points - anomaly_count - 2) // per_bucket
+    if n_buckets < 1 and anomaly_count:
+        anomalies, anomaly_count = None, 0
+        n_buckets = (max_points - 2) // per_bucket
+    if n_buckets < 1:
+        # Not even one bucket of every series fits next to the end points:
+        # keep only the min and max error of max_points // 2 buckets
+        n_buckets = max_points // 2
+        if n_buckets < 1:
+            return bucket_extrema(errors, np.array([0]))[1][:max_points]
+        starts = np.unique(np.arange(n_buckets) * n // n_buckets)
+        return np.unique(np.concatenate(bucket_extrema(errors, starts)))
+    starts = np.unique(np.arange(n_buckets) * n // n_buckets)
+    return select_points(errors, series, starts, anomalies)
+
+
+if __name__ == "__main__":
+    # Benchmark on synthetic errors with sparse spikes
+    rng = np.random.default_rng(42)
+    for n in (1_000_000, 10_000_000):
+        errors = rng.gamma(2.0, 0.01, n)
+        spikes = rng.choice(n, 200, replace=False)
+        errors[spikes] += 1.0
+        temperature = np.cumsum(rng.normal(0, 0.01, n)) + 40
+        anomalies = errors > 0.5
+
+        start_time = time.time()
+        index = downsample_indices(errors, [temperature], 1000, anomalies)
+        elapsed = time.time() - start_time
+
+        strided = np.arange(0, n, n // 1000)
+        print(f"{n:>11,} rows: kept {len(index)} points in {elapsed * 1000:.1f} ms "
+              f"({n / elapsed:,.0f} rows/sec), anomalies shown {int(anomalies[index].sum())}"
+              f"/{int(anomalies.sum())} (every-step sampling: {int(anomalies[strided].sum())})")
@@ -0,0 +1,94 @@
+import queue
+import threading
+import time
+
+from serialization import dumps
+
+
+class Subscription:
+    """A subscriber's bounded queue of pending events."""
+
+    def __init__(self, topic, max_queue):
+        self.topic = topic
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe hub for Server-Sent Events.
+
+    Events are published to a topic (e.g. a stream id) or broadcast to every
+    subscriber when the topic is None; subscribers without a topic only
+    receive broadcasts. Subscribers that fall more than `max_queue` events
+    behind are dropped instead of blocking publishers; their clients
+    reconnect and reload a full snapshot.
+    """
+
+    def __init__(self, max_queue=256):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._next_id = 1
+
+    def subscribe(self, topic=None):
+        """Register a subscriber for `topic` (None receives broadcasts only)."""
+        subscription = Subscription(topic, self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event, data, topic=None):
+        """
+        Send an event to the matching subscribers.
+
+        Args:
+            event: SSE event name
+            data: JSON-compatible payload
+            topic: Topic the event belongs to, or None for a broadcast
+        """
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            subscribers = [s for s in self._subscribers if topic is None or s.topic == topic]
+
+        # Encode once for every subscriber
+        message = f"id: {event_id}\nevent: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+
+    def stream(self, subscription, heartbeat=15.0):
+        """
+        Yield SSE messages for a subscription until the client disconnects.
+
+        A comment line is sent every `heartbeat` seconds so proxies keep the
+        connection open.
+        """
+        try:
+            yield "retry: 3000\n\n"
+            last_sent = time.monotonic()
+            while not subscription.overflowed:
+                try:
+                    message = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    message = None
+                if message is not None:
+                    yield message
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= heartbeat:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.monotonic()
+        finally:
+            self.unsubscribe(subscription)
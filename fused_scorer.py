@@ -0,0 +1,225 @@
+import time
+
+import numpy as np
+
+_ACTIVATIONS = ('identity', 'relu', 'tanh', 'logistic')
+
+
+def _activate(buf, activation):
+    """Apply an MLP activation function to `buf` in place."""
+    if activation == 'relu':
+        np.maximum(buf, 0, out=buf)
+    elif activation == 'tanh':
+        np.tanh(buf, out=buf)
+    elif activation == 'logistic':
+        np.negative(buf, out=buf)
+        np.exp(buf, out=buf)
+        buf += 1
+        np.reciprocal(buf, out=buf)
+
+
+class FusedScorer:
+    """
+    Pure-NumPy reconstruction-error scorer for the StandardScaler + MLPRegressor
+    autoencoder pipeline.
+
+    The scaler is folded into the network: the first layer consumes raw feature
+    values, and the last layer produces the reconstruction in raw units. The
+    per-row error is then mean(((X - X_reconstructed) / scale) ** 2), which is
+    identical to the mean squared error in scaled space computed by the sklearn
+    pipeline. Rows are processed in blocks through buffers that are reused for
+    every block, so no full-size intermediate arrays are created. Input blocks
+    are never modified, so several scorers can share them (see ShadowScorer).
+    """
+
+    def __init__(self, scaler, autoencoder, dtype=np.float64, block_rows=8192):
+        if autoencoder.activation not in _ACTIVATIONS:
+            raise ValueError(f"Unsupported activation: {autoencoder.activation}")
+
+        self.dtype = np.dtype(dtype)
+        self.block_rows = block_rows
+        self.activation = autoencoder.activation
+        self.out_activation = autoencoder.out_activation_
+
+        n_features = autoencoder.coefs_[0].shape[0]
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        mean = np.asarray(mean, dtype=np.float64)
+        scale = np.asarray(scale, dtype=np.float64)
+        inv_scale = 1.0 / scale
+
+        coefs = [np.asarray(w, dtype=np.float64) for w in autoencoder.coefs_]
+        intercepts = [np.asarray(b, dtype=np.float64) for b in autoencoder.intercepts_]
+
+        # Fold (X - mean) / scale into the first layer
+        intercepts[0] = intercepts[0] - (mean * inv_scale) @ coefs[0]
+        coefs[0] = coefs[0] * inv_scale[:, None]
+
+        # Fold the inverse transform into the last layer when it is linear, so
+        # the reconstruction comes out in raw units; otherwise it is applied
+        # to the activated output
+        self._raw_output = self.out_activation == 'identity'
+        if self._raw_output:
+            coefs[-1] = coefs[-1] * scale[None, :]
+            intercepts[-1] = intercepts[-1] * scale + mean
+
+        self.n_features = n_features
+        self.coefs = [w.astype(self.dtype) for w in coefs]
+        self.intercepts = [b.astype(self.dtype) for b in intercepts]
+        self._mean = mean.astype(self.dtype)
+        self._scale = scale.astype(self.dtype)
+        # Raw-unit differences are rescaled while summing the squares
+        self._weights = (inv_scale ** 2).astype(self.dtype)
+
+    @classmethod
+    def from_model_data(cls, model_data, dtype=np.float64, block_rows=8192):
+        """Compile a scorer from the dict saved by train.py."""
+        return cls(model_data['scaler'], model_data['autoencoder'], dtype=dtype, block_rows=block_rows)
+
+    def _buffers(self, rows):
+        return (np.empty((rows, self.n_features), dtype=self.dtype),
+                [np.empty((rows, w.shape[1]), dtype=self.dtype) for w in self.coefs])
+
+    def _block_errors(self, x, layer_bufs, out):
+        """Write the errors of the input block `x` into `out`, leaving `x` unchanged."""
+        n = len(x)
+        last = len(self.coefs) - 1
+        h = x
+        for i, (w, b) in enumerate(zip(self.coefs, self.intercepts)):
+            buf = layer_bufs[i][:n]
+            np.matmul(h, w, out=buf)
+            buf += b
+            _activate(buf, self.activation if i < last else self.out_activation)
+            h = buf
+
+        if not self._raw_output:
+            # Non-linear output: bring the reconstruction back to raw units
+            h *= self._scale
+            h += self._mean
+        np.subtract(x, h, out=h)
+
+        np.einsum('ij,ij,j->i', h, h, self._weights, out=out)
+        out /= self.n_features
+
+    def score(self, X, out=None):
+        """
+        Compute the per-row reconstruction error.
+
+        Args:
+            X: 2-D array-like of raw (unscaled) feature values
+            out: Optional 1-D array to write the errors into
+
+        Returns:
+            np.ndarray: Reconstruction error for every row of X
+        """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected an array with {self.n_features} columns, got shape {X.shape}")
+
+        n_rows = X.shape[0]
+        if out is None:
+            out = np.empty(n_rows, dtype=self.dtype)
+
+        block = min(self.block_rows, max(n_rows, 1))
+        x_buf, layer_bufs = self._buffers(block)
+
+        for start in range(0, n_rows, block):
+            stop = min(start + block, n_rows)
+            x = x_buf[:stop - start]
+            np.copyto(x, X[start:stop], casting='unsafe')
+            self._block_errors(x, layer_bufs, out[start:stop])
+
+        return out
+
+
+class ShadowScorer:
+    """
+    Scores rows with the current model and a candidate in one pass.
+
+    Both scorers read every input block from one shared buffer, so the rows
+    are converted once and the candidate only adds its own forward pass.
+    The scalers are folded into the first layers, so the shared block holds
+    raw values and the models may have been fitted with different scalers.
+    """
+
+    def __init__(self, primary, candidate):
+        if primary.n_features != candidate.n_features or primary.dtype != candidate.dtype:
+            raise ValueError(f"Candidate model expects {candidate.n_features} {candidate.dtype} features, "
+                             f"the current model {primary.n_features} {primary.dtype}")
+        self.primary = primary
+        self.candidate = candidate
+        self.n_features = primary.n_features
+        self.dtype = primary.dtype
+        self.block_rows = primary.block_rows
+
+    def score(self, X, out=None, candidate_out=None):
+        """
+        Compute the per-row reconstruction errors of both models.
+
+        Args:
+            X: 2-D array-like of raw (unscaled) feature values
+            out: Optional 1-D array for the current model's errors
+            candidate_out: Optional 1-D array for the candidate's errors
+
+        Returns:
+            tuple: (errors, candidate errors)
+        """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected an array with {self.n_features} columns, got shape {X.shape}")
+
+        n_rows = X.shape[0]
+        if out is None:
+            out = np.empty(n_rows, dtype=self.dtype)
+        if candidate_out is None:
+            candidate_out = np.empty(n_rows, dtype=self.dtype)
+
+        block = min(self.block_rows, max(n_rows, 1))
+        x_buf, primary_bufs = self.primary._buffers(block)
+        candidate_bufs = self.candidate._buffers(block)[1]
+
+        for start in range(0, n_rows, block):
+            stop = min(start + block, n_rows)
+            x = x_buf[:stop - start]
+            np.copyto(x, X[start:stop], casting='unsafe')
+            self.primary._block_errors(x, primary_bufs, out[start:stop])
+            self.candidate._block_errors(x, candidate_bufs, candidate_out[start:stop])
+
+        return out, candidate_out
+
+
+def sklearn_errors(model_data, X):
+    """Reference per-row errors computed through the sklearn pipeline."""
+    X_scaled = model_data['scaler'].transform(X)
+    X_reconstructed = model_data['autoencoder'].predict(X_scaled)
+    return np.mean((X_scaled - X_reconstructed) ** 2, axis=1)
+
+
+if __name__ == "__main__":
+    # Check parity against the sklearn pipeline and report throughput
+    import pandas as pd
+    from model_registry import load_model
+
+    model_data = load_model()
+    columns = model_data['column_names']
+    df = pd.read_csv('sample_data/sampled_data_3000.csv').rename(columns={'coolant': 'coolant_temperature'})
+    base = df[columns].to_numpy(dtype=np.float64)
+    X = np.tile(base, (max(1, 1_000_000 // len(base)), 1))
+    print(f"Benchmarking on {len(X)} rows with {X.shape[1]} features")
+
+    start_time = time.time()
+    reference = sklearn_errors(model_data, X)
+    sklearn_time = time.time() - start_time
+    print(f"sklearn pipeline: {len(X) / sklearn_time:,.0f} rows/sec")
+
+    threshold = model_data['error_threshold']
+    for dtype in (np.float64, np.float32):
+        scorer = FusedScorer.from_model_data(model_data, dtype=dtype)
+        start_time = time.time()
+        errors = scorer.score(X)
+        fused_time = time.time() - start_time
+        max_rel = float(np.max(np.abs(errors - reference) / np.maximum(reference, 1e-12)))
+        flips = int(np.count_nonzero((errors > threshold) != (reference > threshold)))
+        print(f"fused {np.dtype(dtype).name}: {len(X) / fused_time:,.0f} rows/sec "
+              f"({sklearn_time / fused_time:.1f}x), max relative error {max_rel:.2e}, "
+              f"anomaly flag mismatches {flips}")
@@ -1,9 +1,136 @@
+import argparse
 import pandas as pd
 import numpy as np
 import uuid
 import time
+from data_io import iter_chunks, write_frame
+from preprocessing import PROFILE_COLUMN
 
-def get_random_rows(input_file="measures_v2_with_time.csv", output_file=None, num_rows=3000):
+# While stratifying, each profile keeps this many standard deviations of
+# extra candidate units beyond its expected share, so the share can still be
+# filled from the smallest keys at the end
+STRATIFY_MARGIN = 5
+
+def _assign_units(ids, state, window_rows, rng):
+    """
+    Split a chunk into sampling units and give every unit a random key.
+
+    A unit is a run of at most `window_rows` consecutive rows of one profile
+    (a single row when window_rows is 1). Units may continue across chunk
+    boundaries; `state` carries the open unit between chunks.
+
+    Returns:
+        tuple: (unit id per row, unit key per row, True for each row that starts a unit)
+    """
+    n = len(ids)
+    same = np.empty(n, dtype=bool)
+    same[0] = state['unit'] >= 0 and ids[0] == state['last_id']
+    same[1:] = ids[1:] == ids[:-1]
+
+    # Position of every row within its run of equal profile ids
+    positions = np.arange(n)
+    starts = np.maximum.accumulate(np.where(same, 0, positions))
+    pos = positions - starts
+    first_start = np.argmin(same) if not same.all() else n
+    pos[:first_start] += state['pos'] + 1
+
+    new_unit = ~same | (pos % window_rows == 0)
+    counter = np.cumsum(new_unit)
+    units = state['unit'] + counter
+    keys = np.r_[state['key'], rng.random(int(counter[-1]))][counter]
+
+    state.update(last_id=ids[-1], pos=pos[-1], unit=units[-1], key=keys[-1])
+    return units, keys, new_unit
+
+def _unit_keys(units, keys):
+    """Unique unit ids (sorted), the key of each and its number of rows."""
+    unique_units, first, sizes = np.unique(units, return_index=True, return_counts=True)
+    return unique_units, keys[first], sizes
+
+def _row_threshold(units, keys, num_rows):
+    """
+    Key of the unit at which units taken in key order reach `num_rows` rows.
+
+    Units only gain rows as more chunks are read, so units with larger keys
+    are never needed later. Returns inf while the units hold fewer rows.
+    """
+    _, unit_keys, sizes = _unit_keys(units, keys)
+    by_key = np.argsort(unit_keys, kind='stable')
+    total = np.cumsum(sizes[by_key])
+    if total[-1] <= num_rows:
+        return np.inf
+    return unit_keys[by_key[np.searchsorted(total, num_rows)]]
+
+def _smallest_units(frame, num_rows):
+    """
+    Rows of the units with the smallest keys, `num_rows` rows in total.
+
+    Units are taken whole in key order; the last one is cut short when it
+    would overshoot. `frame` must hold every unit's rows in source order.
+    """
+    units = frame['_unit'].to_numpy()
+    unique_units, unit_keys, sizes = _unit_keys(units, frame['_key'].to_numpy())
+    by_key = np.argsort(unit_keys, kind='stable')
+    before = np.cumsum(sizes[by_key]) - sizes[by_key]
+    chosen = by_key[before < num_rows]
+    keep = np.isin(units, unique_units[chosen])
+    excess = int(keep.sum()) - num_rows
+    if excess > 0:
+        last_rows = np.flatnonzero(units == unique_units[chosen[-1]])
+        keep[last_rows[-excess:]] = False
+    return frame[keep]
+
+def _stratum_thresholds(unit_counts, target_units):
+    """
+    Key threshold per profile below which units stay candidates.
+
+    A profile with c of N units seen gets about target_units * c / N units;
+    its threshold is that share plus a margin, divided by c. Thresholds only
+    decrease as more units are seen, so dropped units are never needed later.
+    """
+    total = sum(unit_counts.values())
+    thresholds = {}
+    for profile, count in unit_counts.items():
+        share = target_units * count / total
+        thresholds[profile] = min(1.0, (share + STRATIFY_MARGIN * np.sqrt(share) + 10) / count)
+    return thresholds
+
+def _allocate(counts, total):
+    """Split `total` across strata proportionally to `counts` (largest remainder)."""
+    strata = list(counts)
+    sizes = np.array([counts[s] for s in strata], dtype=np.float64)
+    exact = sizes * total / sizes.sum()
+    quotas = np.floor(exact).astype(np.int64)
+    remainder = int(total - quotas.sum())
+    quotas[np.argsort(quotas - exact)[:remainder]] += 1
+    return dict(zip(strata, quotas.tolist()))
+
+def get_random_rows(input_file="measures_v2_with_time.csv", output_file=None, num_rows=3000, seed=None,
+                    stratify=False, window_rows=None, chunksize=100_000):
+    """
+    Sample rows from a data file in a single streaming pass.
+
+    Every sampling unit (a row, or a window of consecutive rows) gets a
+    random key and the units with the smallest keys are kept, so the sample
+    is uniform while memory depends on the sample size and `chunksize`, not
+    the size of the source file. Sampled rows are written in source order.
+
+    Args:
+        input_file (str): CSV, Parquet, Feather or .npy file to sample from
+        output_file (str): Output file; its extension picks the format
+                           (default: a new CSV under sample_data/)
+        num_rows (int): Number of rows to sample
+        seed (int): Seed for a reproducible sample
+        stratify (bool): Sample every profile_id in proportion to its size
+        window_rows (int): If set, sample contiguous windows of this many rows
+                           (never spanning two profiles) instead of single rows,
+                           keeping the time axis intact within each window;
+                           windows are added until they hold `num_rows` rows
+        chunksize (int): Rows read per chunk
+
+    Returns:
+        str: The output file
+    """
     print(f"Starting random sampling process...")
 
     # Generate a UUID for the output file if not provided
@@ -12,38 +139,92 @@ def get_random_rows(input_file="measures_v2_with_time.csv", output_file=None, nu
         output_file = f"sample_data/sampled_data_{unique_id}.csv"
         print(f"Output file generated: {output_file}")
 
-    # Read data using pandas
-    print(f"Reading data from {input_file}...")
+    window_rows = window_rows or 1
+    rng = np.random.default_rng(seed)
+    state = {'last_id': None, 'pos': -1, 'unit': -1, 'key': 0.0}
+
+    reservoir = None  # sampled rows so far, with their unit, key and source position
+    threshold = np.inf
+    unit_counts = {}
+    row_counts = {}
+    rows_read = 0
+
+    # Stream the source and keep only the rows of candidate units
+    print(f"Sampling from {input_file} in chunks of {chunksize} rows...")
     start_time = time.time()
-    df = pd.read_csv(input_file)
+    for chunk in iter_chunks(input_file, chunksize):
+        if len(chunk) == 0:
+            continue
+        has_profiles = PROFILE_COLUMN in chunk.columns
+        if stratify and not has_profiles:
+            raise ValueError(f"Cannot stratify: {input_file} has no {PROFILE_COLUMN} column")
+        ids = chunk[PROFILE_COLUMN].to_numpy() if has_profiles and (stratify or window_rows > 1) \
+            else np.zeros(len(chunk))
+        units, keys, new_unit = _assign_units(ids, state, window_rows, rng)
+
+        chunk = chunk.assign(_unit=units, _key=keys, _row=np.arange(rows_read, rows_read + len(chunk)))
+        rows_read += len(chunk)
+        if stratify:
+            for profile, count in pd.Series(ids[new_unit]).value_counts().items():
+                unit_counts[profile] = unit_counts.get(profile, 0) + count
+            for profile, count in pd.Series(ids).value_counts().items():
+                row_counts[profile] = row_counts.get(profile, 0) + count
+            # Units cut short at profile ends hold fewer rows, so the units
+            # needed follow the average unit size rather than window_rows
+            target_units = num_rows * sum(unit_counts.values()) / rows_read
+            thresholds = _stratum_thresholds(unit_counts, target_units)
+            chunk = chunk[chunk['_key'] <= chunk[PROFILE_COLUMN].map(thresholds)]
+
+        candidates = chunk[chunk['_key'] <= threshold]
+        reservoir = candidates if reservoir is None else pd.concat([reservoir, candidates], ignore_index=True)
+        if stratify:
+            reservoir = reservoir[reservoir['_key'] <= reservoir[PROFILE_COLUMN].map(thresholds)]
+        elif len(reservoir) > num_rows:
+            threshold = _row_threshold(reservoir['_unit'].to_numpy(), reservoir['_key'].to_numpy(), num_rows)
+            reservoir = reservoir[reservoir['_key'] <= threshold]
+
+    if reservoir is None:
+        raise ValueError(f"No rows found in {input_file}")
     load_time = time.time() - start_time
-    print(f"Data loaded successfully. {len(df)} rows found. (Took {load_time:.2f} seconds)")
+    print(f"Data scanned. {rows_read} rows found. (Took {load_time:.2f} seconds)")
 
-    # Determine how many rows to sample
-    sample_size = min(num_rows, len(df))
-    print(f"Preparing to sample {sample_size} rows...")
+    # The units with the smallest keys until they hold num_rows rows; when
+    # stratified, within every profile up to its share of the rows
+    if stratify:
+        quotas = _allocate(row_counts, min(num_rows, rows_read))
+        reservoir = pd.concat([_smallest_units(group, quotas.get(profile, 0))
+                               for profile, group in reservoir.groupby(PROFILE_COLUMN, sort=False)])
+    else:
+        reservoir = _smallest_units(reservoir, num_rows)
 
-    # Sample rows using pandas
-    print("Sampling data...")
-    start_time = time.time()
-    sampled_df = df.sample(n=sample_size, random_state=np.random.RandomState())
-    sample_time = time.time() - start_time
-    print(f"Sampling completed. (Took {sample_time:.2f} seconds)")
+    sampled_df = reservoir.sort_values('_row').drop(columns=['_unit', '_key', '_row'])
+    print(f"Sampled {len(sampled_df)} rows"
+          + (f" in windows of up to {window_rows} rows" if window_rows > 1 else ""))
+    if len(sampled_df) < min(num_rows, rows_read):
+        print(f"Warning: sampled {len(sampled_df)} of the {min(num_rows, rows_read)} rows requested")
 
-    # Write to csv
+    # Write in the format given by the output extension
     print(f"Writing sampled data to {output_file}...")
     start_time = time.time()
-    sampled_df.to_csv(output_file, index=False)
+    write_frame(sampled_df, output_file)
     write_time = time.time() - start_time
-    print(f"CSV file written successfully. (Took {write_time:.2f} seconds)")
+    print(f"File written successfully. (Took {write_time:.2f} seconds)")
 
-    print(f"Successfully sampled {sample_size} rows from {input_file} to {output_file}")
+    print(f"Successfully sampled {len(sampled_df)} rows from {input_file} to {output_file}")
     return output_file
 
 # Example usage
 if __name__ == "__main__":
-    # Generate output filename with UUID
-    unique_id = str(uuid.uuid4())
-    output_file = f"sample_data/sampled_data_{unique_id}.csv"
-    print(f"Starting script with target of 100,000 rows...")
-    get_random_rows(output_file=output_file, num_rows=100000)
+    parser = argparse.ArgumentParser(description="Sample rows from a motor data file")
+    parser.add_argument('input_file', nargs='?', default="measures_v2_with_time.csv")
+    parser.add_argument('--output', help="Output file (default: sample_data/sampled_data_<uuid>.csv)")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--stratify', action='store_true', help=f"Sample every {PROFILE_COLUMN} proportionally")
+    parser.add_argument('--window', type=int, help="Sample contiguous windows of this many rows")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"Starting script with target of {args.rows:,} rows...")
+    get_random_rows(args.input_file, output_file=args.output, num_rows=args.rows, seed=args.seed,
+                    stratify=args.stratify, window_rows=args.window, chunksize=args.chunksize)
@@ -0,0 +1,265 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+# resource is not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Per-stage timing of analyses and the request/stage histograms are only
+# recorded when this is set; off, every stage costs one no-op context manager
+ENABLED = os.environ.get('MOTOR_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes', 'on')
+
+# Histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Exported metrics: name -> (type, help)
+METRICS = {
+    'motor_stage_duration_seconds': ('histogram', "Duration of analysis pipeline stages"),
+    'motor_stage_rows_total': ('counter', "Rows processed by analysis pipeline stages"),
+    'motor_stage_peak_memory_bytes': ('gauge', "Peak resident memory during the last run of each stage"),
+    'motor_analysis_duration_seconds': ('histogram', "Total duration of analyses"),
+    'motor_http_request_duration_seconds': ('histogram', "Duration of HTTP requests"),
+    'motor_jobs_total': ('counter', "Finished analysis jobs by final state"),
+    'motor_model_loads_total': ('counter', "Model files unpickled, by process kind"),
+    'motor_job_queue_depth': ('gauge', "Analysis jobs queued or running"),
+    'motor_score_requests_total': ('counter', "Requests to the micro-batched scoring endpoint"),
+    'motor_score_batches_total': ('counter', "Batches scored by the micro-batcher"),
+    'motor_score_rows_total': ('counter', "Rows scored by the micro-batcher"),
+    'motor_score_pending_rows': ('gauge', "Rows waiting in the micro-batcher"),
+    'motor_shadow_rows_total': ('counter', "Rows scored by both the current and the candidate model"),
+    'motor_shadow_anomalies_total': ('counter', "Anomalies flagged in shadow-scored rows, by model"),
+    'motor_shadow_agreeing_rows_total': ('counter', "Shadow-scored rows both models flag the same way"),
+    'motor_shadow_threshold': ('gauge', "Anomaly threshold of the current and the candidate model"),
+    'motor_streams_open': ('gauge', "Live sensor streams held by the API"),
+    'motor_streams_evicted_total': ('counter', "Live sensor streams dropped after sitting idle"),
+    'motor_warmup_seconds': ('gauge', "Seconds the API took to import the pipeline and load the model"),
+}
+
+_peak_reset = os.path.exists('/proc/self/clear_refs')
+
+
+def _reset_peak_memory():
+    # Linux lets a process reset its peak RSS, which makes the peak per stage
+    global _peak_reset
+    if _peak_reset:
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            _peak_reset = False
+
+
+def peak_memory_mb():
+    """
+    Peak resident memory of this process in MB.
+
+    On Linux this is the peak since the current stage started; elsewhere it
+    is the peak over the life of the process. Either way it covers the whole
+    process, so stages running concurrently in one process share it.
+    """
+    if _peak_reset:
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KB elsewhere
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+class _Stage:
+    def __init__(self, record):
+        self.record = record
+
+    def __enter__(self):
+        _reset_peak_memory()
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc_info):
+        self.record["seconds"] += time.perf_counter() - self.start
+        self.record["peak_memory_mb"] = max(self.record.get("peak_memory_mb") or 0, peak_memory_mb() or 0)
+        return False
+
+
+class StageTimer:
+    """
+    Records the duration, row count and peak memory of named stages.
+
+    A stage used several times (e.g. once per chunk) accumulates its time and
+    rows. Callers set the rows of a stage on the dict the context returns:
+
+        with timer.stage('load') as stage:
+            df = read_frame(path)
+            stage['rows'] = len(df)
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}
+        self.info = {}
+        self._start = time.perf_counter()
+
+    def stage(self, name):
+        record = self.stages.get(name)
+        if record is None:
+            record = self.stages[name] = {"seconds": 0.0}
+        return _Stage(record)
+
+    def note(self, key, value):
+        """Attach an extra value to the timing summary."""
+        self.info[key] = value
+
+    def summary(self):
+        """The timing block added to a result."""
+        return {"total_seconds": time.perf_counter() - self._start, "stages": self.stages, **self.info}
+
+
+class _NullStage:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _NullTimer:
+    """Stand-in for StageTimer when instrumentation is off."""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def note(self, key, value):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def stage_timer(enabled=None):
+    """Return a StageTimer, or the no-op timer if instrumentation is off (default: ENABLED)."""
+    return StageTimer() if (ENABLED if enabled is None else enabled) else NULL_TIMER
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    """
+    Thread-safe store of counters, gauges and histograms in Prometheus style.
+
+    Metric names must be declared in METRICS. Functions registered with
+    on_collect() run before every render(), to refresh values that are read
+    rather than pushed, such as the job queue depth.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # name -> {sorted label pairs -> value or _Histogram}
+        self._values = {name: {} for name in METRICS}
+        self._collectors = []
+
+    def _key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            series = self._values[name]
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[name][self._key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            series = self._values[name]
+            key = self._key(labels)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def record_timing(self, timing):
+        """Record the timing block of an analysis result."""
+        self.observe('motor_analysis_duration_seconds', timing["total_seconds"])
+        for name, stage in timing["stages"].items():
+            self.observe('motor_stage_duration_seconds', stage["seconds"], stage=name)
+            if stage.get("rows"):
+                self.inc('motor_stage_rows_total', stage["rows"], stage=name)
+            if stage.get("peak_memory_mb"):
+                self.set('motor_stage_peak_memory_bytes', stage["peak_memory_mb"] * 1024 ** 2, stage=name)
+        if timing.get("model_loads"):
+            self.inc('motor_model_loads_total', timing["model_loads"], process='worker')
+
+    def record_shadow(self, shadow):
+        """Record the agreement summary of a shadow-scored batch (see model_versions.shadow_summary)."""
+        self.inc('motor_shadow_rows_total', shadow["rows"])
+        self.inc('motor_shadow_anomalies_total', shadow["anomaly_count"], model='current')
+        self.inc('motor_shadow_anomalies_total', shadow["candidate_anomaly_count"], model='candidate')
+        self.inc('motor_shadow_agreeing_rows_total', shadow["agreeing_rows"])
+        self.set('motor_shadow_threshold', shadow["threshold"], model='current')
+        self.set('motor_shadow_threshold', shadow["candidate_threshold"], model='candidate')
+
+    def on_collect(self, callback):
+        self._collectors.append(callback)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        for callback in self._collectors:
+            callback()
+
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in METRICS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._values[name].items()):
+                    if kind != 'histogram':
+                        lines.append(f"{name}{_labels(labels)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(value.buckets) + ['+Inf'], value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics of this process, exported by the API's /metrics endpoint
+metrics = Metrics()
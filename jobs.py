@@ -0,0 +1,277 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from model_registry import DEFAULT_MODEL_PATH, load_model, load_scorer
+from results_store import save_result
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """Raised when the job queue cannot accept more work."""
+
+
+def _init_worker(model_path):
+    """Pool initializer: load the model once so it stays resident between jobs."""
+    try:
+        load_scorer(load_model(model_path))
+    except Exception:
+        # Jobs report load failures themselves
+        pass
+
+
+def _run_job(job_id, data_path, options, progress, cancelled):
+    """
+    Analyze an uploaded file inside a pool worker and save the result.
+
+    Progress is published through the shared `progress` dict; once the parent
+    marks the job in the shared `cancelled` dict, chunked analyses stop at the
+    next chunk boundary. Only the saved run's id (and the timing block, when
+    instrumentation is on) is sent back to the parent, which serves the
+    stored payload, instead of pickling the whole result.
+    """
+    def report(**fields):
+        state = dict(progress.get(job_id, {}))
+        state.update(fields)
+        progress[job_id] = state
+        return job_id not in cancelled
+
+    def on_rows(rows):
+        return report(rows_processed=rows)
+
+    try:
+        if not report(state=RUNNING, stage='analyzing', started_at=time.time()):
+            return {"status": "error", "message": "Analysis cancelled"}
+
+        # Imported in the worker, so the API process does not need pandas to start
+        options = dict(options)
+        artifacts = {}
+        if options.pop('by_profile', False):
+            from profile_analysis import analyze_by_profile, shutdown_pools
+            try:
+                results = analyze_by_profile(data_path=data_path, progress_callback=on_rows, rollups=True,
+                                             artifacts=artifacts, **options)
+            finally:
+                # The profile pool would otherwise outlive the job and keep
+                # this worker (and JobQueue.shutdown) from exiting
+                shutdown_pools()
+        else:
+            from analyze_motor_data import analyze_motor_data
+            results = analyze_motor_data(data_path=data_path, progress_callback=on_rows, rollups=True,
+                                         artifacts=artifacts, **options)
+        if results["status"] == "success":
+            if not report(stage='saving'):
+                return {"status": "error", "message": "Analysis cancelled"}
+            timing = results.get("timing")
+            start = time.perf_counter()
+            response = {"status": "success", "run_id": save_result(results, rollups=artifacts.get("rollups"))}
+            if results.get("shadow", {}).get("status") == "success":
+                response["shadow"] = results["shadow"]
+            if timing is not None:
+                # Saving (serializing) comes after the timing block was stored
+                # with the result, so it is only reported to the parent
+                timing["stages"]["save"] = {"seconds": time.perf_counter() - start}
+                response["timing"] = timing
+            return response
+        return results
+    finally:
+        if os.path.exists(data_path):
+            os.remove(data_path)
+
+
+class _Job:
+    def __init__(self, job_id, future, data_path):
+        self.job_id = job_id
+        self.future = future
+        self.data_path = data_path
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.state = QUEUED
+        self.result = None
+        self.message = None
+
+
+class JobQueue:
+    """
+    Bounded queue of analysis jobs executed in a process pool.
+
+    Submitting returns a job id immediately. Jobs can be polled for progress,
+    cancelled, and their results are kept for `result_ttl` seconds after they
+    finish. Once `max_pending` jobs are queued or running, submit() raises
+    QueueFull so callers can push back on clients.
+    """
+
+    def __init__(self, max_workers=2, max_pending=8, result_ttl=3600, model_path=DEFAULT_MODEL_PATH,
+                 on_finished=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.model_path = model_path
+        # Called as on_finished(job_id, state) in the parent process
+        self.on_finished = on_finished
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._cancelled = None
+
+    def _start(self):
+        # The pool and the progress manager are created on first use
+        if self._executor is None:
+            self._manager = multiprocessing.Manager()
+            self._progress = self._manager.dict()
+            self._cancelled = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                 initargs=(self.model_path,))
+
+    def _purge(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._progress.pop(job_id, None)
+            self._cancelled.pop(job_id, None)
+
+    def _pending(self):
+        # A cancelled job still holds its worker until the future completes
+        return sum(1 for job in self._jobs.values() if job.finished_at is None)
+
+    def depth(self):
+        """Number of jobs queued or running."""
+        with self._lock:
+            return self._pending()
+
+    def submit(self, data_path, **options):
+        """
+        Queue an analysis of `data_path`.
+
+        The file is deleted once the job has finished with it.
+
+        Args:
+            data_path: Path of the uploaded data file
+            **options: Extra keyword arguments for analyze_motor_data, or for
+                       analyze_by_profile when by_profile=True
+
+        Returns:
+            str: The job id
+
+        Raises:
+            QueueFull: If `max_pending` jobs are already queued or running
+        """
+        with self._lock:
+            self._start()
+            self._purge()
+            pending = self._pending()
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} analysis jobs are already pending")
+
+            job_id = uuid.uuid4().hex
+            self._progress[job_id] = {'state': QUEUED}
+            options.setdefault('model_path', self.model_path)
+            future = self._executor.submit(_run_job, job_id, data_path, options, self._progress,
+                                           self._cancelled)
+            job = self._jobs[job_id] = _Job(job_id, future, data_path)
+
+        future.add_done_callback(lambda f: self._finish(job, f))
+        return job_id
+
+    def _finish(self, job, future):
+        with self._lock:
+            job.finished_at = time.time()
+            if future.cancelled():
+                # The worker never ran, so the upload is still ours to remove
+                job.state = CANCELLED
+                if os.path.exists(job.data_path):
+                    os.remove(job.data_path)
+            elif job.state == CANCELLED:
+                pass
+            else:
+                try:
+                    job.result = future.result()
+                    if job.result.get("status") == "success":
+                        job.state = DONE
+                    else:
+                        job.state = FAILED
+                        job.message = job.result.get("message")
+                except Exception as e:
+                    print(f"Error during analysis job {job.job_id}: {traceback.format_exc()}")
+                    job.state = FAILED
+                    job.message = f"Error analyzing data: {str(e)}"
+                    # The worker died before its own cleanup ran
+                    if os.path.exists(job.data_path):
+                        os.remove(job.data_path)
+
+        if self.on_finished is not None:
+            self.on_finished(job.job_id, job.state)
+
+    def status(self, job_id):
+        """Return a JSON-compatible status dict for a job, or None if unknown."""
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            progress = dict(self._progress.get(job_id, {}))
+            state = job.state
+            if state == QUEUED and progress.get('state') == RUNNING:
+                state = RUNNING
+            status = {
+                "job_id": job_id,
+                "state": state,
+                "submitted_at": job.submitted_at,
+                "started_at": progress.get('started_at'),
+                "finished_at": job.finished_at,
+                "stage": state if state in FINISHED_STATES else progress.get('stage', state),
+                "rows_processed": progress.get('rows_processed', 0)
+            }
+            if job.message:
+                status["message"] = job.message
+            return status
+
+    def result(self, job_id):
+        """Return the result of a finished job, or None if unavailable."""
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+            return job.result if job is not None else None
+
+    def cancel(self, job_id):
+        """
+        Cancel a job.
+
+        Queued jobs are dropped; running jobs are asked to stop at the next
+        chunk boundary and their result is discarded. A running job keeps
+        counting toward `max_pending` until its worker has stopped.
+
+        Returns:
+            bool: False if the job is unknown or already finished
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.state = CANCELLED
+            self._cancelled[job_id] = True
+        job.future.cancel()
+        return True
+
+    def shutdown(self):
+        """Stop the pool and the progress manager."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
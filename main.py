@@ -1,34 +1,26 @@
-import numpy as np
-import json
-import sys
+import argparse
+import csv
+import glob
 import os
-from datetime import datetime
-from analyze_motor_data import analyze_motor_data
-
-def main():
-    print("Motor Anomaly Detection System")
-    print("==============================")
-
-    # Check if data file was provided as argument
-    data_path = None
-    if len(sys.argv) > 1:
-        data_path = sys.argv[1]
-        print(f"Using provided data file: {data_path}")
-    else:
-        print("Using default data file: sample_data/sampled_data_100000.csv")
-
-    # Create results directory if it doesn't exist
-    os.makedirs('results', exist_ok=True)
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+# The analysis pipeline (pandas, scikit-learn) is imported where it is used,
+# so --help and argument errors answer without the multi-second imports
+from model_registry import DEFAULT_MODEL_PATH, load_model, load_scorer
+from results_store import LATEST_FILE, RESULTS_DIR, save_result
+from serialization import dumps, loads
 
-    # Analyze motor data
-    print("Analyzing motor data...")
-    results = analyze_motor_data(data_path)
+BATCH_DIR = os.path.join(RESULTS_DIR, 'batch')
+SUMMARY_COLUMNS = ['file', 'status', 'total_records', 'anomaly_count', 'anomaly_percentage', 'seconds',
+                   'result']
 
-    if results['status'] == 'error':
-        print(f"Error: {results['message']}")
-        return
+# Exit codes of a batch run
+EXIT_LIMIT_EXCEEDED = 1
+EXIT_FAILED = 2
 
-    # Display results
+def report(results):
+    """Print the report of a single analysis."""
     print("\n=== Analysis Results ===")
     print(f"Timestamp: {results['timestamp']}")
     print(f"Total records: {results['anomaly_summary']['total_records']}")
@@ -50,30 +42,319 @@ def main():
         for param, count in results['anomaly_summary']['parameter_anomalies'].items():
             print(f"{param.replace('_', ' ').title()}: {count} anomalies")
 
-    # Create a custom JSON encoder class to handle non-serializable types
-    class NumpyEncoder(json.JSONEncoder):
-        def default(self, o):
-            if isinstance(o, np.integer):
-                return int(o)
-            if isinstance(o, np.floating):
-                return float(o)
-            if isinstance(o, np.ndarray):
-                return o.tolist()
-            return super().default(o)
-
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    # Use the custom encoder when dumping the results
-    latest_file = 'motor_analysis_latest.json'
-    # Also save a timestamped version
-    timestamped_file = f'results/motor_analysis_{timestamp}.json'
-
-    # Write both files
-    for filename in [latest_file, timestamped_file]:
-        with open(filename, 'w') as f:
-            json.dump(results, f, indent=2, cls=NumpyEncoder)
-
-    print(f"\nResults saved to {latest_file} and {timestamped_file}")
+    # Per-profile breakdown (analyze_by_profile)
+    if results.get('profiles'):
+        print("\n=== Profiles ===")
+        print(f"{'profile':<10}{'records':>10}{'anomalies':>11}{'%':>8}{'max error':>12}")
+        for profile, summary in results['profiles'].items():
+            print(f"{profile:<10}{summary['total_records']:>10}{summary['anomaly_count']:>11}"
+                  f"{summary['anomaly_percentage']:>8.2f}{summary['max_error']:>12.4f}")
+
+def analyze_single(data_path=None, model_path=DEFAULT_MODEL_PATH, rolling_windows=None, compact=False,
+                   by_profile=False, workers=None):
+    """
+    Analyze one file, print the report and save it as the latest result.
+
+    With `by_profile` the file is analyzed with analyze_by_profile on
+    `workers` processes, and the report and result include every profile.
+
+    Returns:
+        dict: The analysis results (status "error" if the analysis failed)
+    """
+    if data_path:
+        print(f"Using provided data file: {data_path}")
+    else:
+        print("Using default data file: sample_data/sampled_data_100000.csv")
+
+    # Create results directory if it doesn't exist
+    os.makedirs('results', exist_ok=True)
+
+    # Analyze motor data
+    print("Analyzing motor data...")
+    artifacts = {}
+    if by_profile:
+        from profile_analysis import analyze_by_profile, shutdown_pools
+        try:
+            results = analyze_by_profile(data_path, model_path=model_path, workers=workers, rollups=True,
+                                         rolling_windows=rolling_windows, artifacts=artifacts)
+        finally:
+            shutdown_pools()
+    else:
+        from analyze_motor_data import analyze_motor_data
+        results = analyze_motor_data(data_path, model_path=model_path, rollups=True,
+                                     rolling_windows=rolling_windows, compact=compact, artifacts=artifacts)
+
+    if results['status'] == 'error':
+        print(f"Error: {results['message']}")
+        return results
+
+    report(results)
+
+    # Save the results and record the run in the results index
+    run_id = save_result(results, rollups=artifacts.get("rollups"))
+
+    print(f"\nResults saved to {LATEST_FILE} and {RESULTS_DIR}/ (run {run_id})")
     print("To view results in web interface, run 'python api.py' and open http://localhost:5000 in a browser")
+    return results
+
+def collect_inputs(patterns):
+    """
+    Expand directories and glob patterns into a sorted list of data files.
+
+    Directories contribute every supported file directly inside them.
+    """
+    from data_io import SUPPORTED_EXTENSIONS
+
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern)
+        paths.update(path for path in matches
+                     if os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS)
+    return sorted(paths)
+
+def result_paths(inputs, output_dir):
+    """Map every input to its result file; inputs sharing a name get a numeric suffix."""
+    outputs = {}
+    taken = set()
+    for path in inputs:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, n = stem, 1
+        while name in taken:
+            n += 1
+            name = f"{stem}_{n}"
+        taken.add(name)
+        outputs[path] = os.path.join(output_dir, f"{name}.json")
+    return outputs
+
+def options_path(result_path):
+    """Path of the file recording the options a result was produced with."""
+    return f"{os.path.splitext(result_path)[0]}.options.json"
+
+def analysis_options(model_path, max_data_points=1000, rolling_windows=None, compact=False):
+    """JSON-compatible dict of every batch option that changes a result."""
+    return {
+        'model': os.path.abspath(model_path),
+        'max_data_points': max_data_points,
+        'rolling_windows': list(rolling_windows) if rolling_windows else None,
+        'compact': bool(compact)
+    }
+
+def is_up_to_date(data_path, result_path, options):
+    """
+    True if the result file is newer than both the data file and the model,
+    and was produced with the same `options` (see analysis_options).
+    """
+    try:
+        result_mtime = os.path.getmtime(result_path)
+        with open(options_path(result_path), 'rb') as f:
+            recorded = loads(f.read())
+    except (OSError, ValueError):
+        return False
+    if recorded != options:
+        return False
+    return result_mtime >= max(os.path.getmtime(data_path), os.path.getmtime(options['model']))
+
+def _summary_row(data_path, result_path, results, elapsed):
+    if results['status'] == 'error':
+        return {'file': data_path, 'status': 'error', 'message': results['message'], 'seconds': elapsed,
+                'result': None}
+    summary = results['anomaly_summary']
+    return {
+        'file': data_path,
+        'status': 'success',
+        'total_records': summary['total_records'],
+        'anomaly_count': summary['anomaly_count'],
+        'anomaly_percentage': summary['anomaly_percentage'],
+        'seconds': elapsed,
+        'result': result_path
+    }
+
+def _init_worker(model_path, compact=False):
+    """Pool initializer: load the model once per worker process."""
+    try:
+        load_scorer(load_model(model_path), 'float32' if compact else 'float64')
+    except Exception:
+        # Tasks report load failures themselves
+        pass
+
+def _write_atomic(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+def _analyze_file(data_path, result_path, model_path, max_data_points, rolling_windows=None, compact=False):
+    """
+    Worker task: analyze one file and write its result and options.
+
+    Both are written to temporary files and moved into place, the options
+    last, so an interrupted run never leaves a partial result that looks up
+    to date. Only the summary row is sent back to the parent process.
+    """
+    from analyze_motor_data import analyze_motor_data
+
+    start_time = time.time()
+    results = analyze_motor_data(data_path, max_data_points=max_data_points, model_path=model_path,
+                                 rolling_windows=rolling_windows, compact=compact)
+    elapsed = time.time() - start_time
+    if results['status'] == 'success':
+        _write_atomic(result_path, dumps(results))
+        _write_atomic(options_path(result_path),
+                      dumps(analysis_options(model_path, max_data_points, rolling_windows, compact)))
+    return _summary_row(data_path, result_path, results, elapsed)
+
+def _stored_summary(data_path, result_path):
+    # Summary row of a file skipped on resume, from its stored result
+    with open(result_path, 'rb') as f:
+        results = loads(f.read())
+    return _summary_row(data_path, result_path, results, 0.0)
+
+def write_summary(rows, output_dir):
+    """Write the combined summary as summary.csv and summary.json."""
+    csv_path = os.path.join(output_dir, 'summary.csv')
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS + ['message'], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(os.path.join(output_dir, 'summary.json'), 'wb') as f:
+        f.write(dumps(rows))
+    return csv_path
+
+def print_summary(rows, max_anomaly_pct=None):
+    """Print the combined summary table, flagging motors over the limit."""
+    width = max([len(os.path.basename(row['file'])) for row in rows] + [4])
+    print(f"\n{'file':<{width}}{'records':>10}{'anomalies':>11}{'%':>8}{'time (s)':>10}  status")
+    for row in rows:
+        name = os.path.basename(row['file'])
+        if row['status'] == 'error':
+            print(f"{name:<{width}}{'':>39}  error: {row['message']}")
+            continue
+        status = row['status']
+        if max_anomaly_pct is not None and row['anomaly_percentage'] > max_anomaly_pct:
+            status += ' OVER LIMIT'
+        print(f"{name:<{width}}{row['total_records']:>10}{row['anomaly_count']:>11}"
+              f"{row['anomaly_percentage']:>8.2f}{row['seconds']:>10.2f}  {status}")
+
+def analyze_batch(inputs, output_dir=BATCH_DIR, workers=None, max_anomaly_pct=None, resume=False,
+                  model_path=DEFAULT_MODEL_PATH, max_data_points=1000, rolling_windows=None, compact=False):
+    """
+    Analyze many data files concurrently.
+
+    Files are spread over a process pool whose workers load the model once.
+    The pool has one more worker than there are CPUs by default, so one file
+    is being read while the others are scored. Every file's result is written
+    to `output_dir` as <name>.json, followed by summary.csv/summary.json.
+
+    Args:
+        inputs: Data files to analyze
+        output_dir: Directory for the per-file results and the summary
+        workers: Number of worker processes (default: number of CPUs + 1)
+        max_anomaly_pct: Flag files whose anomaly percentage exceeds this
+        resume: Skip files whose result is newer than the file and the model
+                and was produced with the same options
+        model_path: Path to the trained model file
+        max_data_points: Maximum number of data points in each result
+        rolling_windows: Add rolling analytics over these windows (in rows) to each result
+        compact: Analyze in the memory-compact float32 mode (see analyze_motor_data)
+
+    Returns:
+        int: Exit code; 0, EXIT_LIMIT_EXCEEDED if any file is over the limit,
+             or EXIT_FAILED if any file could not be analyzed
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = result_paths(inputs, output_dir)
+    options = analysis_options(model_path, max_data_points, rolling_windows, compact)
+    rows = {}
+    pending = []
+    for path in inputs:
+        if resume and is_up_to_date(path, outputs[path], options):
+            rows[path] = _stored_summary(path, outputs[path])
+        else:
+            pending.append(path)
+    print(f"{len(inputs)} files, {len(inputs) - len(pending)} up to date, {len(pending)} to analyze")
+
+    start_time = time.time()
+    if pending:
+        workers = workers or (os.cpu_count() or 1) + 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=_init_worker,
+                                 initargs=(model_path, compact)) as pool:
+            futures = {pool.submit(_analyze_file, path, outputs[path], model_path, max_data_points,
+                                   rolling_windows, compact): path
+                       for path in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    rows[path] = future.result()
+                except Exception as e:
+                    rows[path] = {'file': path, 'status': 'error', 'message': str(e), 'seconds': 0.0,
+                                  'result': None}
+                print(f"[{done}/{len(pending)}] {path}: {rows[path]['status']}")
+    print(f"Analyzed {len(pending)} files in {time.time() - start_time:.2f} seconds")
+
+    rows = [rows[path] for path in inputs]
+    print_summary(rows, max_anomaly_pct)
+    summary_path = write_summary(rows, output_dir)
+    print(f"\nResults saved to {output_dir}/ (summary: {summary_path})")
+
+    failed = [row for row in rows if row['status'] == 'error']
+    over = [row for row in rows if row['status'] == 'success' and max_anomaly_pct is not None
+            and row['anomaly_percentage'] > max_anomaly_pct]
+    if over:
+        print(f"{len(over)} files over the {max_anomaly_pct}% anomaly limit")
+    if failed:
+        print(f"{len(failed)} files failed")
+        return EXIT_FAILED
+    return EXIT_LIMIT_EXCEEDED if over else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Motor anomaly detection for one file or a batch of files")
+    parser.add_argument('inputs', nargs='*',
+                        help="Data file, or directories/glob patterns to analyze as a batch")
+    parser.add_argument('--output-dir', default=BATCH_DIR, help="Directory for batch results")
+    parser.add_argument('--workers', type=int,
+                        help="Worker processes for batch mode (default: CPUs + 1) or --by-profile (default: CPUs)")
+    parser.add_argument('--max-anomaly-pct', type=float,
+                        help=f"Exit with code {EXIT_LIMIT_EXCEEDED} if any file exceeds this anomaly percentage")
+    parser.add_argument('--resume', action='store_true', help="Skip files whose results are up to date")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--rolling-windows', type=lambda value: [int(w) for w in value.split(',')],
+                        help="Add rolling anomaly rates, temperature means/maxima and drift over these "
+                             "comma-separated window lengths in rows, e.g. 60,600")
+    parser.add_argument('--compact', action='store_true',
+                        help="Read the data chunk by chunk into one float32 matrix and score it in place; "
+                             "peaks at about a quarter of the memory on large files")
+    parser.add_argument('--by-profile', action='store_true',
+                        help="Score every test profile of a single file in parallel and report each profile")
+    args = parser.parse_args(argv)
+
+    print("Motor Anomaly Detection System")
+    print("==============================")
+
+    # A single file keeps the interactive report; anything else is a batch
+    batch = len(args.inputs) > 1 or any(os.path.isdir(p) or glob.has_magic(p) for p in args.inputs)
+    if args.by_profile and (batch or args.compact):
+        parser.error("--by-profile analyzes a single file and cannot be combined with --compact")
+    if not batch:
+        results = analyze_single(args.inputs[0] if args.inputs else None, args.model, args.rolling_windows,
+                                 args.compact, args.by_profile, args.workers)
+        if results['status'] == 'error':
+            return EXIT_FAILED
+        percentage = results['anomaly_summary']['anomaly_percentage']
+        if args.max_anomaly_pct is not None and percentage > args.max_anomaly_pct:
+            print(f"Anomaly percentage {percentage:.2f}% exceeds the {args.max_anomaly_pct}% limit")
+            return EXIT_LIMIT_EXCEEDED
+        return 0
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        from data_io import SUPPORTED_EXTENSIONS
+        print(f"Error: no {', '.join(SUPPORTED_EXTENSIONS)} files found in {', '.join(args.inputs)}")
+        return EXIT_FAILED
+    return analyze_batch(inputs, args.output_dir, args.workers, args.max_anomaly_pct, args.resume, args.model,
+                         rolling_windows=args.rolling_windows, compact=args.compact)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
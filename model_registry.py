@@ -0,0 +1,169 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MODEL_PATH = 'motor_anomaly_model.pkl'
+
+
+def _file_digest(f, block_size=1 << 20):
+    """Return the SHA-256 hex digest of an open binary file, read in blocks."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: f.read(block_size), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of unpickled model artifacts.
+
+    Each model file is loaded once and kept in memory. A cached entry is only
+    reloaded when the file's mtime/size changes *and* its content hash differs
+    from the cached version, so touching a file does not trigger a reload.
+    Entries are keyed by content hash, which lets several versions of a model
+    stay resident at once; the least recently used version is evicted once
+    more than `max_versions` are held.
+
+    All methods are thread-safe. Concurrent callers asking for the same file
+    wait on a per-path lock, so a changed file is only unpickled once. A
+    file is hashed and unpickled through one open handle, so replacing it
+    with os.replace (see model_versions.promote) never mixes two versions.
+    """
+
+    def __init__(self, max_versions=4):
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        # path -> (mtime_ns, size, content hash)
+        self._file_versions = {}
+        # content hash -> model_data, in least- to most-recently-used order
+        self._models = OrderedDict()
+        # (id(model_data), dtype name) -> (model_data, compiled FusedScorer)
+        self._scorers = {}
+        self.load_count = 0
+
+    def _path_lock(self, path):
+        with self._lock:
+            lock = self._path_locks.get(path)
+            if lock is None:
+                lock = self._path_locks[path] = threading.Lock()
+            return lock
+
+    def _touch(self, digest):
+        """Return the cached model for `digest`, marking it recently used."""
+        with self._lock:
+            model_data = self._models.get(digest)
+            if model_data is not None:
+                self._models.move_to_end(digest)
+            return model_data
+
+    def _store(self, digest, model_data):
+        with self._lock:
+            self._models[digest] = model_data
+            self._models.move_to_end(digest)
+            while len(self._models) > self.max_versions:
+                _, evicted = self._models.popitem(last=False)
+                for key in [k for k in self._scorers if k[0] == id(evicted)]:
+                    del self._scorers[key]
+
+    def version(self, path=DEFAULT_MODEL_PATH):
+        """
+        Return the content hash of the model file at `path`.
+
+        The hash is only recomputed when the file's mtime or size changed
+        since the last call.
+        """
+        path = os.path.abspath(path)
+        with open(path, 'rb') as f:
+            return self._open_version(path, f)[0]
+
+    def _open_version(self, path, f, keep=False):
+        """
+        Content hash of the open file `f` at `path`, and its content if read.
+
+        The cached hash is reused while the file's mtime and size are
+        unchanged. With `keep`, a file that has to be hashed is read whole
+        and its bytes are returned too, so they can be unpickled as is.
+        """
+        stat = os.fstat(f.fileno())
+        with self._lock:
+            known = self._file_versions.get(path)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2], None
+
+        content = f.read() if keep else None
+        digest = hashlib.sha256(content).hexdigest() if keep else _file_digest(f)
+        with self._lock:
+            self._file_versions[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest, content
+
+    def get(self, path=DEFAULT_MODEL_PATH):
+        """
+        Return the model data stored at `path`, loading it if needed.
+
+        Args:
+            path: Path to a joblib model file
+
+        Returns:
+            dict: The unpickled model data (shared, do not mutate)
+        """
+        path = os.path.abspath(path)
+        with self._path_lock(path), open(path, 'rb') as f:
+            digest, content = self._open_version(path, f, keep=True)
+            model_data = self._touch(digest)
+            if model_data is None:
+                # joblib (and scikit-learn, through the pickle) are only
+                # imported once a model is actually loaded
+                import joblib
+                if content is None:
+                    f.seek(0)
+                    content = f.read()
+                model_data = joblib.load(io.BytesIO(content))
+                self._store(digest, model_data)
+                with self._lock:
+                    self.load_count += 1
+            return model_data
+
+    def scorer(self, model_data, dtype='float64'):
+        """
+        Return a FusedScorer compiled from `model_data`.
+
+        Compiled scorers are cached per model and dtype, and dropped together
+        with their model when it is evicted. Passing the model_data returned by
+        get() guarantees the scorer matches that exact model version.
+        """
+        from fused_scorer import FusedScorer
+
+        key = (id(model_data), str(dtype))
+        with self._lock:
+            cached = self._scorers.get(key)
+        if cached is not None and cached[0] is model_data:
+            return cached[1]
+
+        scorer = FusedScorer.from_model_data(model_data, dtype=dtype)
+        with self._lock:
+            self._scorers[key] = (model_data, scorer)
+        return scorer
+
+    def clear(self):
+        """Drop every cached model and file version."""
+        with self._lock:
+            self._models.clear()
+            self._scorers.clear()
+            self._file_versions.clear()
+
+
+# Shared registry used by the analysis entry points
+registry = ModelRegistry()
+
+
+def load_model(path=DEFAULT_MODEL_PATH):
+    """Load a model through the process-wide registry."""
+    return registry.get(path)
+
+
+def load_scorer(model_data, dtype='float64'):
+    """Return the cached FusedScorer compiled from a registry-loaded model."""
+    return registry.scorer(model_data, dtype)
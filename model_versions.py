@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from model_registry import DEFAULT_MODEL_PATH, registry
+from preprocessing import manifest_path
+
+# Published model artifacts, one <version>.pkl per version
+MODELS_DIR = 'models'
+HISTORY_FILE = 'history.jsonl'
+
+# Characters of the content hash used as the version id
+VERSION_LENGTH = 12
+
+
+def version_path(version, models_dir=MODELS_DIR):
+    """Path of the artifact of a published version."""
+    return os.path.join(models_dir, f"{version}.pkl")
+
+
+def current_version(model_path=DEFAULT_MODEL_PATH):
+    """Version id of the deployed model file, or None if there is none."""
+    try:
+        return registry.version(model_path)[:VERSION_LENGTH]
+    except FileNotFoundError:
+        return None
+
+
+def _copy_atomically(source, target):
+    # Copy next to the target, flush, then rename over it: readers opening
+    # the target see either the old or the new file, never a partial one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), prefix='.tmp-',
+                                    suffix=os.path.splitext(target)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f, open(source, 'rb') as src:
+            shutil.copyfileobj(src, f)
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.copymode(source, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def publish(model_path, models_dir=MODELS_DIR):
+    """
+    Store a trained model file as an immutable versioned artifact.
+
+    The version id is the start of the file's content hash, so publishing
+    the same file twice gives the same version. The manifest next to the
+    model is published with it.
+
+    Returns:
+        str: The version id
+    """
+    version = registry.version(model_path)[:VERSION_LENGTH]
+    os.makedirs(models_dir, exist_ok=True)
+    target = version_path(version, models_dir)
+    if not os.path.exists(target):
+        if os.path.exists(manifest_path(model_path)):
+            _copy_atomically(manifest_path(model_path), manifest_path(target))
+        _copy_atomically(model_path, target)
+    return version
+
+
+def resolve(version, models_dir=MODELS_DIR):
+    """
+    Return the full version id of a published version from a unique prefix.
+
+    Raises:
+        ValueError: If no version, or more than one, starts with `version`
+    """
+    matches = [v for v in list_versions(models_dir) if v["version"].startswith(version)]
+    if len(matches) != 1:
+        raise ValueError(f"{'No' if not matches else 'More than one'} published model version matches '{version}'")
+    return matches[0]["version"]
+
+
+def list_versions(models_dir=MODELS_DIR):
+    """Published versions with their publish time, oldest first."""
+    if not os.path.isdir(models_dir):
+        return []
+    versions = []
+    for name in os.listdir(models_dir):
+        stem, extension = os.path.splitext(name)
+        if extension == '.pkl' and not stem.startswith('.'):
+            published = os.path.getmtime(os.path.join(models_dir, name))
+            versions.append({"version": stem, "published_at": datetime.fromtimestamp(published).isoformat()})
+    return sorted(versions, key=lambda v: v["published_at"])
+
+
+def history(models_dir=MODELS_DIR):
+    """Promotions recorded by promote(), oldest first."""
+    try:
+        with open(os.path.join(models_dir, HISTORY_FILE)) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def promote(version, model_path=DEFAULT_MODEL_PATH, models_dir=MODELS_DIR):
+    """
+    Deploy a published version as the model file read by the analyses.
+
+    The artifact is copied next to `model_path` and renamed over it, so the
+    swap is atomic: analyses that already loaded the old model finish with
+    it, and the next ones load the new one (the model registry reloads a
+    file whose content changed). The manifest is swapped the same way right
+    after the model.
+
+    Returns:
+        dict: The promotion recorded in the history
+    """
+    version = resolve(version, models_dir)
+    artifact = version_path(version, models_dir)
+    previous = current_version(model_path)
+
+    _copy_atomically(artifact, model_path)
+    if os.path.exists(manifest_path(artifact)):
+        _copy_atomically(manifest_path(artifact), manifest_path(model_path))
+
+    entry = {"version": version, "previous": previous, "model_path": model_path, "promoted_at": time.time()}
+    with open(os.path.join(models_dir, HISTORY_FILE), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+    return entry
+
+
+def rollback(model_path=DEFAULT_MODEL_PATH, models_dir=MODELS_DIR):
+    """Promote the version that was deployed before the current one."""
+    current = current_version(model_path)
+    for entry in reversed(history(models_dir)):
+        if entry["version"] == current and entry.get("previous") and entry["model_path"] == model_path:
+            return promote(entry["previous"], model_path, models_dir)
+    raise ValueError(f"No earlier promotion of {model_path} to roll back to")
+
+
+def shadow_summary(errors, candidate_errors, threshold, candidate_threshold):
+    """
+    Agreement between the current and a candidate model on the same rows.
+
+    Args:
+        errors: Reconstruction errors of the current model
+        candidate_errors: Reconstruction errors of the candidate
+        threshold: Anomaly threshold of the current model
+        candidate_threshold: Anomaly threshold of the candidate
+
+    Returns:
+        dict: Anomaly counts of both models, the rows both flag, the share of
+              rows on which they agree, and how many rows the candidate would
+              flag at the current threshold (isolating the threshold change)
+    """
+    anomalies = errors > threshold
+    candidate_anomalies = candidate_errors > candidate_threshold
+    rows = len(errors)
+    agreeing = rows - int((anomalies != candidate_anomalies).sum())
+    return {
+        "rows": rows,
+        "threshold": float(threshold),
+        "candidate_threshold": float(candidate_threshold),
+        "anomaly_count": int(anomalies.sum()),
+        "candidate_anomaly_count": int(candidate_anomalies.sum()),
+        "both_anomalous": int((anomalies & candidate_anomalies).sum()),
+        "agreeing_rows": agreeing,
+        "agreement_rate": agreeing / rows if rows else 1.0,
+        "candidate_anomalies_at_threshold": int((candidate_errors > threshold).sum())
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish, promote and compare versions of the anomaly model")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help="Deployed model file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish_parser = commands.add_parser('publish', help="Store a trained model file as a version")
+    publish_parser.add_argument('path')
+    commands.add_parser('list', help="List published versions")
+    promote_parser = commands.add_parser('promote', help="Atomically deploy a published version")
+    promote_parser.add_argument('version')
+    commands.add_parser('rollback', help="Deploy the previously promoted version again")
+    shadow_parser = commands.add_parser('shadow', help="Score a data file with the deployed model and a candidate")
+    shadow_parser.add_argument('version')
+    shadow_parser.add_argument('data_path', nargs='?', default='sample_data/sampled_data_3000.csv')
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        print(f"Published {args.path} as version {publish(args.path, args.models_dir)}")
+    elif args.command == 'list':
+        current = current_version(args.model)
+        for v in list_versions(args.models_dir):
+            print(f"{v['version']}  {v['published_at']}{'  (deployed)' if v['version'] == current else ''}")
+    elif args.command == 'promote':
+        entry = promote(args.version, args.model, args.models_dir)
+        print(f"Promoted {entry['version']} to {args.model} (was {entry['previous']})")
+    elif args.command == 'rollback':
+        entry = rollback(args.model, args.models_dir)
+        print(f"Rolled {args.model} back to {entry['version']}")
+    else:
+        from analyze_motor_data import analyze_motor_data
+
+        candidate = version_path(resolve(args.version, args.models_dir), args.models_dir)
+        result = analyze_motor_data(args.data_path, model_path=args.model, shadow_model_path=candidate)
+        if result["status"] == "error":
+            raise SystemExit(result["message"])
+        for key, value in result["shadow"].items():
+            print(f"{key:<36}{value}")
@@ -0,0 +1,300 @@
+import json
+import os
+
+import numpy as np
+
+# Columns excluded from anomaly analysis
+OMIT_COLUMNS = ["u_q", "u_d", "i_d", "i_q", "time"]
+
+# Source columns renamed before analysis
+RENAME_MAP = {'coolant': 'coolant_temperature'}
+
+# Column identifying the test profile (drive cycle) a row belongs to
+PROFILE_COLUMN = 'profile_id'
+
+# Key of the rows without a profile id in per-profile results
+UNKNOWN_PROFILE = 'unknown'
+
+# Values further than this many standard deviations from the training mean
+# are outside a parameter's normal range
+NORMAL_RANGE_STDS = 3
+
+
+def find_temp_columns(columns):
+    """Return the columns that hold temperature readings."""
+    return [col for col in columns if 'temp' in col.lower() or 'temperature' in col.lower()]
+
+
+def profile_key(profile_id):
+    """Result key of a profile id: whole-number floats as integers, missing ids as UNKNOWN_PROFILE."""
+    profile_id = profile_id.item() if hasattr(profile_id, 'item') else profile_id
+    if profile_id is None or (isinstance(profile_id, float) and np.isnan(profile_id)):
+        return UNKNOWN_PROFILE
+    if isinstance(profile_id, float) and profile_id.is_integer():
+        profile_id = int(profile_id)
+    return str(profile_id)
+
+
+def source_columns(header, column_names):
+    """
+    Map the model's feature columns back to the columns of a raw input file.
+
+    Args:
+        header: Column names of the raw input
+        column_names: Feature columns the model was trained on
+
+    Returns:
+        dict: Raw column name -> feature column name, in feature order
+    """
+    reverse = {new: old for old, new in RENAME_MAP.items()}
+    mapping = {}
+    for col in column_names:
+        if col in header:
+            mapping[col] = col
+        elif reverse.get(col) in header:
+            mapping[reverse[col]] = col
+    return mapping
+
+
+def build_manifest(columns, temp_columns, means, stds, dtypes=None):
+    """
+    Describe the feature layout a model was trained on.
+
+    Args:
+        columns: Feature columns in model order
+        temp_columns: Temperature columns
+        means: Training mean of every column
+        stds: Training standard deviation of every column
+        dtypes: Optional dtype name per column (default float64)
+
+    Returns:
+        dict: Column order, dtypes, rename map, temperature columns, the
+              training mean of every column (means) and its normal range
+              (column_stats)
+    """
+    dtypes = dtypes or {}
+    column_stats = {}
+    for col, mean, std in zip(columns, means, stds):
+        column_stats[col] = {
+            "mean": float(mean),
+            "std": float(std),
+            "min_normal": float(mean - NORMAL_RANGE_STDS * std),
+            "max_normal": float(mean + NORMAL_RANGE_STDS * std)
+        }
+    return {
+        "columns": list(columns),
+        "dtypes": {col: str(dtypes.get(col, 'float64')) for col in columns},
+        "rename_map": {old: new for old, new in RENAME_MAP.items() if new in columns},
+        "temp_columns": list(temp_columns),
+        "means": {col: float(mean) for col, mean in zip(columns, means)},
+        "column_stats": column_stats
+    }
+
+
+def manifest_path(model_path):
+    """Path of the JSON manifest written next to a model file."""
+    return os.path.splitext(model_path)[0] + '.manifest.json'
+
+
+def save_manifest(manifest, model_path):
+    with open(manifest_path(model_path), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def model_manifest(model_data):
+    """
+    Return the feature manifest of a loaded model.
+
+    Models saved before manifests existed get one derived from their scaler.
+    Their normal ranges are only the column_stats stored in the model, if
+    any: ranges derived from the scaler would flag values these models never
+    flagged, so they take effect once the model is retrained.
+    """
+    manifest = model_data.get('manifest')
+    if manifest is None:
+        scaler = model_data['scaler']
+        columns = model_data['column_names']
+        manifest = build_manifest(columns, model_data.get('temp_columns') or find_temp_columns(columns),
+                                  scaler.mean_, scaler.scale_)
+        manifest['column_stats'] = model_data.get('column_stats') or {}
+    return manifest
+
+
+def training_means(manifest):
+    """Training mean of every model column, for manifests with or without a means entry."""
+    if 'means' in manifest:
+        return manifest['means']
+    return {col: stats['mean'] for col, stats in manifest['column_stats'].items()}
+
+
+class RangeCheck:
+    """
+    Normal-range check of every feature column in one vectorized pass.
+
+    Compiled once from column_stats; columns without stats are never out of
+    range.
+    """
+
+    def __init__(self, columns, column_stats):
+        self.columns = list(columns)
+        self.checked = np.array([col in column_stats for col in self.columns], dtype=bool)
+        self.lo = np.array([column_stats.get(col, {}).get('min_normal', -np.inf) for col in self.columns])
+        self.hi = np.array([column_stats.get(col, {}).get('max_normal', np.inf) for col in self.columns])
+
+    def counts(self, values, block_rows=65536):
+        """Number of out-of-range values per column of a 2-D array, `block_rows` rows at a time."""
+        counts = np.zeros(len(self.columns), dtype=np.int64)
+        for start in range(0, len(values), block_rows):
+            block = values[start:start + block_rows]
+            counts += ((block < self.lo) | (block > self.hi)).sum(axis=0)
+        return counts
+
+    def parameter_anomalies(self, counts):
+        """The anomaly_summary parameter_anomalies block for per-column counts."""
+        return {col: int(count) for col, count, checked in zip(self.columns, counts, self.checked)
+                if checked and count > 0}
+
+
+def prepare_analysis_frame(df, column_names, temp_columns=None):
+    """
+    Select, rename and coerce the model's feature columns from a raw frame.
+
+    Missing values are left in place; callers decide how to fill them.
+
+    Args:
+        df: Raw motor data
+        column_names: Feature columns the model was trained on
+        temp_columns: Temperature columns (detected from the data if empty)
+
+    Returns:
+        tuple: (analysis frame, time values or None, temperature columns)
+    """
+    import pandas as pd
+
+    # Keep time for visualization if it exists
+    time_data = None
+    if 'time' in df.columns:
+        time_data = df['time'].tolist()
+
+    # Select the training columns straight from the raw frame, renaming
+    # e.g. coolant -> coolant_temperature
+    mapping = source_columns(df.columns, column_names)
+    df_analysis = df[list(mapping)]
+    df_analysis.columns = list(mapping.values())
+
+    # Identify temp columns if not provided
+    if not temp_columns:
+        temp_columns = find_temp_columns(df_analysis.columns)
+
+    # Clean data; columns that were parsed as numbers need no coercion
+    for col in df_analysis.columns:
+        if not pd.api.types.is_numeric_dtype(df_analysis[col]):
+            df_analysis[col] = pd.to_numeric(df_analysis[col], errors='coerce')
+
+    return df_analysis, time_data, temp_columns
+
+
+def _matrix_part(df, mapping, dtype):
+    import pandas as pd
+
+    part = np.empty((len(df), len(mapping)), dtype=dtype)
+    for i, source in enumerate(mapping):
+        column = df[source]
+        if not pd.api.types.is_numeric_dtype(column):
+            column = pd.to_numeric(column, errors='coerce')
+        part[:, i] = column.to_numpy(dtype=dtype, na_value=np.nan)
+    return part
+
+
+def _stack(parts, width, dtype):
+    # np.empty only commits memory as rows are written, and every part is
+    # dropped once copied, so stacking never holds two full copies
+    values = np.empty((sum(len(part) for part in parts), width), dtype=dtype)
+    start = 0
+    for i, part in enumerate(parts):
+        values[start:start + len(part)] = part
+        start += len(part)
+        parts[i] = None
+    return values
+
+
+def prepare_analysis_matrix(chunks, column_names, temp_columns=None, dtype=np.float32):
+    """
+    Build the model's feature matrix from raw data without intermediate frames.
+
+    The compact counterpart of prepare_analysis_frame: every feature column
+    is written straight into a C-ordered matrix (the layout the scorer reads
+    row blocks from), so the data is never selected, renamed or coerced as a
+    whole frame. Given chunks, each is converted as soon as it is read and
+    the raw chunks are never concatenated. Missing values are left in place;
+    see fill_missing.
+
+    Args:
+        chunks: Raw motor data, or an iterable of its consecutive chunks
+                (see data_io.iter_chunks)
+        column_names: Feature columns the model was trained on
+        temp_columns: Temperature columns (detected from the data if empty)
+        dtype: dtype of the matrix
+
+    Returns:
+        tuple: (matrix, model column names, time values as an array or None,
+                temperature columns)
+    """
+    import pandas as pd
+
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+
+    parts = []
+    times = []
+    mapping = None
+    for df in chunks:
+        if mapping is None:
+            mapping = source_columns(df.columns, column_names)
+        parts.append(_matrix_part(df, mapping, dtype))
+        # Time stays an array (categorical if it was read that way); only the
+        # plotted rows are ever converted to Python values
+        if 'time' in df.columns:
+            times.append(df['time'].array)
+    if mapping is None:
+        raise ValueError("No data to analyze")
+
+    values = parts[0] if len(parts) == 1 else _stack(parts, len(mapping), dtype)
+    time_data = None
+    if len(times) == 1:
+        time_data = times[0]
+    elif times and isinstance(times[0], pd.Categorical):
+        time_data = pd.api.types.union_categoricals(times)
+    elif times:
+        time_data = np.concatenate([np.asarray(t) for t in times])
+
+    columns = list(mapping.values())
+    if not temp_columns:
+        temp_columns = find_temp_columns(columns)
+    return values, columns, time_data, temp_columns
+
+
+def fill_missing(values):
+    """
+    Fill missing values of a 2-D float array in place, column by column.
+
+    Same result as DataFrame.ffill().bfill(): every NaN takes the last valid
+    value above it, and leading NaNs the first valid value. Columns with no
+    valid value stay NaN.
+
+    Returns:
+        np.ndarray: `values`
+    """
+    n = len(values)
+    for i in range(values.shape[1]):
+        column = values[:, i]
+        missing = np.isnan(column)
+        if not missing.any() or missing.all():
+            continue
+        # Position of the last valid row at or above every row
+        source = np.where(missing, 0, np.arange(n))
+        np.maximum.accumulate(source, out=source)
+        first = np.argmin(missing)
+        source[:first] = first
+        column[:] = column[source]
+    return values
@@ -0,0 +1,276 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analyze_motor_data import analyze_motor_data, build_result
+from data_io import analysis_dtypes, read_frame, read_header
+from model_registry import DEFAULT_MODEL_PATH, load_model, load_scorer
+from preprocessing import PROFILE_COLUMN, RangeCheck, model_manifest, prepare_analysis_frame, profile_key
+from rolling_analytics import profile_groups
+
+# Profiles larger than this are scored as several tasks so one long profile
+# does not leave the other workers idle
+MAX_TASK_ROWS = 200_000
+
+_pools = {}
+
+
+def _init_worker(model_path):
+    """Pool initializer: load the model once per worker process."""
+    try:
+        load_scorer(load_model(model_path))
+    except Exception:
+        # Tasks report load failures themselves
+        pass
+
+
+def _get_pool(workers, model_path):
+    # Pools are kept between calls so workers keep the model loaded
+    pool = _pools.get((workers, model_path))
+    if pool is None:
+        pool = _pools[(workers, model_path)] = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(model_path,))
+    return pool
+
+
+def shutdown_pools():
+    """Stop the worker pools started by analyze_by_profile."""
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
+
+
+def _score_partition(values_name, errors_name, shape, start, stop, model_path, temp_index, lo, hi):
+    """
+    Score rows [start, stop) of the shared value matrix in a worker.
+
+    Errors are written straight into the shared error array; only the
+    partition's partial statistics are returned.
+    """
+    model_data = load_model(model_path)
+    scorer = load_scorer(model_data)
+
+    values_shm = shared_memory.SharedMemory(name=values_name)
+    errors_shm = shared_memory.SharedMemory(name=errors_name)
+    try:
+        values = np.ndarray(shape, dtype=np.float64, buffer=values_shm.buf)[start:stop]
+        errors = np.ndarray(shape[:1], dtype=np.float64, buffer=errors_shm.buf)[start:stop]
+        scorer.score(values, out=errors)
+
+        temps = values[:, temp_index]
+        partial = {
+            "rows": int(stop - start),
+            "anomaly_count": int(np.count_nonzero(errors > model_data['error_threshold'])),
+            "error_sum": float(errors.sum()),
+            "error_max": float(errors.max()),
+            "temp_sum": temps.sum(axis=0),
+            "temp_min": temps.min(axis=0),
+            "temp_max": temps.max(axis=0),
+            "temp_last": temps[-1].copy(),
+            "temp_out_of_range": ((temps < lo) | (temps > hi)).sum(axis=0)
+        }
+        del values, errors, temps
+        return partial
+    finally:
+        values_shm.close()
+        errors_shm.close()
+
+
+def _merge_partials(partials):
+    """Combine the partial statistics of consecutive pieces of one profile."""
+    merged = dict(partials[0])
+    for partial in partials[1:]:
+        merged["rows"] += partial["rows"]
+        merged["anomaly_count"] += partial["anomaly_count"]
+        merged["error_sum"] += partial["error_sum"]
+        merged["error_max"] = max(merged["error_max"], partial["error_max"])
+        merged["temp_sum"] = merged["temp_sum"] + partial["temp_sum"]
+        merged["temp_min"] = np.minimum(merged["temp_min"], partial["temp_min"])
+        merged["temp_max"] = np.maximum(merged["temp_max"], partial["temp_max"])
+        merged["temp_last"] = partial["temp_last"]
+        merged["temp_out_of_range"] = merged["temp_out_of_range"] + partial["temp_out_of_range"]
+    return merged
+
+
+def _profile_summary(stats, temp_columns):
+    rows = stats["rows"]
+    return {
+        "total_records": rows,
+        "anomaly_count": stats["anomaly_count"],
+        "anomaly_percentage": float(stats["anomaly_count"] / rows * 100),
+        "mean_error": stats["error_sum"] / rows,
+        "max_error": stats["error_max"],
+        "temperature_analysis": {
+            col: {
+                "mean": float(stats["temp_sum"][i] / rows),
+                "max": float(stats["temp_max"][i]),
+                "min": float(stats["temp_min"][i]),
+                "last": float(stats["temp_last"][i]),
+                "anomalies": int(stats["temp_out_of_range"][i])
+            } for i, col in enumerate(temp_columns)
+        }
+    }
+
+
+def analyze_by_profile(data_path=None, data_df=None, max_data_points=1000, model_path=DEFAULT_MODEL_PATH,
+                       workers=None, rollups=False, rolling_windows=None, progress_callback=None, *,
+                       artifacts=None):
+    """
+    Analyze motor data with one partition per test profile, in parallel.
+
+    Rows are grouped by `profile_id` (rows without one form a single
+    "unknown" group) and the groups are scored in a process pool whose
+    workers load the model once. The feature matrix and the error
+    array live in shared memory, so workers read and write them in place and
+    only small per-profile statistics are sent back.
+
+    Args:
+        data_path: Path to a CSV, Parquet, Feather or structured .npy file (optional)
+        data_df: DataFrame containing motor data (optional)
+        max_data_points: Maximum number of data points to include in JSON output
+        model_path: Path to the trained model file
+        workers: Number of worker processes (default: number of CPUs)
+        rollups: Also build the rollup pyramid (see analyze_motor_data)
+        rolling_windows: Also add rolling analytics (see analyze_motor_data)
+        progress_callback: Called with the rows scored so far after every
+                           profile; returning False cancels the analysis
+        artifacts: Optional dict that receives the rollup pyramid (see analyze_motor_data)
+
+    Returns:
+        Same dictionary as analyze_motor_data, plus a "profiles" entry with an
+        anomaly summary and temperature stats per profile id
+    """
+    try:
+        model_data = load_model(model_path)
+        error_threshold = model_data['error_threshold']
+        manifest = model_manifest(model_data)
+        column_names = manifest['columns']
+        column_stats = manifest['column_stats']
+        temp_columns = manifest['temp_columns']
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to load model: {str(e)}"
+        }
+
+    try:
+        if data_df is not None:
+            df = data_df
+        else:
+            data_path = data_path or 'sample_data/sampled_data_100000.csv'
+            dtypes = analysis_dtypes(read_header(data_path), column_names)
+            df = read_frame(data_path, list(dtypes), dtypes)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to load data: {str(e)}"
+        }
+
+    if PROFILE_COLUMN not in df.columns:
+        return {
+            "status": "error",
+            "message": f"Data has no {PROFILE_COLUMN} column"
+        }
+
+    df_analysis, time_data, temp_columns = prepare_analysis_frame(df, column_names, temp_columns)
+    df_analysis = df_analysis.ffill().bfill()
+    temp_columns = [col for col in temp_columns if col in df_analysis.columns]
+    temp_index = [df_analysis.columns.get_loc(col) for col in temp_columns]
+    range_check = RangeCheck(temp_columns, column_stats)
+    lo, hi = range_check.lo, range_check.hi
+
+    # Group rows by profile, each profile keeping its row order; rows without
+    # a profile id form one group
+    profile_ids = df[PROFILE_COLUMN].to_numpy()
+    order, starts, _ = profile_groups(profile_ids)
+    stops = np.append(starts[1:], len(order))
+
+    n_rows, n_cols = df_analysis.shape
+    workers = workers or os.cpu_count() or 1
+    values_shm = shared_memory.SharedMemory(create=True, size=max(n_rows * n_cols * 8, 1))
+    errors_shm = shared_memory.SharedMemory(create=True, size=max(n_rows * 8, 1))
+    try:
+        values = np.ndarray((n_rows, n_cols), dtype=np.float64, buffer=values_shm.buf)
+        values[:] = df_analysis.to_numpy(dtype=np.float64)[order]
+        sorted_errors = np.ndarray(n_rows, dtype=np.float64, buffer=errors_shm.buf)
+
+        try:
+            pool = _get_pool(workers, model_path)
+            tasks = []
+            for start, stop in zip(starts, stops):
+                pieces = range(start, stop, MAX_TASK_ROWS)
+                tasks.append([pool.submit(_score_partition, values_shm.name, errors_shm.name, (n_rows, n_cols),
+                                          piece, min(piece + MAX_TASK_ROWS, stop), model_path, temp_index, lo, hi)
+                              for piece in pieces])
+            profiles = {}
+            rows_scored = 0
+            for start, futures in zip(starts, tasks):
+                stats = _merge_partials([future.result() for future in futures])
+                profiles[profile_key(profile_ids[order[start]])] = _profile_summary(stats, temp_columns)
+                rows_scored += stats["rows"]
+                if progress_callback is not None and progress_callback(rows_scored) is False:
+                    # Queued tasks are dropped; running ones finish before the
+                    # shared memory is released
+                    for pending in tasks:
+                        for future in pending:
+                            future.cancel()
+                    wait([future for pending in tasks for future in pending])
+                    return {
+                        "status": "error",
+                        "message": "Analysis cancelled"
+                    }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Error during anomaly detection: {str(e)}"
+            }
+
+        # Errors back in input order for the global result
+        reconstruction_errors = np.empty(n_rows)
+        reconstruction_errors[order] = sorted_errors
+        del values, sorted_errors
+    finally:
+        values_shm.close()
+        values_shm.unlink()
+        errors_shm.close()
+        errors_shm.unlink()
+
+    result = build_result(df_analysis, time_data, temp_columns, reconstruction_errors, error_threshold,
+                          column_stats, max_data_points, rollups, rolling_windows=rolling_windows,
+                          artifacts=artifacts)
+    result["profiles"] = profiles
+    return result
+
+
+if __name__ == "__main__":
+    # Benchmark against the single-process path
+    data_path = sys.argv[1] if len(sys.argv) > 1 else None
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    if data_path:
+        df = read_frame(data_path)
+    else:
+        # Tile the sample to a larger synthetic input
+        sample = pd.read_csv('sample_data/sampled_data_3000.csv')
+        df = pd.concat([sample] * 300, ignore_index=True)
+
+    start_time = time.time()
+    single = analyze_motor_data(data_df=df)
+    single_elapsed = time.time() - start_time
+
+    # First call starts the pool; time a warm call
+    analyze_by_profile(data_df=df.head(1000), workers=workers)
+    start_time = time.time()
+    parallel = analyze_by_profile(data_df=df, workers=workers)
+    parallel_elapsed = time.time() - start_time
+    shutdown_pools()
+
+    assert parallel["anomaly_summary"]["anomaly_count"] == single["anomaly_summary"]["anomaly_count"]
+    print(f"{len(df):,} rows, {len(parallel['profiles'])} profiles, {workers} workers")
+    print(f"Single process: {single_elapsed:.2f}s")
+    print(f"Per profile:    {parallel_elapsed:.2f}s (speedup {single_elapsed / parallel_elapsed:.2f}x)")
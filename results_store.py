@@ -0,0 +1,376 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from serialization import dumps, loads
+
+LATEST_FILE = 'motor_analysis_latest.json'
+RESULTS_DIR = 'results'
+INDEX_FILE = 'results_index.sqlite3'
+ROLLUPS_DIR = 'rollups'
+
+# Metadata recorded for every analysis run
+Run = namedtuple('Run', ['id', 'created_at', 'timestamp', 'path', 'total_records',
+                         'anomaly_count', 'anomaly_percentage'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    timestamp TEXT,
+    path TEXT,
+    total_records INTEGER,
+    anomaly_count INTEGER,
+    anomaly_percentage REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+_RUN_COLUMNS = 'id, created_at, timestamp, path, total_records, anomaly_count, anomaly_percentage'
+
+
+# Names of result files: motor_analysis_<timestamp>.json, with microseconds
+# since several runs can finish within a second (older files have none)
+FILE_TIMESTAMP = '%Y%m%d_%H%M%S_%f'
+_OLD_FILE_TIMESTAMP = '%Y%m%d_%H%M%S'
+
+
+def _file_created_at(path):
+    """Creation time of a result file, from its timestamped name if possible."""
+    name = os.path.basename(path)[len('motor_analysis_'):]
+    for fmt, length in ((FILE_TIMESTAMP, 22), (_OLD_FILE_TIMESTAMP, 15)):
+        try:
+            return datetime.strptime(name[:length], fmt).timestamp()
+        except ValueError:
+            pass
+    return os.path.getmtime(path)
+
+
+def _write_temp(directory, payload):
+    # A uniquely named file in `directory`, to be linked or renamed into place
+    # (created like any other file, unlike mkstemp's owner-only files)
+    tmp_path = os.path.join(directory or '.', f'.tmp-{uuid.uuid4().hex}.json')
+    with open(tmp_path, 'xb') as f:
+        f.write(payload)
+    return tmp_path
+
+
+def _store_file(tmp_path, results_dir, created_at):
+    """
+    Give a written result file its timestamped name in `results_dir`.
+
+    The name is taken with a hard link, which fails instead of replacing an
+    existing file, so two runs finishing at the same moment never share or
+    truncate a file. `tmp_path` is left in place.
+
+    Returns:
+        str: The new path
+    """
+    stamp = datetime.fromtimestamp(created_at).strftime(FILE_TIMESTAMP)
+    path = f'{results_dir}/motor_analysis_{stamp}.json'
+    n = 0
+    while True:
+        try:
+            os.link(tmp_path, path)
+            return path
+        except FileExistsError:
+            n += 1
+            path = f'{results_dir}/motor_analysis_{stamp}_{n}.json'
+        except OSError:
+            # No hard links on this file system: create the name exclusively
+            try:
+                with open(tmp_path, 'rb') as src, open(path, 'xb') as f:
+                    f.write(src.read())
+                return path
+            except FileExistsError:
+                n += 1
+                path = f'{results_dir}/motor_analysis_{stamp}_{n}.json'
+
+
+# Index files whose schema and backfill this process has already set up;
+# request threads only open a connection after the first one
+_prepared = set()
+_prepare_lock = threading.Lock()
+
+
+class ResultsStore:
+    """
+    SQLite index of analysis runs.
+
+    Each run's summary metadata, result file and payload size are recorded
+    when the run is saved, so "latest run" and "runs between two times" are
+    indexed lookups instead of directory scans. The result file is the only
+    full copy of a run's payload. The newest payload is also cached in
+    memory and only re-read when a newer run appears.
+    """
+
+    def __init__(self, results_dir=RESULTS_DIR, latest_file=LATEST_FILE):
+        self.results_dir = results_dir
+        self.latest_file = latest_file
+        self.db_path = os.path.join(results_dir, INDEX_FILE)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._latest = None  # (Run, payload bytes)
+
+    def _connect(self):
+        # Connections are per thread, and never reused across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(self.results_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._prepare(conn)
+        return conn
+
+    def _prepare(self, conn):
+        """Create the schema and index old result files, once per process and index file."""
+        key = os.path.abspath(self.db_path)
+        if key in _prepared:
+            return
+        with _prepare_lock:
+            if key not in _prepared:
+                conn.executescript(_SCHEMA)
+                self._backfill(conn)
+                _prepared.add(key)
+
+    def _backfill(self, conn):
+        """Index result files written before the store existed."""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM runs LIMIT 1').fetchone() is None:
+                files = [os.path.join(self.results_dir, f) for f in os.listdir(self.results_dir)
+                         if f.startswith('motor_analysis_') and f.endswith('.json')]
+                latest_only = not files and os.path.exists(self.latest_file)
+                if latest_only:
+                    files = [self.latest_file]
+                for path in sorted(files, key=_file_created_at):
+                    with open(path, 'rb') as f:
+                        payload = f.read()
+                    try:
+                        results = loads(payload)
+                    except ValueError:
+                        continue
+                    created_at = _file_created_at(path)
+                    if latest_only:
+                        # The latest file is replaced by the next run
+                        tmp_path = _write_temp(self.results_dir, payload)
+                        path = _store_file(tmp_path, self.results_dir, created_at)
+                        os.remove(tmp_path)
+                    self._insert(conn, results, len(payload), path, created_at)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _insert(conn, results, size, path, created_at):
+        summary = results.get('anomaly_summary', {})
+
+        def number(key, cast):
+            value = summary.get(key)
+            return cast(value) if value is not None else None
+
+        cursor = conn.execute(
+            'INSERT INTO runs (created_at, timestamp, path, total_records, anomaly_count, '
+            'anomaly_percentage, size) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (created_at, results.get('timestamp'), path, number('total_records', int),
+             number('anomaly_count', int), number('anomaly_percentage', float), size))
+        return cursor.lastrowid
+
+    def add_run(self, results, payload, path, created_at=None):
+        """
+        Record a run.
+
+        Args:
+            results: Analysis result dictionary (used for the metadata)
+            payload: Serialized result bytes (only their size is recorded)
+            path: File the result was written to; get() serves it from there
+            created_at: Creation time as a Unix timestamp (default: now)
+
+        Returns:
+            int: The new run id
+        """
+        return self._insert(self._connect(), results, len(payload), path,
+                            time.time() if created_at is None else created_at)
+
+    def rollup_dir(self, run_id):
+        """Directory holding the rollup pyramid of a run."""
+        return os.path.join(self.results_dir, ROLLUPS_DIR, str(run_id))
+
+    def latest_id(self):
+        """Return the id of the newest run, or None."""
+        return self._connect().execute('SELECT MAX(id) FROM runs').fetchone()[0]
+
+    def latest(self):
+        """
+        Return (Run, payload bytes) for the newest run, or None.
+
+        The payload is served from memory until a newer run is recorded.
+        """
+        run_id = self.latest_id()
+        if run_id is None:
+            return None
+        with self._lock:
+            if self._latest is not None and self._latest[0].id == run_id:
+                return self._latest
+        latest = self.get(run_id)
+        with self._lock:
+            self._latest = latest
+        return latest
+
+    def run(self, run_id):
+        """Return the Run recorded for `run_id`, without its payload, or None."""
+        row = self._connect().execute(f'SELECT {_RUN_COLUMNS} FROM runs WHERE id = ?', (run_id,)).fetchone()
+        return Run(*row) if row is not None else None
+
+    def get(self, run_id):
+        """Return (Run, payload bytes) for a run, or None if it or its file does not exist."""
+        run = self.run(run_id)
+        if run is None:
+            return None
+        try:
+            with open(run.path, 'rb') as f:
+                return run, f.read()
+        except (OSError, TypeError):
+            return None
+
+    def memo_lookup(self, key, max_age=None):
+        """
+        Return the id of the run memoized under `key`, or None.
+
+        Entries older than `max_age` seconds, or whose run no longer exists,
+        are dropped instead of returned.
+        """
+        conn = self._connect()
+        row = conn.execute('SELECT memo.run_id, memo.created_at FROM memo JOIN runs ON runs.id = memo.run_id '
+                           'WHERE memo.key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is None or (max_age is not None and now - row[1] > max_age):
+            conn.execute('DELETE FROM memo WHERE key = ?', (key,))
+            return None
+        conn.execute('UPDATE memo SET last_used = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def memoize(self, key, run_id, max_bytes=None, max_age=None):
+        """
+        Remember `run_id` as the result for `key`, then evict old entries.
+
+        Entries older than `max_age` seconds are dropped, then the least
+        recently used ones until the memoized payloads total at most
+        `max_bytes`. Evicting an entry only forgets the shortcut; the run
+        stays in the history.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute('INSERT OR REPLACE INTO memo (key, run_id, created_at, last_used, size) '
+                     'SELECT ?, id, ?, ?, size FROM runs WHERE id = ?', (key, now, now, run_id))
+        if max_age is not None:
+            conn.execute('DELETE FROM memo WHERE created_at < ?', (now - max_age,))
+        if max_bytes is not None:
+            conn.execute('DELETE FROM memo WHERE key IN (SELECT key FROM ('
+                         'SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total FROM memo) '
+                         'WHERE total > ?)', (max_bytes,))
+
+    def list_runs(self, start=None, end=None, limit=100):
+        """
+        Return the runs created between `start` and `end`, newest first.
+
+        Args:
+            start: Earliest creation time as a Unix timestamp (optional)
+            end: Latest creation time as a Unix timestamp (optional)
+            limit: Maximum number of runs to return
+        """
+        query = f'SELECT {_RUN_COLUMNS} FROM runs WHERE created_at >= ? AND created_at <= ? ' \
+                'ORDER BY created_at DESC LIMIT ?'
+        rows = self._connect().execute(query, (start if start is not None else float('-inf'),
+                                               end if end is not None else float('inf'), limit))
+        return [Run(*row) for row in rows]
+
+
+# Shared store used by the analysis entry points
+store = ResultsStore()
+
+
+@contextmanager
+def temporary_store(results_dir, latest_file=None):
+    """
+    Make save_result and the shared store use another location while the block runs.
+
+    Processes forked inside the block keep that location.
+
+    Args:
+        results_dir: Directory for the results and their index
+        latest_file: Path of the latest file (default: inside results_dir)
+
+    Yields:
+        ResultsStore: The store in use
+    """
+    global store
+    previous = store
+    store = ResultsStore(results_dir, latest_file or os.path.join(results_dir, LATEST_FILE))
+    try:
+        yield store
+    finally:
+        store = previous
+
+
+def save_result(results, results_dir=None, latest_file=None, rollups=None):
+    """
+    Write an analysis result to the latest file and a timestamped file, and
+    record it in the results index.
+
+    A rollup pyramid (from analyze_motor_data(rollups=True, artifacts=...))
+    is written under the run's rollup directory.
+
+    Args:
+        results: Analysis result dictionary
+        results_dir: Directory for timestamped results (default: the shared store's)
+        latest_file: Path of the file the dashboard reads (default: the shared store's)
+        rollups: Optional RollupBuilder of the run
+
+    Returns:
+        int: The id of the recorded run
+    """
+    results_dir = results_dir or store.results_dir
+    latest_file = latest_file or store.latest_file
+    os.makedirs(results_dir, exist_ok=True)
+    created_at = time.time()
+
+    # Serialize once, compactly, into a new file that is linked under its
+    # timestamped name and then renamed over the latest file, so both names
+    # share the bytes and neither is ever seen half-written
+    payload = dumps(results)
+    tmp_path = _write_temp(results_dir, payload)
+    try:
+        timestamped_file = _store_file(tmp_path, results_dir, created_at)
+        try:
+            os.replace(tmp_path, latest_file)
+        except OSError:
+            # e.g. a different file system: write the latest file on its own
+            os.remove(tmp_path)
+            os.replace(_write_temp(os.path.dirname(latest_file), payload), latest_file)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    target = store if (results_dir, latest_file) == (store.results_dir, store.latest_file) \
+        else ResultsStore(results_dir, latest_file)
+    run_id = target.add_run(results, payload, timestamped_file, created_at)
+    if rollups is not None:
+        rollups.write(target.rollup_dir(run_id), threshold=results.get('plot_data', {}).get('threshold'))
+    return run_id
@@ -0,0 +1,273 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import PROFILE_COLUMN, profile_key
+
+# Window lengths in rows; at the 10 s sampling interval of add_time.py
+# these are 10 minutes and 100 minutes
+DEFAULT_WINDOWS = (60, 600)
+
+# Values in the compact output are rounded to this many decimals
+DECIMALS = 6
+
+
+def profile_groups(profile_ids):
+    """
+    Group rows by profile, keeping each profile's rows in their original order.
+
+    Args:
+        profile_ids: Profile id per row
+
+    Returns:
+        tuple: (order, starts, positions); `order` sorts rows by profile,
+               `starts` are the first sorted row of every profile and
+               `positions` the position of every sorted row within its profile
+    """
+    # Sorting small integer codes lets the stable sort use a radix sort
+    codes, uniques = pd.factorize(np.asarray(profile_ids), sort=True, use_na_sentinel=False)
+    n = len(codes)
+    order = np.argsort(codes.astype(np.min_scalar_type(len(uniques))), kind='stable')
+    lengths = np.bincount(codes, minlength=len(uniques))
+    lengths = lengths[lengths > 0]
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(n) - np.repeat(starts, lengths)
+    return order, starts, positions
+
+
+def rolling_mean(values, positions, window, rows=None):
+    """
+    Trailing mean over the last `window` rows of each profile, from one cumulative sum.
+
+    Windows never reach back into the previous profile; the first rows of a
+    profile average over the rows seen so far.
+
+    Args:
+        values: Values in profile order (see profile_groups)
+        positions: Position of every row within its profile
+        window: Window length in rows
+        rows: Only return the windows ending at these rows (default: all)
+    """
+    return _window_means(_cumulative(values), positions, window, rows)
+
+
+def _cumulative(values):
+    sums = np.empty(len(values) + 1)
+    sums[0] = 0.0
+    np.cumsum(values, dtype=np.float64, out=sums[1:])
+    return sums
+
+
+def _window_means(sums, positions, window, rows=None):
+    # Means of the trailing windows from the cumulative sums of a series
+    if rows is None:
+        rows = np.arange(len(positions))
+    first = rows - np.minimum(positions[rows], window - 1)
+    return (sums[rows + 1] - sums[first]) / (rows + 1 - first)
+
+
+def rolling_max(values, positions, window, rows=None):
+    """
+    Trailing maximum over the last `window` rows of each profile.
+
+    Uses the van Herk/Gil-Werman scheme: rows are laid out in blocks of
+    `window` (each profile starting a new block) and every window is covered
+    by the suffix maximum of one block and the prefix maximum of the next,
+    so the cost does not depend on the window length.
+
+    Args:
+        values: Values in profile order (see profile_groups)
+        positions: Position of every row within its profile
+        window: Window length in rows
+        rows: Only return the windows ending at these rows (default: all)
+    """
+    n = len(values)
+    if rows is None:
+        rows = np.arange(n)
+    if n == 0:
+        return np.empty(0)
+    block = positions // window
+    new_block = np.r_[True, (block[1:] != block[:-1]) | (positions[1:] == 0)]
+    slots = (np.cumsum(new_block) - 1) * window + positions % window
+
+    padded = np.full(int(new_block.sum()) * window, -np.inf)
+    padded[slots] = values
+    padded = padded.reshape(-1, window)
+    prefix = np.maximum.accumulate(padded, axis=1).ravel()
+    suffix = np.maximum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    result = prefix[slots[rows]]
+    full = np.flatnonzero(positions[rows] >= window)
+    ends = rows[full]
+    result[full] = np.maximum(prefix[slots[ends]], suffix[slots[ends - window + 1]])
+    return result
+
+
+def ewma(values, starts, span):
+    """
+    Exponentially weighted moving average restarted at every profile.
+
+    The whole array is filtered as one series, then each profile is
+    corrected for what it inherited from the previous one: the difference
+    between the restarted and the continued average decays by (1 - alpha)
+    per row, so the correction is a geometric series per profile.
+
+    Args:
+        values: Values in profile order (see profile_groups)
+        starts: First row of every profile
+        span: Span of the average in rows (alpha = 2 / (span + 1))
+    """
+    # scipy.signal takes most of a second to import
+    from scipy.signal import lfilter
+
+    n = len(values)
+    if n == 0:
+        return np.empty(0)
+    alpha = 2 / (span + 1)
+    smoothed = lfilter([alpha], [1, alpha - 1], values, zi=[(1 - alpha) * values[0]])[0]
+
+    lengths = np.diff(np.append(starts, n))
+    positions = np.arange(n) - np.repeat(starts, lengths)
+    before = np.r_[values[0], smoothed[starts[1:] - 1]]
+    offsets = np.repeat(values[starts] - before, lengths)
+    # Powers underflow to 0 once a profile is long past its start
+    with np.errstate(under='ignore'):
+        smoothed += (1 - alpha) ** (positions + 1) * offsets
+    return smoothed
+
+
+def _compact(values):
+    return np.round(values, DECIMALS).tolist()
+
+
+def rolling_analytics(errors, anomalies, temps, profile_ids=None, error_threshold=1.0, windows=DEFAULT_WINDOWS,
+                      ewma_span=None, index=None, max_points=1000):
+    """
+    Rolling anomaly rates, temperature means/maxima and error drift per profile.
+
+    Everything is computed over the full-resolution arrays in one vectorized
+    pass (cumulative sums for means and rates, block prefix/suffix maxima
+    for maxima); only the compact result is kept. Windows are counted in
+    rows and restart at every profile, as does the drift average.
+
+    The drift score is the EWMA of the reconstruction error divided by the
+    anomaly threshold, so 1.0 means the smoothed error has reached the
+    threshold.
+
+    Args:
+        errors: Reconstruction error per row
+        anomalies: Boolean anomaly flag per row
+        temps: Dict of temperature column -> values per row
+        profile_ids: Profile id per row, or None to treat all rows as one profile
+        error_threshold: Anomaly threshold of the model
+        windows: Window lengths in rows
+        ewma_span: Span of the error EWMA in rows (default: the longest window)
+        index: Rows at which the series are sampled, e.g. the plotted rows
+               (default: up to `max_points` evenly spaced rows)
+        max_points: Number of sampled rows when `index` is not given
+
+    Returns:
+        dict: "windows", "ewma_span", the sampled row "index", rolling
+              "series" per window, the sampled "drift" score and a summary
+              per profile under "profiles"
+    """
+    errors = np.asarray(errors, dtype=np.float64)
+    n = len(errors)
+    windows = sorted({int(w) for w in windows})
+    if not windows or windows[0] < 1:
+        raise ValueError("windows must be positive row counts")
+    ewma_span = ewma_span or windows[-1]
+
+    order, starts, positions = profile_groups(np.zeros(n) if profile_ids is None else profile_ids)
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    if index is None:
+        index = np.unique(np.linspace(0, n - 1, min(max_points, n)).astype(np.int64))
+    index = np.asarray(index, dtype=np.int64)
+    sampled = rank[index]
+
+    sorted_errors = errors[order]
+    sorted_anomalies = np.asarray(anomalies, dtype=np.float64)[order]
+    sorted_temps = {col: np.asarray(values, dtype=np.float64)[order] for col, values in temps.items()}
+
+    # One cumulative sum per series serves every window
+    anomaly_sums = _cumulative(sorted_anomalies)
+    error_sums = _cumulative(sorted_errors)
+    temp_sums = {col: _cumulative(values) for col, values in sorted_temps.items()}
+
+    series = {}
+    peak_rates = {}
+    for window in windows:
+        rates = _window_means(anomaly_sums, positions, window)
+        entry = {
+            "anomaly_rate": _compact(rates[sampled]),
+            "error_mean": _compact(_window_means(error_sums, positions, window, sampled))
+        }
+        for col, values in sorted_temps.items():
+            entry[f"{col}_mean"] = _compact(_window_means(temp_sums[col], positions, window, sampled))
+            entry[f"{col}_max"] = _compact(rolling_max(values, positions, window, sampled))
+        series[str(window)] = entry
+        peak_rates[str(window)] = np.maximum.reduceat(rates, starts) if n else rates
+
+    drift = ewma(sorted_errors, starts, ewma_span) / error_threshold
+
+    # Per-profile summaries from segment reductions over the sorted arrays
+    profiles = {}
+    if n:
+        lengths = np.diff(np.append(starts, n))
+        stops = starts + lengths - 1
+        anomaly_rate = np.add.reduceat(sorted_anomalies, starts) / lengths
+        error_mean = np.add.reduceat(sorted_errors, starts) / lengths
+        drift_max = np.maximum.reduceat(drift, starts)
+        # Change of the drift score since the EWMA settled (after one span)
+        settled = starts + np.minimum(ewma_span, lengths) - 1
+        sorted_ids = np.zeros(n) if profile_ids is None else np.asarray(profile_ids)[order]
+        for i, start in enumerate(starts):
+            profiles[profile_key(sorted_ids[start])] = {
+                "rows": int(lengths[i]),
+                "anomaly_rate": float(anomaly_rate[i]),
+                "error_mean": float(error_mean[i]),
+                "drift_last": float(drift[stops[i]]),
+                "drift_max": float(drift_max[i]),
+                "drift_change": float(drift[stops[i]] - drift[settled[i]]),
+                "peak_anomaly_rate": {window: float(rates[i]) for window, rates in peak_rates.items()}
+            }
+
+    return {
+        "windows": windows,
+        "ewma_span": ewma_span,
+        "index": index.tolist(),
+        "series": series,
+        "drift": _compact(drift[sampled]),
+        "profiles": profiles
+    }
+
+
+if __name__ == "__main__":
+    # Time the rolling analytics on a tiled sample against a pandas groupby-rolling baseline
+    from analyze_motor_data import analyze_motor_data
+
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    sample = pd.read_csv('sample_data/sampled_data_3000.csv')
+    df = pd.concat([sample] * copies, ignore_index=True)
+
+    start_time = time.time()
+    result = analyze_motor_data(data_df=df, rolling_windows=DEFAULT_WINDOWS)
+    print(f"{len(df):,} rows analyzed with rolling analytics in {time.time() - start_time:.2f}s")
+
+    rng = np.random.default_rng(0)
+    errors = rng.random(len(df))
+    temps = {'coolant': df['coolant'].to_numpy(dtype=np.float64)}
+    start_time = time.time()
+    rolling = rolling_analytics(errors, errors > 0.95, temps, df[PROFILE_COLUMN].to_numpy())
+    elapsed = time.time() - start_time
+
+    start_time = time.time()
+    grouped = pd.Series(temps['coolant']).groupby(df[PROFILE_COLUMN].to_numpy(), sort=True)
+    for window in DEFAULT_WINDOWS:
+        grouped.rolling(window, min_periods=1).mean()
+        grouped.rolling(window, min_periods=1).max()
+    baseline = time.time() - start_time
+    print(f"rolling_analytics: {elapsed:.2f}s, pandas rolling of one column alone: {baseline:.2f}s")
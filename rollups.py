@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Rows per bucket at the finest level, and buckets merged per level above it
+BASE_BUCKET_ROWS = 64
+LEVEL_FACTOR = 4
+
+# float32 counts are exact up to 2**24, so coarser levels are not built
+MAX_BUCKET_ROWS = 1 << 24
+
+# Fixed columns of every level array; each temperature column adds min/max/mean
+FIELDS = ['count', 'anomaly_count', 'error_min', 'error_max', 'error_mean']
+
+
+def _reduce_rows(errors, anomalies, temps, starts):
+    """Aggregate raw rows into buckets beginning at `starts`."""
+    counts = np.diff(np.append(starts, len(errors)))
+    columns = [counts,
+               np.add.reduceat(anomalies.astype(np.float64), starts),
+               np.fmin.reduceat(errors, starts),
+               np.fmax.reduceat(errors, starts),
+               np.add.reduceat(errors, starts) / counts]
+    for j in range(temps.shape[1]):
+        values = temps[:, j]
+        columns += [np.fmin.reduceat(values, starts),
+                    np.fmax.reduceat(values, starts),
+                    np.add.reduceat(values, starts) / counts]
+    return np.column_stack(columns).astype(np.float32)
+
+
+def merge_buckets(level, group):
+    """Merge every `group` consecutive buckets of a level array."""
+    if len(level) == 0:
+        return level
+    starts = np.arange(0, len(level), group)
+    counts = level[:, 0].astype(np.float64)
+    total = np.add.reduceat(counts, starts)
+    merged = np.empty((len(starts), level.shape[1]), dtype=np.float32)
+    merged[:, 0] = total
+    merged[:, 1] = np.add.reduceat(level[:, 1].astype(np.float64), starts)
+    for j in range(2, level.shape[1], 3):
+        merged[:, j] = np.fmin.reduceat(level[:, j], starts)
+        merged[:, j + 1] = np.fmax.reduceat(level[:, j + 1], starts)
+        weighted = np.add.reduceat(level[:, j + 2].astype(np.float64) * counts, starts)
+        merged[:, j + 2] = weighted / np.maximum(total, 1)
+    return merged
+
+
+class RollupBuilder:
+    """
+    Incrementally build a pyramid of per-bucket aggregates for one run.
+
+    Level 0 holds `base_rows`-row buckets; each level above merges `factor`
+    buckets of the level below. Every bucket stores the row count, anomaly
+    count, min/max/mean reconstruction error and min/max/mean of every
+    temperature column, as float32.
+    """
+
+    def __init__(self, temp_columns, base_rows=BASE_BUCKET_ROWS, factor=LEVEL_FACTOR):
+        self.temp_columns = list(temp_columns)
+        self.base_rows = base_rows
+        self.factor = factor
+        self.total_rows = 0
+        self._levels = []
+        self._pending = None
+
+    def add(self, errors, anomalies, temps):
+        """
+        Fold a block of consecutive rows into level 0.
+
+        Args:
+            errors: Reconstruction error per row
+            anomalies: Boolean anomaly flag per row
+            temps: 2-D array with one column per temperature column
+        """
+        errors = np.asarray(errors, dtype=np.float64)
+        anomalies = np.asarray(anomalies, dtype=bool)
+        temps = np.asarray(temps, dtype=np.float64).reshape(len(errors), len(self.temp_columns))
+        self.total_rows += len(errors)
+        if self._pending is not None:
+            errors = np.concatenate([self._pending[0], errors])
+            anomalies = np.concatenate([self._pending[1], anomalies])
+            temps = np.concatenate([self._pending[2], temps])
+            self._pending = None
+
+        complete = len(errors) - len(errors) % self.base_rows
+        if complete:
+            starts = np.arange(0, complete, self.base_rows)
+            self._levels.append(_reduce_rows(errors[:complete], anomalies[:complete], temps[:complete], starts))
+        if complete < len(errors):
+            self._pending = (errors[complete:], anomalies[complete:], temps[complete:])
+
+    def finish(self):
+        """Return the list of level arrays, finest first."""
+        if self._pending is not None:
+            errors, anomalies, temps = self._pending
+            self._levels.append(_reduce_rows(errors, anomalies, temps, np.array([0])))
+            self._pending = None
+
+        width = 5 + 3 * len(self.temp_columns)
+        base = np.concatenate(self._levels) if self._levels else np.empty((0, width), dtype=np.float32)
+        self._levels = [base]
+
+        levels = [base]
+        bucket_rows = self.base_rows
+        while len(levels[-1]) > self.factor and bucket_rows * self.factor <= MAX_BUCKET_ROWS:
+            levels.append(merge_buckets(levels[-1], self.factor))
+            bucket_rows *= self.factor
+        return levels
+
+    def write(self, directory, threshold=None):
+        """Finish the pyramid and store it as .npy files plus a manifest."""
+        levels = self.finish()
+        os.makedirs(directory, exist_ok=True)
+        for k, level in enumerate(levels):
+            np.save(os.path.join(directory, f'level_{k}.npy'), level)
+        manifest = {
+            "total_rows": self.total_rows,
+            "base_rows": self.base_rows,
+            "factor": self.factor,
+            "temp_columns": self.temp_columns,
+            "threshold": threshold,
+            "levels": len(levels)
+        }
+        with open(os.path.join(directory, 'rollups.json'), 'w') as f:
+            json.dump(manifest, f)
+        return directory
+
+
+class Rollups:
+    """A stored rollup pyramid, memory-mapped so any window is cheap to read."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'rollups.json')) as f:
+            self.manifest = json.load(f)
+        self.total_rows = self.manifest['total_rows']
+        self.temp_columns = self.manifest['temp_columns']
+        self.levels = [np.load(os.path.join(directory, f'level_{k}.npy'), mmap_mode='r')
+                       for k in range(self.manifest['levels'])]
+
+    def bucket_rows(self, level):
+        return self.manifest['base_rows'] * self.manifest['factor'] ** level
+
+    def query(self, start=0, end=None, points=1000):
+        """
+        Return aggregates covering rows [start, end) in at most `points` buckets.
+
+        Picks the finest level whose buckets in the window fit in `points`, so
+        the work done is proportional to `points`, not the run size.
+        """
+        end = self.total_rows if end is None else min(end, self.total_rows)
+        start = max(0, min(start, end))
+        points = max(1, points)
+
+        level = len(self.levels) - 1
+        for k in range(len(self.levels)):
+            size = self.bucket_rows(k)
+            if (end - 1) // size - start // size + 1 <= points:
+                level = k
+                break
+
+        size = self.bucket_rows(level)
+        first, last = start // size, max(start, end - 1) // size + 1
+        data = np.asarray(self.levels[level][first:last])
+        group = -(-len(data) // points)
+        if group > 1:
+            data = merge_buckets(data, group)
+            size *= group
+
+        series = {
+            "index": (first * self.bucket_rows(level) + np.arange(len(data)) * size).tolist(),
+            "count": data[:, 0].astype(np.int64).tolist(),
+            "anomaly_count": data[:, 1].astype(np.int64).tolist(),
+            "errors": {"min": data[:, 2].tolist(), "max": data[:, 3].tolist(), "mean": data[:, 4].tolist()},
+            "temperatures": {}
+        }
+        for i, col in enumerate(self.temp_columns):
+            j = 5 + 3 * i
+            series["temperatures"][col] = {"min": data[:, j].tolist(), "max": data[:, j + 1].tolist(),
+                                           "mean": data[:, j + 2].tolist()}
+
+        return {
+            "start": start,
+            "end": end,
+            "level": level,
+            "bucket_rows": size,
+            "threshold": self.manifest.get('threshold'),
+            "total_rows": self.total_rows,
+            "series": series
+        }
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_rollups(directory, max_cached=16):
+    """Open a stored pyramid, keeping recently used ones open."""
+    with _cache_lock:
+        rollups = _cache.get(directory)
+        if rollups is None:
+            rollups = Rollups(directory)
+            _cache[directory] = rollups
+            while len(_cache) > max_cached:
+                _cache.popitem(last=False)
+        _cache.move_to_end(directory)
+        return rollups
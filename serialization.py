@@ -0,0 +1,89 @@
+import gzip
+import json
+
+# orjson serializes NumPy arrays natively and is several times faster than
+# the json module; it is optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Payloads smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+# Create custom encoder for numpy types
+class NumpyEncoder(json.JSONEncoder):
+    def default(self, o):
+        import numpy as np
+        if isinstance(o, np.integer):
+            return int(o)
+        if isinstance(o, np.floating):
+            return float(o)
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        return super().default(o)
+
+
+def _default(o):
+    # Values orjson cannot handle natively, e.g. non-contiguous arrays. NumPy
+    # is imported here so that importing this module stays cheap
+    import numpy as np
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """
+    Serialize a result to compact JSON bytes.
+
+    NumPy arrays and scalars are written directly, without converting the
+    tree to Python types first. Uses orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, cls=NumpyEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON bytes or text."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def compress(payload, encoding='gzip'):
+    """
+    Compress a payload for the given Content-Encoding ('gzip' or 'br').
+
+    Brotli needs the optional brotli package.
+    """
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(payload, quality=5)
+    return gzip.compress(payload, compresslevel=6, mtime=0)
+
+
+def accepted_encoding(accept_encodings):
+    """
+    Pick the best supported Content-Encoding a client accepts.
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header
+
+    Returns:
+        str: 'br', 'gzip' or None
+    """
+    if accept_encodings['br'] > 0:
+        try:
+            import brotli  # noqa: F401
+            return 'br'
+        except ImportError:
+            pass
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
@@ -3,6 +3,12 @@ let anomalyChart = null;
 let temperatureChart = null;
 let motorData = null;
 
+// Live stream shown by the dashboard (?stream=<id>), if any
+const streamId = new URLSearchParams(window.location.search).get("stream");
+
+// Maximum points kept per chart series while appending live updates
+const MAX_CHART_POINTS = 2000;
+
 // Colors for temperature chart
 const colorPalette = [
   "#3772FF", // Primary
@@ -19,8 +25,9 @@ const colorPalette = [
 
 // Initialize the dashboard
 document.addEventListener("DOMContentLoaded", function () {
-  // Try to load default data
-  fetchMotorData();
+  // Load the initial snapshot, then listen for pushed updates
+  reloadSnapshot();
+  subscribeToEvents();
 
   // Set up file upload and analysis
   document
@@ -103,6 +110,127 @@ function fetchMotorData() {
     });
 }
 
+// Fetch the current state of a live stream
+function fetchStreamData() {
+  fetch(`/api/streams/${encodeURIComponent(streamId)}`)
+    .then((response) => {
+      if (!response.ok) {
+        throw new Error("Waiting for stream data...");
+      }
+      return response.json();
+    })
+    .then((data) => {
+      motorData = data;
+      updateDashboard(data);
+    })
+    .catch((error) => {
+      console.error("Error fetching stream:", error);
+      document.getElementById("statusText").textContent = "Waiting for data";
+      document.getElementById("statusIndicator").className = "status-indicator";
+    });
+}
+
+// Load a full snapshot of whatever the dashboard is showing
+function reloadSnapshot() {
+  if (streamId) {
+    fetchStreamData();
+  } else {
+    fetchMotorData();
+  }
+}
+
+// Subscribe to Server-Sent Events instead of refetching the full JSON
+function subscribeToEvents() {
+  if (!window.EventSource) {
+    return;
+  }
+
+  const url = streamId
+    ? `/api/events?stream=${encodeURIComponent(streamId)}`
+    : "/api/events";
+  const source = new EventSource(url);
+  let connected = false;
+
+  // Updates may have been missed while disconnected, so resync on reconnect
+  source.addEventListener("open", function () {
+    if (connected) {
+      reloadSnapshot();
+    }
+    connected = true;
+  });
+
+  // A new analysis run was saved. An upload replaces every chart and stat
+  // rather than appending to them, so its full result is loaded; the summary
+  // in the event only says which run it is
+  source.addEventListener("run", function () {
+    if (!streamId) {
+      fetchMotorData();
+    }
+  });
+
+  // New points for the live stream
+  source.addEventListener("delta", function (event) {
+    appendDelta(JSON.parse(event.data));
+  });
+}
+
+// Append a pushed delta to the existing charts and counters
+function appendDelta(delta) {
+  if (!motorData || motorData.status !== "success" || !anomalyChart) {
+    // No charts yet: load a full snapshot instead
+    fetchStreamData();
+    return;
+  }
+
+  const points = delta.points;
+  const anomalySet = new Set(points.anomaly_indices);
+  const [errorSeries, anomalySeries, thresholdSeries] =
+    anomalyChart.data.datasets.map((dataset) => dataset.data);
+
+  points.errors.forEach((error, i) => {
+    const x = points.time[i];
+    errorSeries.push({ x: x, y: error });
+    thresholdSeries.push({ x: x, y: delta.threshold });
+    if (anomalySet.has(i)) {
+      anomalySeries.push({ x: x, y: error });
+    }
+  });
+  [errorSeries, anomalySeries, thresholdSeries].forEach(trimSeries);
+  anomalyChart.update("none");
+
+  if (temperatureChart) {
+    temperatureChart.data.datasets.forEach((dataset) => {
+      const values = points.temperatures[dataset.sensor] || [];
+      values.forEach((value, i) => {
+        dataset.data.push({ x: points.time[i], y: value });
+      });
+      trimSeries(dataset.data);
+    });
+    temperatureChart.update("none");
+  }
+
+  // Keep the latest readings for the temperature trend icons
+  for (const [sensor, values] of Object.entries(points.temperatures)) {
+    const series = motorData.temperature_series[sensor] || [];
+    motorData.temperature_series[sensor] = series.concat(values).slice(-2);
+  }
+
+  motorData.anomaly_summary = delta.anomaly_summary;
+  motorData.temperature_analysis = delta.temperature_analysis;
+  updateSystemStatus(motorData);
+  updateAnomalyMetrics(delta.anomaly_summary);
+  updateTemperatureAnalysis(delta.temperature_analysis);
+  updateParameterAnomalies(delta.anomaly_summary.parameter_anomalies);
+  updateLastUpdated();
+}
+
+// Drop the oldest points once a chart series grows past MAX_CHART_POINTS
+function trimSeries(series) {
+  if (series.length > MAX_CHART_POINTS) {
+    series.splice(0, series.length - MAX_CHART_POINTS);
+  }
+}
+
 // Show loading overlay
 function showLoading() {
   document.getElementById("loadingOverlay").classList.add("active");
@@ -126,17 +254,21 @@ function uploadAndAnalyzeData(file) {
   const formData = new FormData();
   formData.append("file", file);
 
-  // Send the data to the server endpoint for analysis
+  // Submit the data for analysis; the server answers with a job id
   fetch("/api/analyze", {
     method: "POST",
     body: formData,
   })
     .then((response) => {
+      if (response.status === 503) {
+        throw new Error("The analysis queue is full. Please try again shortly.");
+      }
       if (!response.ok) {
         throw new Error("Analysis failed. Please try again.");
       }
       return response.json();
     })
+    .then((job) => waitForJob(job, statusElement))
     .then((data) => {
       motorData = data;
       updateDashboard(data);
@@ -151,6 +283,34 @@ function uploadAndAnalyzeData(file) {
     });
 }
 
+// Poll an analysis job until it finishes and resolve with its result
+function waitForJob(job, statusElement, interval = 1000) {
+  return new Promise((resolve, reject) => {
+    function poll() {
+      fetch(job.result_url)
+        .then((response) => {
+          if (response.status === 202) {
+            return response.json().then((status) => {
+              const rows = status.rows_processed
+                ? ` (${status.rows_processed.toLocaleString()} rows)`
+                : "";
+              statusElement.innerHTML = `<div class="alert alert-info"><i class="bi bi-arrow-repeat me-2"></i>Analysis ${status.stage}${rows}...</div>`;
+              setTimeout(poll, interval);
+            });
+          }
+          return response.json().then((data) => {
+            if (!response.ok) {
+              throw new Error(data.message || "Analysis failed. Please try again.");
+            }
+            resolve(data);
+          });
+        })
+        .catch(reject);
+    }
+    poll();
+  });
+}
+
 // Update the dashboard with new data
 function updateDashboard(data) {
   if (data.status !== "success") {
@@ -438,6 +598,7 @@ function updateTemperatureChart(tempSeries, timeData) {
   for (const [sensor, values] of Object.entries(tempSeries)) {
     datasets.push({
       label: formatSensorName(sensor),
+      sensor: sensor,
       data: values.map((value, index) => ({ x: timeData[index], y: value })),
       borderColor: colorPalette[colorIndex % colorPalette.length],
       backgroundColor: colorPalette[colorIndex % colorPalette.length] + "20", // Add transparency
@@ -0,0 +1,528 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from model_registry import DEFAULT_MODEL_PATH, load_model, load_scorer, registry
+from data_io import analysis_dtypes, iter_chunks, read_header
+from downsample import select_points
+from instrumentation import stage_timer
+from preprocessing import RangeCheck, model_manifest, source_columns
+from rollups import RollupBuilder
+
+
+class BucketDownsampler:
+    """
+    Min/max downsampling of series of unknown length.
+
+    Points are kept in buckets of `width` consecutive rows, starting at 1.
+    Whenever more than `max_points` points are held, the width doubles and
+    every merged bucket keeps only the min and max of each series. The
+    extremes of a merged bucket are always among the extremes of its halves,
+    so every spike stays visible, but the result only approximates a one-shot
+    min/max downsampling: bucket widths are powers of two rather than derived
+    from the final row count, so the bucket edges differ and the number of
+    points kept can end up well below `max_points`. Anomalous points are
+    kept individually while they fit in half the budget. Memory stays
+    bounded by `max_points` plus one block.
+    """
+
+    def __init__(self, max_points, series_names):
+        self.max_points = max(int(max_points), 8)
+        self.width = 1
+        self.series_names = list(series_names)
+        self._index = []
+        self._anomalies = []
+        self._series = {name: [] for name in self.series_names}
+
+    def _compact(self):
+        index = np.concatenate(self._index)
+        anomalies = np.concatenate(self._anomalies)
+        series = {name: np.concatenate(values) for name, values in self._series.items()}
+        numeric = [series[name] for name in self.series_names if name != 'time']
+        keep_anomalies = anomalies if np.count_nonzero(anomalies) <= self.max_points // 2 else None
+
+        def select():
+            bucket = index // self.width
+            starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+            return select_points(numeric[0], numeric[1:], starts, keep_anomalies)
+
+        keep = select()
+        while len(keep) > self.max_points:
+            self.width *= 2
+            keep = select()
+
+        self._index = [index[keep]]
+        self._anomalies = [anomalies[keep]]
+        for name in self.series_names:
+            self._series[name] = [series[name][keep]]
+
+    def add(self, start, anomalies, series):
+        """
+        Offer a block of consecutive points starting at row `start`.
+
+        Args:
+            start: Row index of the first point in the block
+            anomalies: Boolean anomaly flag per point
+            series: Dict of series name -> values for every point; the first
+                    series drives the anomaly-preserving selection
+        """
+        self._index.append(np.arange(start, start + len(anomalies)))
+        self._anomalies.append(np.asarray(anomalies))
+        for name in self.series_names:
+            self._series[name].append(np.asarray(series[name]))
+
+        if sum(len(i) for i in self._index) > self.max_points:
+            self._compact()
+
+    def result(self):
+        """Return (row indices, anomaly flags, series dict) of the kept points."""
+        if not self._index:
+            empty = np.empty(0)
+            return empty.astype(np.int64), empty.astype(bool), {name: empty for name in self.series_names}
+        return (np.concatenate(self._index),
+                np.concatenate(self._anomalies),
+                {name: np.concatenate(values) for name, values in self._series.items()})
+
+
+class RunningAnalysis:
+    """
+    Running aggregates that produce the same result schema as analyze_motor_data.
+
+    Blocks of scored rows are folded in with update(); memory use depends on
+    `max_data_points` and the number of columns, never on the number of rows.
+    """
+
+    def __init__(self, columns, temp_columns, column_stats, error_threshold, max_data_points=1000,
+                 has_time=False, rollups=False):
+        self.columns = list(columns)
+        self.temp_columns = [col for col in temp_columns if col in self.columns]
+        self.column_stats = column_stats
+        self.error_threshold = error_threshold
+        self.max_data_points = max_data_points
+        self.has_time = has_time
+
+        n = len(self.columns)
+        self.total_records = 0
+        self.anomaly_count = 0
+        self._range_check = RangeCheck(self.columns, column_stats)
+        self._out_of_range = np.zeros(n, dtype=np.int64)
+        self._sum = np.zeros(n)
+        self._min = np.full(n, np.inf)
+        self._max = np.full(n, -np.inf)
+        self._last = np.zeros(n)
+        self.sample_anomalies = []
+
+        series = ['errors'] + self.temp_columns + (['time'] if has_time else [])
+        self._downsampler = BucketDownsampler(max_data_points, series)
+        self._temp_index = [self.columns.index(col) for col in self.temp_columns]
+        self.rollups = RollupBuilder(self.temp_columns) if rollups else None
+
+    def update(self, values, errors, time_values=None):
+        """
+        Fold a block of scored rows into the aggregates.
+
+        Args:
+            values: 2-D array of feature values, one column per entry of `columns`
+            errors: Reconstruction error per row
+            time_values: Optional time value per row
+
+        Returns:
+            np.ndarray: Indices (within the block) of the anomalous rows
+        """
+        n = len(errors)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+
+        anomalies = errors > self.error_threshold
+        anomaly_indices = np.flatnonzero(anomalies)
+
+        self._out_of_range += self._range_check.counts(values)
+        self._sum += values.sum(axis=0)
+        np.minimum(self._min, values.min(axis=0), out=self._min)
+        np.maximum(self._max, values.max(axis=0), out=self._max)
+        self._last = values[-1].astype(np.float64)
+
+        missing = 5 - len(self.sample_anomalies)
+        for i in anomaly_indices[:missing]:
+            self.sample_anomalies.append(dict(zip(self.columns, values[i].tolist())))
+
+        series = {'errors': errors}
+        for col, i in zip(self.temp_columns, self._temp_index):
+            series[col] = values[:, i]
+        if self.has_time:
+            series['time'] = np.asarray(time_values, dtype=object)
+        self._downsampler.add(self.total_records, anomalies, series)
+        if self.rollups is not None:
+            self.rollups.add(errors, anomalies, values[:, self._temp_index])
+
+        self.total_records += n
+        self.anomaly_count += len(anomaly_indices)
+        return anomaly_indices
+
+    def anomaly_summary(self):
+        """Return the anomaly_summary block for every row seen so far."""
+        total = self.total_records
+        parameter_anomalies = self._range_check.parameter_anomalies(self._out_of_range)
+
+        return {
+            "total_records": total,
+            "anomaly_count": self.anomaly_count,
+            "anomaly_percentage": float(self.anomaly_count / total * 100) if total > 0 else 0,
+            "parameter_anomalies": parameter_anomalies
+        }
+
+    def temperature_analysis(self):
+        """Return the temperature_analysis block for every row seen so far."""
+        total = self.total_records
+        temp_stats = {}
+        for col in self.temp_columns:
+            i = self.columns.index(col)
+            temp_stats[col] = {
+                "mean": float(self._sum[i] / total) if total > 0 else float('nan'),
+                "max": float(self._max[i]) if total > 0 else float('nan'),
+                "min": float(self._min[i]) if total > 0 else float('nan'),
+                "last": float(self._last[i]) if total > 0 else 0,
+                "anomalies": int(self._out_of_range[i])
+            }
+        return temp_stats
+
+    def result(self):
+        """Return the analysis result for every row seen so far."""
+        total = self.total_records
+        index, anomalies, series = self._downsampler.result()
+        downsampled = total > self.max_data_points
+        plot_data = {
+            "time": series['time'].tolist() if self.has_time else index.tolist(),
+            "errors": series['errors'].tolist(),
+            "threshold": float(self.error_threshold),
+            "anomaly_indices": np.flatnonzero(anomalies).tolist(),
+            "downsampled": downsampled,
+            "original_length": total
+        }
+        temp_series = {col: series[col].tolist() for col in self.temp_columns}
+
+        result = {
+            "status": "success",
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "anomaly_summary": self.anomaly_summary(),
+            "temperature_analysis": self.temperature_analysis(),
+            "plot_data": plot_data,
+            "temperature_series": temp_series,
+            "column_stats": self.column_stats,
+            "sample_anomalies": self.sample_anomalies
+        }
+        return result
+
+
+class ForwardFiller:
+    """
+    Forward-fill missing values across consecutive blocks of rows.
+
+    The last valid value of each column is carried into the next block.
+    Leading gaps that have no earlier value are back-filled from the first
+    valid value instead, matching ffill().bfill() on the whole input; a
+    block whose leading gap cannot be closed yet is held back and merged
+    with the next block. At most one block is held back: a column still
+    without any value after that is an error, so memory stays bounded and
+    rows are never scored with missing values.
+    """
+
+    def __init__(self):
+        self._carry = None
+        self._pending = None
+
+    def fill(self, frame):
+        """
+        Fill a block of rows.
+
+        Args:
+            frame: DataFrame block of numeric feature values
+
+        Returns:
+            DataFrame or None: The filled rows ready for scoring, or None if
+            the block is held back until a later block closes its gaps
+
+        Raises:
+            ValueError: If a column has no value in the held-back block and
+                        this one; both blocks are dropped
+        """
+        held = self._pending is not None
+        if held:
+            frame = pd.concat([self._pending, frame])
+            self._pending = None
+
+        if self._carry is not None:
+            frame = pd.concat([self._carry, frame]).ffill().iloc[1:]
+        else:
+            frame = frame.ffill()
+
+        if len(frame) and frame.iloc[0].isna().any():
+            frame = frame.bfill()
+            if frame.iloc[-1].isna().any():
+                if held:
+                    raise ValueError(_no_values(frame))
+                self._pending = frame
+                return None
+
+        if len(frame):
+            self._carry = frame.iloc[[-1]]
+        return frame
+
+    def flush(self):
+        """
+        Check that no rows are held back, e.g. at the end of the input.
+
+        Raises:
+            ValueError: If a block is held back, i.e. a column never had a value
+        """
+        frame, self._pending = self._pending, None
+        if frame is not None:
+            raise ValueError(_no_values(frame))
+
+
+def _no_values(frame):
+    empty = frame.columns[frame.iloc[-1].isna()]
+    return f"No values for column{'s' if len(empty) > 1 else ''} {', '.join(empty)} in the first {len(frame):,} rows"
+
+
+class MotorStreamAnalyzer:
+    """
+    Stateful anomaly scorer for live sensor streams.
+
+    Built on the same model artifacts as analyze_motor_data, it accepts
+    micro-batches of rows and keeps forward-fill state across batch
+    boundaries. The anomaly_summary and temperature_analysis counters are
+    updated in O(batch) per batch. ingest() returns the anomalies found in
+    each batch as soon as they are scored.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, max_data_points=1000, rollups=False):
+        self.model_data = load_model(model_path)
+        self.scorer = load_scorer(self.model_data)
+        self.manifest = model_manifest(self.model_data)
+        self.column_names = self.manifest['columns']
+        self.max_data_points = max_data_points
+        self.rollups = rollups
+        self.running = None
+        self._mapping = None
+        self._has_time = False
+        self._filler = ForwardFiller()
+        self._pending_times = []
+        self._pending_rows = 0
+
+    def _start(self, header):
+        """Fix the column layout from the first batch."""
+        mapping = source_columns(header, self.column_names)
+        missing = [col for col in self.column_names if col not in mapping.values()]
+        if missing:
+            raise ValueError(f"Missing model columns: {', '.join(missing)}")
+
+        self._mapping = mapping
+        self._has_time = 'time' in header
+        columns = list(mapping.values())
+        self.running = RunningAnalysis(columns, self.manifest['temp_columns'], self.manifest['column_stats'],
+                                       self.model_data['error_threshold'],
+                                       max_data_points=self.max_data_points, has_time=self._has_time,
+                                       rollups=self.rollups)
+
+    def ingest(self, rows, emit_anomalies=True, max_points=None):
+        """
+        Score a micro-batch of rows.
+
+        Rows whose missing values cannot be filled yet (no earlier or later
+        valid value seen so far) are held back and scored with a later batch.
+
+        Args:
+            rows: DataFrame or list of row dicts with raw sensor columns
+            emit_anomalies: Include the anomalous rows in the return value
+            max_points: If set, also return up to this many plot points of
+                        the scored rows (plus every anomalous row) under
+                        "points", for pushing incremental chart updates
+
+        Returns:
+            dict: Rows received/scored in this batch, the anomalies found and
+                  the updated summary counters
+        """
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame.from_records(rows)
+        if self.running is None:
+            self._start(frame.columns)
+
+        features = frame.reindex(columns=list(self._mapping)).rename(columns=self._mapping)
+        features = features.apply(pd.to_numeric, errors='coerce')
+        if self._has_time:
+            times = frame['time'] if 'time' in frame.columns else pd.Series([None] * len(frame))
+            self._pending_times.append(times.to_numpy(dtype=object))
+        self._pending_rows += len(frame)
+
+        try:
+            filled = self._filler.fill(features)
+        except ValueError:
+            # The filler dropped every row not scored yet
+            self._pending_times = []
+            self._pending_rows = 0
+            raise
+        anomalies = []
+        points = None
+        scored = 0
+        if filled is not None:
+            anomalies, points = self._score(filled, emit_anomalies, max_points)
+            scored = len(filled)
+
+        update = {
+            "rows_received": len(frame),
+            "rows_scored": scored,
+            "rows_pending": self._pending_rows,
+            "anomalies": anomalies,
+            "anomaly_summary": self.running.anomaly_summary(),
+            "temperature_analysis": self.running.temperature_analysis()
+        }
+        if max_points is not None:
+            update["points"] = points
+        return update
+
+    def _score(self, filled, emit_anomalies, max_points=None):
+        values = filled.to_numpy(dtype=np.float64)
+        time_values = np.concatenate(self._pending_times) if self._has_time else None
+        self._pending_times = []
+        self._pending_rows = 0
+
+        start = self.running.total_records
+        errors = self.scorer.score(values)
+        anomaly_indices = self.running.update(values, errors, time_values)
+
+        points = None
+        if max_points is not None:
+            points = self._points(start, values, errors, time_values, anomaly_indices, max_points)
+
+        anomalies = []
+        if emit_anomalies:
+            columns = self.running.columns
+            anomalies = [{
+                "index": int(start + i),
+                "time": time_values[i] if self._has_time else None,
+                "error": float(errors[i]),
+                "values": dict(zip(columns, values[i].tolist()))
+            } for i in anomaly_indices]
+        return anomalies, points
+
+    def _points(self, start, values, errors, time_values, anomaly_indices, max_points):
+        """Plot points for a scored block: a strided subset plus every anomaly."""
+        n = len(errors)
+        stride = max(1, -(-n // max(max_points, 1)))
+        keep = np.zeros(n, dtype=bool)
+        keep[::stride] = True
+        keep[anomaly_indices] = True
+        kept = np.flatnonzero(keep)
+
+        x = time_values[kept] if self._has_time else start + kept
+        columns = self.running.columns
+        return {
+            "time": x.tolist(),
+            "errors": errors[kept].tolist(),
+            "anomaly_indices": np.flatnonzero(np.isin(kept, anomaly_indices)).tolist(),
+            "temperatures": {col: values[kept, columns.index(col)].tolist()
+                             for col in self.running.temp_columns}
+        }
+
+    def flush(self):
+        """
+        Check that no rows are held back at the end of the stream.
+
+        Raises:
+            ValueError: If a column never had a value (see ForwardFiller)
+        """
+        try:
+            self._filler.flush()
+        finally:
+            self._pending_times = []
+            self._pending_rows = 0
+
+    def result(self):
+        """Return the full analysis result (same schema as analyze_motor_data)."""
+        return self.running.result()
+
+
+def analyze_motor_data_chunked(data_path, chunksize=100_000, max_data_points=1000,
+                               model_path=DEFAULT_MODEL_PATH, progress_callback=None, rollups=False, timing=None,
+                               *, artifacts=None):
+    """
+    Analyze a motor data CSV chunk by chunk with bounded memory.
+
+    Produces the same JSON schema as analyze_motor_data. Only the feature
+    columns and `time` are read, with explicit dtypes; summaries are kept as
+    running aggregates and the plot series are downsampled on the fly, so peak
+    memory depends on `chunksize` and `max_data_points`, not the file size.
+
+    Args:
+        data_path: Path to CSV file
+        chunksize: Number of rows read and scored per chunk
+        max_data_points: Maximum number of data points to include in JSON output
+        model_path: Path to the trained model file
+        progress_callback: Optional callable invoked with the number of rows
+                           read so far after each chunk; returning False
+                           stops the analysis
+        rollups: Also build the multi-resolution rollup pyramid of the run
+                 (see analyze_motor_data)
+        timing: Add a "timing" block (see analyze_motor_data); reading and
+                scoring are summed over all chunks
+        artifacts: Optional dict that receives the rollup pyramid (see analyze_motor_data)
+
+    Returns:
+        JSON-compatible dictionary with analysis results
+    """
+    timer = stage_timer(timing)
+    loads_before = registry.load_count
+    try:
+        with timer.stage('model_load'):
+            analyzer = MotorStreamAnalyzer(model_path, max_data_points=max_data_points,
+                                           rollups=rollups and artifacts is not None)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to load model: {str(e)}"
+        }
+
+    try:
+        dtypes = analysis_dtypes(read_header(data_path), analyzer.column_names)
+        reader = iter_chunks(data_path, chunksize, list(dtypes), dtypes)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to load data: {str(e)}"
+        }
+
+    rows_read = 0
+    try:
+        while True:
+            with timer.stage('load') as stage:
+                chunk = next(reader, None)
+                if chunk is None:
+                    break
+                stage['rows'] = stage.get('rows', 0) + len(chunk)
+            with timer.stage('score') as stage:
+                analyzer.ingest(chunk, emit_anomalies=False)
+                stage['rows'] = stage.get('rows', 0) + len(chunk)
+
+            rows_read += len(chunk)
+            if progress_callback is not None and progress_callback(rows_read) is False:
+                return {
+                    "status": "error",
+                    "message": "Analysis cancelled"
+                }
+
+        analyzer.flush()
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Error during anomaly detection: {str(e)}"
+        }
+
+    with timer.stage('stats'):
+        result = analyzer.result()
+    if analyzer.running is not None and analyzer.running.rollups is not None:
+        artifacts["rollups"] = analyzer.running.rollups
+    if timer.enabled:
+        timer.note('model_loads', registry.load_count - loads_before)
+        result["timing"] = timer.summary()
+    return result
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules live at the top of the repository, and several of them open
+# sample_data/ and the model file relative to the working directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
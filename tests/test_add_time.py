@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from add_time import add_time_columns
+from preprocessing import PROFILE_COLUMN
+
+
+def test_reset_per_profile_across_chunks(tmp_path):
+    source, output = tmp_path / 'source.csv', tmp_path / 'output.csv'
+    pd.DataFrame({PROFILE_COLUMN: [1, 1, 2, 1, 2, 2, 1], 'value': range(7)}).to_csv(source, index=False)
+    add_time_columns(str(source), str(output), interval=10, reset_per_profile=True, chunksize=3)
+    assert pd.read_csv(output)['seconds'].tolist() == [0, 10, 0, 20, 10, 20, 30]
+
+
+def test_missing_profile_ids_count_as_one_profile(tmp_path):
+    source, output = tmp_path / 'source.csv', tmp_path / 'output.csv'
+    ids = [1, np.nan, np.nan, 1, np.nan, 2, np.nan]
+    pd.DataFrame({PROFILE_COLUMN: ids, 'value': range(7)}).to_csv(source, index=False)
+    add_time_columns(str(source), str(output), interval=10, reset_per_profile=True, chunksize=3)
+    result = pd.read_csv(output)
+    assert result['seconds'].tolist() == [0, 0, 10, 10, 20, 0, 30]
+    assert result['time'].tolist()[:3] == ['00:00:00', '00:00:00', '00:00:10']
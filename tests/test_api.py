@@ -0,0 +1,29 @@
+import shutil
+
+import api
+
+
+def test_memo_key_covers_every_option_that_changes_the_result(tmp_path):
+    shadow = tmp_path / 'shadow.pkl'
+    shutil.copy(api.job_queue.model_path, shadow)
+    base = {'max_data_points': 1000}
+    keys = {api._memo_key('abc', options) for options in (
+        base,
+        {**base, 'chunksize': 1000},
+        {**base, 'chunksize': 5000},
+        {**base, 'shadow_model_path': str(shadow)},
+        {**base, 'by_profile': True},
+    )}
+    assert len(keys) == 5
+
+    # Worker counts do not change the result
+    assert api._memo_key('abc', {**base, 'by_profile': True, 'workers': 4}) == \
+        api._memo_key('abc', {**base, 'by_profile': True, 'workers': 1})
+
+    # Nor does the shadow model's path, only its content
+    key = api._memo_key('abc', {**base, 'shadow_model_path': str(shadow)})
+    moved = shutil.copy(shadow, tmp_path / 'moved.pkl')
+    assert api._memo_key('abc', {**base, 'shadow_model_path': str(moved)}) == key
+    with open(moved, 'ab') as f:
+        f.write(b'\0')
+    assert api._memo_key('abc', {**base, 'shadow_model_path': str(moved)}) != key
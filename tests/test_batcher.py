@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batcher import rows_to_matrix
+from model_registry import load_model
+from preprocessing import model_manifest
+
+SAMPLE = 'sample_data/sampled_data_3000.csv'
+
+
+@pytest.fixture(scope='module')
+def manifest():
+    return model_manifest(load_model())
+
+
+@pytest.fixture(scope='module')
+def records():
+    return pd.read_csv(SAMPLE).head(5).to_dict('records')
+
+
+def test_object_rows_map_raw_column_names(manifest, records):
+    values = rows_to_matrix(records, manifest)
+    assert values.shape == (5, len(manifest['columns']))
+    assert values[0, manifest['columns'].index('coolant_temperature')] == records[0]['coolant']
+
+
+def test_unknown_columns_are_rejected(manifest):
+    with pytest.raises(ValueError, match="Missing model columns"):
+        rows_to_matrix([[1, 2]], manifest, ['a', 'b'])
+
+
+def test_missing_columns_are_named(manifest, records):
+    rows = [{key: value for key, value in row.items() if key != 'pm'} for row in records]
+    with pytest.raises(ValueError, match="Missing model columns: pm$"):
+        rows_to_matrix(rows, manifest)
+
+
+def test_all_null_columns_are_rejected(manifest, records):
+    rows = [dict(row, pm=None) for row in records]
+    with pytest.raises(ValueError, match="No values for model columns: pm"):
+        rows_to_matrix(rows, manifest)
+
+
+def test_single_null_values_get_the_training_mean(manifest, records):
+    rows = [dict(row) for row in records]
+    rows[1]['pm'] = None
+    values = rows_to_matrix(rows, manifest)
+    assert values[1, manifest['columns'].index('pm')] == manifest['means']['pm']
+    assert not np.isnan(values).any()
+
+
+def test_score_endpoint_rejects_unmapped_columns():
+    from api import app
+
+    response = app.test_client().post('/api/score', json={"rows": [[1, 2]], "columns": ["a", "b"]})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body["status"] == "error"
+    assert "Missing model columns" in body["message"]
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+import data_io
+from data_io import FORMATS, convert, read_frame
+
+SAMPLE = 'sample_data/sampled_data_3000.csv'
+
+
+@pytest.mark.parametrize('fmt', list(FORMATS))
+def test_convert_streams_every_format(tmp_path, monkeypatch, fmt):
+    expected = read_frame(SAMPLE)
+    # The source must never be loaded whole
+    monkeypatch.setattr(data_io, 'read_frame', None)
+    output = str(tmp_path / f'data{FORMATS[fmt]}')
+    assert convert(SAMPLE, output, chunksize=700) == len(expected)
+
+    converted = read_frame(output)
+    pd.testing.assert_frame_equal(converted, expected, check_dtype=fmt != 'npy')
+
+
+def test_convert_keeps_the_columns_of_empty_files(tmp_path):
+    source = tmp_path / 'empty.csv'
+    source.write_text('a,b\n')
+    output = str(tmp_path / 'empty.parquet')
+    assert convert(str(source), output) == 0
+    assert read_frame(output).columns.tolist() == ['a', 'b']
@@ -0,0 +1,18 @@
+import numpy as np
+
+from downsample import downsample_indices
+
+
+def test_small_budgets_are_respected():
+    rng = np.random.default_rng(0)
+    errors = rng.gamma(2.0, 0.01, 5000)
+    errors[[100, 2500, 4000]] += 1.0
+    series = [rng.normal(40, 1, 5000) for _ in range(3)]
+    anomalies = errors > 0.5
+
+    for max_points in range(0, 40):
+        for extra, flags in (([], None), (series, None), (series, anomalies)):
+            kept = downsample_indices(errors, extra, max_points, flags)
+            assert len(kept) <= max_points
+            if max_points:
+                assert np.argmax(errors) in kept
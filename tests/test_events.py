@@ -0,0 +1,46 @@
+import queue
+
+import pytest
+
+import api
+from jobs import CANCELLED, DONE, FAILED
+from results_store import Run
+
+
+@pytest.fixture
+def subscription():
+    subscription = api.events.subscribe()
+    yield subscription
+    api.events.unsubscribe(subscription)
+
+
+def _finish(monkeypatch, state, result):
+    run = Run(7, 1.0, '2026-01-01 00:00:00', 'results/run.json', 3000, 153, 5.1)
+    monkeypatch.setattr(api.job_queue, 'result', lambda job_id: result)
+    monkeypatch.setattr(api.results_store, 'run', lambda run_id: run if run_id == run.id else None)
+    api._job_finished('job', state)
+
+
+def _messages(subscription):
+    messages = []
+    while True:
+        try:
+            messages.append(subscription.queue.get_nowait())
+        except queue.Empty:
+            return messages
+
+
+def test_successful_jobs_announce_their_run(monkeypatch, subscription):
+    _finish(monkeypatch, DONE, {"status": "success", "run_id": 7})
+    [message] = _messages(subscription)
+    assert 'event: run\n' in message
+    assert '"id":7' in message and '"anomaly_count":153' in message
+
+
+@pytest.mark.parametrize('state, result', [
+    (FAILED, {"status": "error", "message": "boom"}),
+    (CANCELLED, None),
+])
+def test_failed_and_cancelled_jobs_are_not_announced(monkeypatch, subscription, state, result):
+    _finish(monkeypatch, state, result)
+    assert _messages(subscription) == []
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fused_scorer import FusedScorer, ShadowScorer, sklearn_errors
+from model_registry import load_model
+
+SAMPLE = 'sample_data/sampled_data_3000.csv'
+
+
+@pytest.fixture(scope='module')
+def model_data():
+    return load_model()
+
+
+@pytest.fixture(scope='module')
+def features(model_data):
+    df = pd.read_csv(SAMPLE).rename(columns={'coolant': 'coolant_temperature'})
+    return df[model_data['column_names']].to_numpy(dtype=np.float64)
+
+
+@pytest.fixture(scope='module')
+def reference(model_data, features):
+    return sklearn_errors(model_data, features)
+
+
+@pytest.mark.parametrize('dtype, rtol', [(np.float64, 1e-9), (np.float32, 1e-3)])
+def test_scores_match_sklearn(model_data, features, reference, dtype, rtol):
+    # A small block size so the rows span several blocks, including a short last one
+    errors = FusedScorer.from_model_data(model_data, dtype=dtype, block_rows=1000).score(features)
+    assert errors.dtype == dtype
+    np.testing.assert_allclose(errors, reference, rtol=rtol)
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_anomaly_flags_match_sklearn(model_data, features, reference, dtype):
+    threshold = model_data['error_threshold']
+    errors = FusedScorer.from_model_data(model_data, dtype=dtype).score(features)
+    assert np.count_nonzero(reference > threshold) > 0
+    np.testing.assert_array_equal(errors > threshold, reference > threshold)
+
+
+def test_shadow_scorer_matches_separate_scorers(model_data, features):
+    primary = FusedScorer.from_model_data(model_data, block_rows=1000)
+    candidate = FusedScorer.from_model_data(model_data, dtype=np.float64, block_rows=1000)
+    errors, candidate_errors = ShadowScorer(primary, candidate).score(features)
+    np.testing.assert_array_equal(errors, primary.score(features))
+    np.testing.assert_array_equal(candidate_errors, candidate.score(features))
+
+
+def test_wrong_column_count_is_rejected(model_data, features):
+    with pytest.raises(ValueError, match="Expected an array with"):
+        FusedScorer.from_model_data(model_data).score(features[:, :-1])
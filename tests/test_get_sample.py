@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from get_sample import get_random_rows
+from preprocessing import PROFILE_COLUMN
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    # 400 profiles of 7 rows: windows of 5 rows leave a 2-row unit at the end of each
+    path = tmp_path_factory.mktemp('source') / 'source.csv'
+    pd.DataFrame({
+        PROFILE_COLUMN: np.repeat(np.arange(400), 7),
+        'value': np.arange(2800, dtype=np.float64)
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def _sample(source, tmp_path, **options):
+    output = get_random_rows(source, output_file=str(tmp_path / 'sample.csv'), seed=1, chunksize=500, **options)
+    return pd.read_csv(output)
+
+
+@pytest.mark.parametrize('stratify', [False, True])
+def test_windows_fill_the_requested_rows(source, tmp_path, stratify):
+    sample = _sample(source, tmp_path, num_rows=1000, window_rows=5, stratify=stratify)
+    assert len(sample) == 1000
+    assert sample['value'].is_monotonic_increasing
+    # Windows never span two profiles
+    assert (sample.groupby(PROFILE_COLUMN).size() <= 7).all()
+
+
+def test_single_rows(source, tmp_path):
+    sample = _sample(source, tmp_path, num_rows=1000)
+    assert len(sample) == 1000
+    assert sample['value'].is_unique
+
+
+def test_small_sources_are_sampled_whole(source, tmp_path):
+    sample = _sample(source, tmp_path, num_rows=5000, window_rows=5)
+    assert len(sample) == 2800
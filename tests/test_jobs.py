@@ -0,0 +1,20 @@
+from concurrent.futures import Future
+
+import jobs
+
+
+def test_cancelled_running_jobs_stay_pending_until_their_worker_stops(tmp_path):
+    queue = jobs.JobQueue(max_pending=1)
+    queue._progress, queue._cancelled = {}, {}
+    future = Future()
+    future.set_running_or_notify_cancel()
+    job = queue._jobs['job'] = jobs._Job('job', future, str(tmp_path / 'upload.csv'))
+    future.add_done_callback(lambda f: queue._finish(job, f))
+
+    assert queue.cancel('job')
+    assert queue.status('job')["state"] == jobs.CANCELLED
+    assert queue.depth() == 1
+
+    future.set_result({"status": "error", "message": "Analysis cancelled"})
+    assert queue.depth() == 0
+    assert queue.status('job')["state"] == jobs.CANCELLED
@@ -0,0 +1,26 @@
+import os
+
+from main import analysis_options, is_up_to_date, options_path
+from serialization import dumps
+
+
+def test_results_are_stale_when_the_options_change(tmp_path):
+    data_path, model_path, result_path = (str(tmp_path / name) for name in ('data.csv', 'model.pkl', 'data.json'))
+    for path in (data_path, model_path, result_path):
+        open(path, 'w').close()
+    os.utime(data_path, (0, 0))
+    os.utime(model_path, (0, 0))
+    options = analysis_options(model_path, rolling_windows=[60, 600])
+
+    assert not is_up_to_date(data_path, result_path, options)
+    with open(options_path(result_path), 'wb') as f:
+        f.write(dumps(options))
+    assert is_up_to_date(data_path, result_path, analysis_options(model_path, rolling_windows=(60, 600)))
+    assert not is_up_to_date(data_path, result_path, analysis_options(model_path, rolling_windows=[60, 600],
+                                                                      compact=True))
+    assert not is_up_to_date(data_path, result_path, analysis_options(model_path, max_data_points=500,
+                                                                      rolling_windows=[60, 600]))
+
+    os.utime(model_path)
+    os.utime(result_path, (0, 0))
+    assert not is_up_to_date(data_path, result_path, options)
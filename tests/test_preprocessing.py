@@ -0,0 +1,31 @@
+import pytest
+
+from model_registry import load_model
+from preprocessing import NORMAL_RANGE_STDS, build_manifest, model_manifest
+
+
+def _legacy(model_data):
+    return {key: value for key, value in model_data.items() if key not in ('manifest', 'column_stats')}
+
+
+def test_legacy_models_have_no_derived_ranges():
+    model_data = _legacy(load_model())
+    manifest = model_manifest(model_data)
+    assert manifest['column_stats'] == {}
+    scaler = model_data['scaler']
+    assert list(manifest['means'].values()) == list(scaler.mean_)
+
+
+def test_legacy_models_keep_stored_ranges():
+    model_data = _legacy(load_model())
+    column_stats = {'pm': {'mean': 50.0, 'std': 1.0, 'min_normal': 47.0, 'max_normal': 53.0}}
+    assert model_manifest(dict(model_data, column_stats=column_stats))['column_stats'] == column_stats
+
+
+def test_saved_manifests_are_used_as_is():
+    model_data = _legacy(load_model())
+    scaler = model_data['scaler']
+    manifest = build_manifest(model_data['column_names'], model_data['temp_columns'], scaler.mean_, scaler.scale_)
+    assert model_manifest(dict(model_data, manifest=manifest)) is manifest
+    stats = manifest['column_stats']['pm']
+    assert stats['max_normal'] - stats['mean'] == pytest.approx(NORMAL_RANGE_STDS * stats['std'])
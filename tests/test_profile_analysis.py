@@ -0,0 +1,95 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import jobs
+from preprocessing import PROFILE_COLUMN, UNKNOWN_PROFILE, profile_key
+from profile_analysis import analyze_by_profile, shutdown_pools
+
+SAMPLE = 'sample_data/sampled_data_3000.csv'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def pools():
+    yield
+    shutdown_pools()
+
+
+@pytest.fixture(scope='module')
+def df():
+    return pd.read_csv(SAMPLE).head(500)
+
+
+def test_profile_keys():
+    assert profile_key(np.float64(44.0)) == '44'
+    assert profile_key(np.int64(7)) == '7'
+    assert profile_key('drive-a') == 'drive-a'
+    assert profile_key(np.float64('nan')) == UNKNOWN_PROFILE
+    assert profile_key(None) == UNKNOWN_PROFILE
+
+
+def test_rows_without_profile_form_one_group(df):
+    df = df.copy()
+    missing = df.index % 7 == 0
+    df.loc[missing, PROFILE_COLUMN] = np.nan
+    result = analyze_by_profile(data_df=df, workers=2)
+
+    profiles = result["profiles"]
+    assert profiles[UNKNOWN_PROFILE]["total_records"] == missing.sum()
+    assert 'nan' not in profiles
+    assert sum(summary["total_records"] for summary in profiles.values()) == len(df)
+    assert sum(summary["anomaly_count"] for summary in profiles.values()) == \
+        result["anomaly_summary"]["anomaly_count"]
+
+
+def test_upload_jobs_can_run_per_profile(tmp_path, monkeypatch):
+    saved = []
+    monkeypatch.setattr(jobs, 'save_result', lambda results, **kwargs: saved.append(results) or 1)
+    data_path = str(tmp_path / 'upload.csv')
+    shutil.copy(SAMPLE, data_path)
+
+    response = jobs._run_job('job', data_path, {'by_profile': True, 'workers': 2, 'max_data_points': 100}, {}, {})
+    assert response["status"] == "success"
+    [results] = saved
+    assert results["anomaly_summary"]["total_records"] == 3000
+    assert len(results["profiles"]) > 1
+
+
+def test_profile_jobs_let_the_queue_shut_down(tmp_path):
+    # Run in a child process: a leaked profile pool keeps the job worker, and
+    # so JobQueue.shutdown(), from ever returning
+    script = tmp_path / 'job.py'
+    data_path = tmp_path / 'upload.csv'
+    shutil.copy(SAMPLE, data_path)
+    script.write_text(f"""
+import sys, time
+sys.path.insert(0, {os.getcwd()!r})
+import jobs
+jobs.save_result = lambda results, **kwargs: 1
+queue = jobs.JobQueue(max_workers=1)
+job_id = queue.submit({str(data_path)!r}, by_profile=True, workers=2)
+while queue.status(job_id)["state"] not in jobs.FINISHED_STATES:
+    time.sleep(0.1)
+print(queue.status(job_id)["state"], queue.status(job_id).get("rows_processed"))
+queue.shutdown()
+""")
+    done = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=120)
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.split() == [jobs.DONE, '3000']
+
+
+def test_progress_callback_can_cancel(df):
+    seen = []
+
+    def stop(rows):
+        seen.append(rows)
+        return False
+
+    result = analyze_by_profile(data_df=df, workers=2, progress_callback=stop)
+    assert len(seen) == 1 and seen[0] < len(df)
+    assert result == {"status": "error", "message": "Analysis cancelled"}
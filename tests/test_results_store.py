@@ -0,0 +1,73 @@
+import json
+import threading
+
+import results_store
+from results_store import ResultsStore, save_result
+
+
+def _result(n):
+    return {"status": "success", "timestamp": "2026-01-01 00:00:00",
+            "anomaly_summary": {"total_records": n, "anomaly_count": 0, "anomaly_percentage": 0.0}}
+
+
+def _in_threads(target, count):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_schema_and_backfill_run_once_per_process(tmp_path, monkeypatch):
+    calls = []
+    backfill = ResultsStore._backfill
+    monkeypatch.setattr(ResultsStore, '_backfill', lambda self, conn: calls.append(1) or backfill(self, conn))
+    store = ResultsStore(str(tmp_path), str(tmp_path / 'latest.json'))
+    _in_threads(lambda i: store.latest_id(), 8)
+    assert calls == [1]
+
+
+def test_concurrent_saves_keep_their_own_files(tmp_path):
+    latest = str(tmp_path / 'latest.json')
+    run_ids = {}
+    _in_threads(lambda i: run_ids.__setitem__(i, save_result(_result(i), str(tmp_path), latest)), 20)
+
+    store = ResultsStore(str(tmp_path), latest)
+    paths = set()
+    for i, run_id in run_ids.items():
+        run, payload = store.get(run_id)
+        assert json.loads(payload)["anomaly_summary"]["total_records"] == i
+        paths.add(run.path)
+    assert len(paths) == 20
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith('.tmp-')]
+    assert json.loads(open(latest).read())["anomaly_summary"]["total_records"] in run_ids
+
+
+def test_an_empty_index_picks_up_existing_result_files(tmp_path):
+    (tmp_path / 'motor_analysis_20250101_120000.json').write_text(json.dumps(_result(5)))
+    store = ResultsStore(str(tmp_path), str(tmp_path / 'latest.json'))
+    run, payload = store.latest()
+    assert run.total_records == 5
+    assert results_store.datetime.fromtimestamp(run.created_at).year == 2025
+
+
+def test_temporary_store_redirects_save_result(tmp_path):
+    with results_store.temporary_store(str(tmp_path)) as scratch:
+        run_id = save_result(_result(3))
+        assert results_store.store is scratch
+    assert results_store.store is not scratch
+    assert (tmp_path / results_store.LATEST_FILE).exists()
+    assert ResultsStore(str(tmp_path)).run(run_id).total_records == 3
+
+
+def test_rollups_travel_outside_the_json_result(tmp_path):
+    from analyze_motor_data import analyze_motor_data
+
+    for chunksize in (None, 1000):
+        artifacts = {}
+        result = analyze_motor_data('sample_data/sampled_data_3000.csv', chunksize=chunksize,
+                                    rollups=True, artifacts=artifacts)
+        json.dumps(result)
+        run_id = save_result(result, str(tmp_path), str(tmp_path / 'latest.json'),
+                             rollups=artifacts["rollups"])
+        assert (tmp_path / 'rollups' / str(run_id)).is_dir()
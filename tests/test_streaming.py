@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyze_motor_data import analyze_motor_data
+from streaming import ForwardFiller
+
+SAMPLE = 'sample_data/sampled_data_3000.csv'
+
+
+@pytest.fixture(scope='module')
+def sample():
+    return pd.read_csv(SAMPLE)
+
+
+def test_leading_gap_closed_by_the_next_block_matches_ffill_bfill():
+    frame = pd.DataFrame({'a': [np.nan, np.nan, np.nan, 4.0, np.nan], 'b': [1.0, np.nan, 3.0, 4.0, 5.0]})
+    filler = ForwardFiller()
+    assert filler.fill(frame.iloc[:2]) is None
+    filled = pd.concat([filler.fill(frame.iloc[2:4]), filler.fill(frame.iloc[4:])])
+    pd.testing.assert_frame_equal(filled, frame.ffill().bfill())
+    filler.flush()
+
+
+def test_only_one_block_is_held_back():
+    frame = pd.DataFrame({'a': [np.nan] * 4, 'b': [1.0, 2.0, 3.0, 4.0]})
+    filler = ForwardFiller()
+    assert filler.fill(frame.iloc[:2]) is None
+    with pytest.raises(ValueError, match="No values for column a in the first 4 rows"):
+        filler.fill(frame.iloc[2:])
+
+
+def test_flush_rejects_rows_that_never_saw_a_value():
+    filler = ForwardFiller()
+    assert filler.fill(pd.DataFrame({'a': [np.nan], 'b': [1.0]})) is None
+    with pytest.raises(ValueError, match="No values for column a"):
+        filler.flush()
+
+
+def test_chunked_mode_reports_an_empty_column(sample, tmp_path):
+    path = tmp_path / 'empty_column.csv'
+    sample.assign(pm=np.nan).to_csv(path, index=False)
+    result = analyze_motor_data(str(path), chunksize=1000)
+    assert result["status"] == "error"
+    assert "No values for column pm" in result["message"]
+
+
+def test_chunked_mode_coerces_unparseable_values_like_the_default_path(sample, tmp_path):
+    path = tmp_path / 'unparseable.csv'
+    frame = sample.astype({'pm': object})
+    frame.loc[2500, 'pm'] = 'n/a'
+    frame.to_csv(path, index=False)
+    expected = analyze_motor_data(str(path))
+    result = analyze_motor_data(str(path), chunksize=1000)
+    assert result["status"] == "success"
+    assert result["anomaly_summary"] == expected["anomaly_summary"]
@@ -0,0 +1,53 @@
+import json
+
+import pandas as pd
+import pytest
+
+import api
+
+SAMPLE = 'sample_data/sampled_data_3000.csv'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, 'MAX_STREAMS', 2)
+    yield api.app.test_client()
+    api.streams.clear()
+    api.stream_last_used.clear()
+
+
+@pytest.fixture(scope='module')
+def body():
+    rows = pd.read_csv(SAMPLE).head(20).to_dict('records')
+    return '\n'.join(json.dumps(row) for row in rows)
+
+
+def _ingest(client, stream_id, body):
+    return client.post(f'/api/streams/{stream_id}/ingest', data=body, content_type='application/x-ndjson')
+
+
+def test_new_streams_are_refused_at_the_cap(client, body):
+    assert _ingest(client, 'a', body).status_code == 200
+    assert _ingest(client, 'b', body).status_code == 200
+    response = _ingest(client, 'c', body)
+    assert response.status_code == 429
+    assert "Too many open streams" in response.get_json()["message"]
+    assert int(response.headers['Retry-After']) > 0
+    # Open streams keep working
+    assert _ingest(client, 'a', body).status_code == 200
+
+
+def test_closed_streams_free_their_slot(client, body):
+    _ingest(client, 'a', body)
+    _ingest(client, 'b', body)
+    assert client.delete('/api/streams/a').status_code == 200
+    assert _ingest(client, 'c', body).status_code == 200
+
+
+def test_idle_streams_are_evicted(client, body, monkeypatch):
+    _ingest(client, 'a', body)
+    _ingest(client, 'b', body)
+    monkeypatch.setattr(api, 'STREAM_IDLE_SECONDS', 0)
+    assert _ingest(client, 'c', body).status_code == 200
+    assert list(api.streams) == ['c']
+    assert client.get('/api/streams/a').status_code == 404
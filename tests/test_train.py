@@ -0,0 +1,30 @@
+import pytest
+
+from train import _split, train_motor_anomaly_model_streaming
+
+SAMPLE = 'sample_data/sampled_data_3000.csv'
+
+
+def test_validation_and_threshold_rows_do_not_overlap():
+    validation, threshold = _split(42, 0, 10_000, 0.1, 0.2)
+    assert not (validation & threshold).any()
+    assert 800 < validation.sum() < 1200
+    assert 1700 < threshold.sum() < 2300
+
+
+@pytest.mark.parametrize('options, missing', [
+    ({'validation_size': 0}, 'validation'),
+    ({'test_size': 0}, 'threshold'),
+])
+def test_empty_holdout_sets_are_rejected(tmp_path, options, missing):
+    with pytest.raises(ValueError, match=f"No {missing} rows"):
+        train_motor_anomaly_model_streaming(SAMPLE, chunksize=1000, checkpoint_path=str(tmp_path / 'model.ckpt'),
+                                            model_path=str(tmp_path / 'model.pkl'), **options)
+
+
+def test_streaming_training_on_a_small_file(tmp_path):
+    model = train_motor_anomaly_model_streaming(SAMPLE, chunksize=1000, max_epochs=2,
+                                                checkpoint_path=str(tmp_path / 'model.ckpt'),
+                                                model_path=str(tmp_path / 'model.pkl'))
+    assert model['error_threshold'] > 0
+    assert not (tmp_path / 'model.ckpt').exists()
@@ -1,3 +1,8 @@
+import argparse
+import copy
+import os
+import queue
+import threading
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
@@ -5,13 +10,24 @@ from sklearn.neural_network import MLPRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import IsolationForest
 import joblib
+from data_io import iter_chunks, read_frame
+from preprocessing import OMIT_COLUMNS, RENAME_MAP, build_manifest, find_temp_columns, manifest_path, save_manifest
+
+# Autoencoder settings shared by the in-memory and streaming trainers
+HIDDEN_LAYER_SIZES = (20, 10, 5, 10, 20)
+
+def save_model(model_data, model_path='motor_anomaly_model.pkl'):
+    """Save model data and write its feature manifest next to it as JSON."""
+    joblib.dump(model_data, model_path)
+    save_manifest(model_data['manifest'], model_path)
+    print(f"✅ Model saved as {model_path} (manifest: {manifest_path(model_path)})")
 
 def train_motor_anomaly_model(file_path='measures_v2_with_time.csv'):
     """
     Train an anomaly detection model on motor data with autoencoder
 
     Args:
-        file_path (str): Path to the CSV file containing motor data
+        file_path (str): Path to the CSV, Parquet, Feather or .npy file containing motor data
                          Defaults to 'measures_v2_with_time.csv'
 
     Returns:
@@ -19,7 +35,7 @@ def train_motor_anomaly_model(file_path='measures_v2_with_time.csv'):
     """
     # Load CSV
     print(f"Loading dataset from {file_path}...")
-    df = pd.read_csv(file_path)
+    df = read_frame(file_path)
 
     # Identify columns to exclude from analysis
     omit = ["u_q", "u_d", "i_d", "i_q", "time"]
@@ -52,7 +68,7 @@ def train_motor_anomaly_model(file_path='measures_v2_with_time.csv'):
     # Define and train autoencoder
     print("\nTraining autoencoder for anomaly detection...")
     autoencoder = MLPRegressor(
-        hidden_layer_sizes=(20, 10, 5, 10, 20),
+        hidden_layer_sizes=HIDDEN_LAYER_SIZES,
         activation='relu',
         solver='adam',
         learning_rate_init=0.001,
@@ -74,20 +90,316 @@ def train_motor_anomaly_model(file_path='measures_v2_with_time.csv'):
     print(f"\nReconstruction error threshold: {error_threshold:.4f}")
     print(f"Average reconstruction error: {np.mean(reconstruction_error):.4f}")
 
+    # Normal ranges and feature layout used at inference time
+    manifest = build_manifest(df_analysis.columns, temp_columns, scaler.mean_, scaler.scale_,
+                              df_analysis.dtypes.to_dict())
+
     # Save model components
     model_data = {
         'autoencoder': autoencoder,
         'scaler': scaler,
         'error_threshold': error_threshold,
         'column_names': df_analysis.columns.tolist(),
-        'temp_columns': temp_columns
+        'temp_columns': temp_columns,
+        'column_stats': manifest['column_stats'],
+        'manifest': manifest
+    }
+
+    save_model(model_data)
+
+    return model_data
+
+class QuantileSketch:
+    """
+    Streaming quantile estimate for non-negative values.
+
+    Values are counted in logarithmic bins so every quantile is within a
+    relative error of `relative_accuracy`, using memory proportional to the
+    dynamic range of the values rather than their number.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        self.count += len(values)
+        keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q):
+        """Return the estimated `q` quantile (0 <= q <= 1)."""
+        if self.count == 0:
+            raise ValueError("No values added")
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return float(2 * self.gamma ** key / (self.gamma + 1))
+        return float(2 * self.gamma ** max(self.bins) / (self.gamma + 1))
+
+def _prepare_training_chunk(chunk):
+    """Apply the column selection and cleaning of train_motor_anomaly_model to a chunk."""
+    chunk = chunk.drop(columns=[col for col in OMIT_COLUMNS if col in chunk.columns])
+    chunk = chunk.rename(columns={old: new for old, new in RENAME_MAP.items() if old in chunk.columns})
+    chunk = chunk.apply(pd.to_numeric, errors='coerce')
+    return chunk.dropna()
+
+def _read_chunks(file_path, chunksize, prefetch=2):
+    """
+    Yield (chunk index, cleaned feature frame) for every chunk of a CSV.
+
+    Chunks are read and parsed in a background thread, `prefetch` chunks
+    ahead, so parsing overlaps with training.
+    """
+    chunks = queue.Queue(maxsize=prefetch)
+    done = object()
+
+    def reader():
+        try:
+            for chunk in iter_chunks(file_path, chunksize):
+                chunks.put(_prepare_training_chunk(chunk))
+            chunks.put(done)
+        except Exception as e:
+            chunks.put(e)
+
+    threading.Thread(target=reader, daemon=True).start()
+    index = 0
+    while True:
+        item = chunks.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield index, item
+        index += 1
+
+def _split(seed, index, n, validation_size, test_size):
+    # Deterministic per chunk, so a resumed run splits rows the same way.
+    # Returns the validation and threshold masks; the other rows train.
+    draws = np.random.default_rng([seed, index]).random(n)
+    validation = draws < validation_size
+    return validation, ~validation & (draws < validation_size + test_size)
+
+def _save_checkpoint(state, checkpoint_path):
+    # Write to a temporary file first so a crash never leaves a torn checkpoint
+    tmp_path = f"{checkpoint_path}.tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, checkpoint_path)
+
+def train_motor_anomaly_model_streaming(file_path='measures_v2_with_time.csv', chunksize=100_000,
+                                        max_epochs=50, batch_size=256, buffer_rows=200_000,
+                                        validation_rows=50_000, validation_size=0.1, test_size=0.2,
+                                        patience=5, tol=1e-5,
+                                        checkpoint_path='motor_anomaly_model.ckpt',
+                                        model_path='motor_anomaly_model.pkl', resume=True, seed=42):
+    """
+    Train the anomaly model out of core by streaming the CSV in chunks
+
+    The scaler is fitted with partial_fit in a first pass. Each epoch then
+    re-reads the file, collects scaled training rows in a shuffle buffer of
+    `buffer_rows` rows and trains the autoencoder with minibatch partial_fit.
+    A fixed sample of validation rows drives early stopping, and the 95th
+    percentile threshold comes from a streaming quantile sketch over a
+    separate set of held-out rows, so it is not biased by model selection.
+    Memory use depends on `chunksize`, `buffer_rows` and `validation_rows`,
+    not on the file size.
+
+    A checkpoint is written after the scaler pass and after every epoch; with
+    `resume` a crashed run continues from the last one.
+
+    Args:
+        file_path (str): Path to the CSV, Parquet, Feather or .npy file containing motor data
+        chunksize (int): Rows read per chunk
+        max_epochs (int): Maximum passes over the training rows
+        batch_size (int): Minibatch size for the autoencoder
+        buffer_rows (int): Rows shuffled together before each partial_fit
+        validation_rows (int): Validation rows kept in memory for early stopping
+        validation_size (float): Fraction of rows held out for early stopping
+        test_size (float): Fraction of rows held out for the threshold
+        patience (int): Epochs without improvement before stopping
+        tol (float): Minimum improvement of the validation loss
+        checkpoint_path (str): Where to write checkpoints
+        model_path (str): Where to save the trained model
+        resume (bool): Continue from `checkpoint_path` if it exists
+        seed (int): Seed for the split, shuffling and the autoencoder
+
+    Returns:
+        dict: Model data including autoencoder, scaler, threshold, and columns
+
+    Raises:
+        ValueError: If the file leaves no training, validation or threshold rows
+    """
+    run = (file_path, chunksize, seed, validation_size, test_size)
+    state = None
+    if resume and os.path.exists(checkpoint_path):
+        state = joblib.load(checkpoint_path)
+        if state.get('run') != run:
+            raise ValueError(f"Checkpoint {checkpoint_path} was written for a different run; "
+                             "remove it or pass resume=False")
+        print(f"Resuming from {checkpoint_path} at epoch {state['epoch'] + 1}")
+
+    if state is None:
+        # Pass 1: fit the scaler and sample validation rows
+        print(f"Fitting scaler on {file_path} in chunks of {chunksize} rows...")
+        scaler = StandardScaler()
+        columns = None
+        val_rows, val_keys = None, None
+        total_rows = training_rows = threshold_rows = 0
+        for index, chunk in _read_chunks(file_path, chunksize):
+            if columns is None:
+                columns = chunk.columns.tolist()
+                dtypes = chunk.dtypes.to_dict()
+            values = chunk[columns].to_numpy(dtype=np.float64)
+            in_validation, in_threshold = _split(seed, index, len(values), validation_size, test_size)
+            training = ~(in_validation | in_threshold)
+            if training.any():
+                scaler.partial_fit(values[training])
+            training_rows += int(training.sum())
+            threshold_rows += int(in_threshold.sum())
+
+            # Keep the validation rows with the smallest random keys (a uniform sample)
+            keys = np.random.default_rng([seed, index, 1]).random(int(in_validation.sum()))
+            val_rows = values[in_validation] if val_rows is None else np.concatenate([val_rows, values[in_validation]])
+            val_keys = keys if val_keys is None else np.concatenate([val_keys, keys])
+            if len(val_rows) > validation_rows:
+                keep = np.argpartition(val_keys, validation_rows)[:validation_rows]
+                val_rows, val_keys = val_rows[keep], val_keys[keep]
+            total_rows += len(values)
+
+        if columns is None:
+            raise ValueError(f"No usable rows in {file_path}")
+        for name, count in (('training', training_rows), ('validation', len(val_rows)),
+                            ('threshold', threshold_rows)):
+            if not count:
+                raise ValueError(f"No {name} rows in {file_path} ({total_rows} rows with "
+                                 f"validation_size={validation_size}, test_size={test_size})")
+
+        temp_columns = find_temp_columns(columns)
+        print(f"Identified temperature columns: {temp_columns}")
+        print(f"Rows: {total_rows}, feature means: {dict(zip(columns, np.round(scaler.mean_, 3)))}")
+
+        autoencoder = MLPRegressor(
+            hidden_layer_sizes=HIDDEN_LAYER_SIZES,
+            activation='relu',
+            solver='adam',
+            learning_rate_init=0.001,
+            batch_size=batch_size,
+            alpha=0.0001,
+            random_state=seed
+        )
+        state = {
+            'run': run,
+            'columns': columns,
+            'temp_columns': temp_columns,
+            'dtypes': dtypes,
+            'scaler': scaler,
+            'autoencoder': autoencoder,
+            'validation': scaler.transform(val_rows),
+            'epoch': 0,
+            'best_loss': np.inf,
+            'best_autoencoder': None,
+            'bad_epochs': 0,
+            'stopped': False
+        }
+        _save_checkpoint(state, checkpoint_path)
+
+    scaler = state['scaler']
+    autoencoder = state['autoencoder']
+    columns = state['columns']
+    validation = state['validation']
+
+    # Pass 2..n: minibatch training over shuffled buffers
+    while not state['stopped'] and state['epoch'] < max_epochs:
+        epoch = state['epoch'] + 1
+        rng = np.random.default_rng([seed, epoch])
+        buffer, buffered = [], 0
+
+        def train_buffer():
+            X = np.concatenate(buffer)
+            X = X[rng.permutation(len(X))]
+            autoencoder.partial_fit(X, X)
+
+        for index, chunk in _read_chunks(file_path, chunksize):
+            values = chunk[columns].to_numpy(dtype=np.float64)
+            in_validation, in_threshold = _split(seed, index, len(values), validation_size, test_size)
+            buffer.append(scaler.transform(values[~(in_validation | in_threshold)]))
+            buffered += len(buffer[-1])
+            if buffered >= buffer_rows:
+                train_buffer()
+                buffer, buffered = [], 0
+        if buffered:
+            train_buffer()
+
+        loss = float(np.mean((validation - autoencoder.predict(validation)) ** 2))
+        if loss < state['best_loss'] - tol:
+            state['best_loss'] = loss
+            state['best_autoencoder'] = copy.deepcopy(autoencoder)
+            state['bad_epochs'] = 0
+        else:
+            state['bad_epochs'] += 1
+            state['stopped'] = state['bad_epochs'] >= patience
+        state['epoch'] = epoch
+        print(f"Epoch {epoch}: validation loss {loss:.6f} (best {state['best_loss']:.6f})")
+        _save_checkpoint(state, checkpoint_path)
+
+    if state['stopped']:
+        print(f"Early stopping after {state['epoch']} epochs")
+    autoencoder = state['best_autoencoder'] or autoencoder
+
+    # Final pass: threshold from the errors of every threshold row
+    sketch = QuantileSketch()
+    for index, chunk in _read_chunks(file_path, chunksize):
+        values = chunk[columns].to_numpy(dtype=np.float64)
+        _, in_threshold = _split(seed, index, len(values), validation_size, test_size)
+        X_test = scaler.transform(values[in_threshold])
+        if len(X_test):
+            sketch.add(np.mean(np.power(X_test - autoencoder.predict(X_test), 2), axis=1))
+    error_threshold = sketch.quantile(0.95)  # 95th percentile as threshold
+
+    print(f"\nReconstruction error threshold: {error_threshold:.4f}")
+
+    manifest = build_manifest(columns, state['temp_columns'], scaler.mean_, scaler.scale_, state['dtypes'])
+    model_data = {
+        'autoencoder': autoencoder,
+        'scaler': scaler,
+        'error_threshold': error_threshold,
+        'column_names': columns,
+        'temp_columns': state['temp_columns'],
+        'column_stats': manifest['column_stats'],
+        'manifest': manifest
     }
 
-    joblib.dump(model_data, 'motor_anomaly_model.pkl')
-    print("✅ Model saved as motor_anomaly_model.pkl")
+    save_model(model_data, model_path)
+    os.remove(checkpoint_path)
 
     return model_data
 
 # Run with default if executed as a script
 if __name__ == "__main__":
-    train_motor_anomaly_model()
+    parser = argparse.ArgumentParser(description="Train the motor anomaly model")
+    parser.add_argument('file_path', nargs='?', default='measures_v2_with_time.csv')
+    parser.add_argument('--streaming', action='store_true',
+                        help="Stream the CSV in chunks instead of loading it into memory")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--max-epochs', type=int, default=50)
+    parser.add_argument('--checkpoint', default='motor_anomaly_model.ckpt')
+    parser.add_argument('--no-resume', action='store_true', help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    if args.streaming:
+        train_motor_anomaly_model_streaming(args.file_path, chunksize=args.chunksize, max_epochs=args.max_epochs,
+                                            checkpoint_path=args.checkpoint, resume=not args.no_resume)
+    else:
+        train_motor_anomaly_model(args.file_path)